@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+
+# Play lots of headless games for balance testing, see source/batch.py
+
+import os
+import sys
+
+os.environ['GALAGA_HEADLESS'] = '1'  # has to be set before the game gets imported
+
+import pygame
+from source import batch
+
+if __name__ == '__main__':
+    batch.main()
+    pygame.quit()
+    sys.exit()
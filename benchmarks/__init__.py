@@ -0,0 +1,10 @@
+"""
+Deterministic benchmarks for the game's update and render throughput.
+Run them with `python -m benchmarks` (see --help), which drives the real state classes headlessly and
+writes the results as JSON so two runs can be compared with `python -m benchmarks --compare a.json b.json`.
+"""
+
+import os
+
+# has to be set before the game gets imported
+os.environ.setdefault('GALAGA_HEADLESS', '1')
@@ -0,0 +1,46 @@
+import argparse
+
+from source import render
+from . import runner
+from .scenarios import DEFAULT_SCALE, SCENARIOS
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Galaga benchmarks.")
+    parser.add_argument('scenarios', nargs='*',
+                        help="scenarios to run, out of {} (all of them by default)".format(', '.join(SCENARIOS)))
+    parser.add_argument('-o', '--output', help="save the results to this JSON file")
+    parser.add_argument('-f', '--frames', type=int, default=runner.DEFAULT_FRAMES, help="timed frames per scenario")
+    parser.add_argument('-w', '--warmup', type=int, default=runner.DEFAULT_WARMUP, help="untimed frames first")
+    parser.add_argument('-a', '--alloc-frames', type=int, default=runner.DEFAULT_ALLOC_FRAMES,
+                        help="frames to measure allocations over (0 to skip)")
+    parser.add_argument('-s', '--seed', type=int, default=runner.DEFAULT_SEED)
+    parser.add_argument('--stars', type=int, help="number of stars for the starfield scenario")
+    parser.add_argument('--palette', action='store_true', help="draw into the 8-bit frame of palette mode")
+    parser.add_argument('--scale', type=int, choices=render.SCALES,
+                        help="window scale for the present scenarios (default {})".format(DEFAULT_SCALE))
+    parser.add_argument('--dirty', action='store_true', help="present in dirty rect mode")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two saved results and exit")
+    options = parser.parse_args()
+    for name in options.scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario: {}".format(name))
+
+    if options.compare:
+        old, new = (runner.load(path) for path in options.compare)
+        print(runner.format_comparison(old, new))
+        return
+
+    if options.palette:
+        render.set_palette_mode(True)
+    if options.dirty:
+        render.set_mode(render.DIRTY)
+    results = runner.run_all(options.scenarios, options.seed, options.frames, options.warmup, options.alloc_frames,
+                             options.stars, options.scale)
+    print(runner.format_results(results))
+    if options.output:
+        runner.save(results, options.output)
+
+
+if __name__ == '__main__':
+    main()
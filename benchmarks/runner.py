@@ -0,0 +1,141 @@
+# runner.py
+
+"""
+Timing the scenarios, and saving and comparing the results.
+"""
+
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy
+import pygame
+
+from source import render
+from .scenarios import SCENARIOS
+
+DEFAULT_FRAMES = 600
+DEFAULT_WARMUP = 60
+DEFAULT_ALLOC_FRAMES = 60
+DEFAULT_SEED = 1981
+
+
+def percentile(sorted_values: list, percent: float):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+
+def measure_allocations(run_frame, num_frames: int) -> dict:
+    """
+    Run some frames under tracemalloc (which is slow, so it's kept out of the timed frames)
+    """
+    tracemalloc.start()
+    peaks = []
+    blocks = []
+    for _ in range(num_frames):
+        before_blocks = sys.getallocatedblocks()
+        before_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        run_frame()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - before_size)
+        blocks.append(sys.getallocatedblocks() - before_blocks)
+    tracemalloc.stop()
+    return {'alloc_peak_bytes_per_frame': sum(peaks) / num_frames,
+            'net_blocks_per_frame': sum(blocks) / num_frames}
+
+
+def run_scenario(name: str, seed=DEFAULT_SEED, frames=DEFAULT_FRAMES, warmup=DEFAULT_WARMUP,
+                 alloc_frames=DEFAULT_ALLOC_FRAMES, **options) -> dict:
+    render.set_scale(1)  # the present scenarios change it
+    run_frame = SCENARIOS[name](seed, **options)
+    for _ in range(warmup):
+        run_frame()
+
+    durations = []
+    perf_counter_ns = time.perf_counter_ns
+    for _ in range(frames):
+        start = perf_counter_ns()
+        run_frame()
+        durations.append(perf_counter_ns() - start)
+
+    total_s = sum(durations) / 1e9
+    durations.sort()
+    result = {'frames': frames,
+              'ticks_per_second': frames / total_s if total_s else 0.0,
+              'mean_us': sum(durations) / frames / 1000,
+              'p50_us': percentile(durations, 50) / 1000,
+              'p90_us': percentile(durations, 90) / 1000,
+              'p99_us': percentile(durations, 99) / 1000,
+              'max_us': durations[-1] / 1000}
+    if alloc_frames:
+        result.update(measure_allocations(run_frame, alloc_frames))
+    return result
+
+
+def run_all(names=None, seed=DEFAULT_SEED, frames=DEFAULT_FRAMES, warmup=DEFAULT_WARMUP,
+            alloc_frames=DEFAULT_ALLOC_FRAMES, num_stars=None, scale=None) -> dict:
+    results = {}
+    for name in names or SCENARIOS:
+        options = {}
+        if name == 'starfield' and num_stars:
+            options['num_stars'] = num_stars
+        elif name.startswith('present_') and scale:
+            options['scale'] = scale
+        results[name] = run_scenario(name, seed, frames, warmup, alloc_frames, **options)
+    return {'meta': {'seed': seed,
+                     'frames': frames,
+                     'warmup': warmup,
+                     'scale': scale,
+                     'render_mode': render.mode,
+                     'python': platform.python_version(),
+                     'pygame': pygame.version.ver,
+                     'numpy': numpy.__version__,
+                     'platform': platform.platform(),
+                     'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'scenarios': results}
+
+
+def save(results: dict, path):
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2)
+
+
+def load(path) -> dict:
+    with open(path) as file:
+        return json.load(file)
+
+
+def format_results(results: dict) -> str:
+    lines = ['{:<16}{:>12}{:>10}{:>10}{:>10}{:>14}'.format('scenario', 'ticks/s', 'p50 us', 'p99 us', 'max us',
+                                                          'peak B/frame')]
+    for name, result in results['scenarios'].items():
+        lines.append('{:<16}{:>12.0f}{:>10.1f}{:>10.1f}{:>10.1f}{:>14.0f}'.format(
+            name, result['ticks_per_second'], result['p50_us'], result['p99_us'], result['max_us'],
+            result.get('alloc_peak_bytes_per_frame', 0)))
+    return '\n'.join(lines)
+
+
+def format_comparison(old: dict, new: dict) -> str:
+    """
+    Show the change of each scenario's numbers between two runs (negative times are better)
+    """
+    lines = ['{:<16}{:>12}{:>10}{:>10}{:>14}'.format('scenario', 'ticks/s', 'p50', 'p99', 'peak B/frame')]
+
+    def change(key, name):
+        before = old['scenarios'][name].get(key)
+        after = new['scenarios'][name].get(key)
+        if not before or after is None:
+            return 'n/a'
+        return '{:+.1%}'.format(after / before - 1)
+
+    for name in new['scenarios']:
+        if name not in old['scenarios']:
+            continue
+        lines.append('{:<16}{:>12}{:>10}{:>10}{:>14}'.format(name, change('ticks_per_second', name),
+                                                             change('p50_us', name), change('p99_us', name),
+                                                             change('alloc_peak_bytes_per_frame', name)))
+    return '\n'.join(lines)
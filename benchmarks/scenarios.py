@@ -0,0 +1,205 @@
+# scenarios.py
+
+"""
+Benchmark scenarios.
+Each scenario function takes a seed and returns a function that runs one frame (update and display).
+"""
+
+import random
+
+import pygame
+
+from source import constants as c, hud, render, setup, sprites, tools, formation
+from source.audio import stop_sounds
+from source.demo import Demo
+from source.play import Play
+from source.stars import StarField, random_star
+from source.states import Title, new_persist
+
+DEFAULT_NUM_STARS = 256
+DEFAULT_SCALE = 3
+
+
+def _screen() -> pygame.Surface:
+    # the 8-bit frame, with --palette
+    return render.frame_surface(setup.SCREEN)
+
+
+def _keys():
+    return pygame.key.get_pressed()
+
+
+def _start_play(seed: int) -> Play:
+    # skip past the intro and the stage and ready messages
+    play = Play(new_persist(seed))
+    play.done_starting()
+    play.should_spawn_enemies = False  # the scenarios put in their own enemies
+    play.done_showing_stage()
+    play.done_with_ready()
+    stop_sounds()
+    return play
+
+
+def _fill_formation(play: Play):
+    for enemy_type, x, y in formation.LAYOUT:
+        enemy = sprites.Enemy(0, 0, enemy_type, play.formation, formation.slot_index(x, y))
+        enemy.move_to_slot()
+        play.enemies.add(enemy)
+
+
+def _frame_runner(state):
+    screen = _screen()
+    keys = _keys()
+
+    def run_frame():
+        state.current_time += c.SIMULATION_STEP
+        state.update(c.SIMULATION_STEP, keys)
+        state.display(screen)
+
+    return run_frame
+
+
+def idle_title(seed: int):
+    title = Title(new_persist(seed))
+    title.set_ready()
+    return _frame_runner(title)
+
+
+def full_formation(seed: int):
+    play = _start_play(seed)
+    _fill_formation(play)
+    return _frame_runner(play)
+
+
+def missile_storm(seed: int):
+    rng = random.Random(seed)
+    play = _start_play(seed)
+    _fill_formation(play)
+    run_frame = _frame_runner(play)
+
+    def run_storm_frame():
+        play.extra_lives = 3  # the storm shouldn't end the game
+        if play.is_player_alive:
+            play.player.x = rng.randrange(8, c.GAME_SIZE.width - 8)
+            play.fighter_shoots()
+        for _ in range(4):
+            x = rng.randrange(c.GAME_SIZE.width)
+            vel = pygame.math.Vector2(rng.uniform(-0.05, 0.05), 0.2)
+            play.enemy_missiles.add(sprites.Missile(x, c.STAGE_TOP_Y + 20, vel, is_enemy=True))
+        # keep the formation full
+        if len(play.enemies) < len(formation.LAYOUT) // 2:
+            play.enemies.empty()
+            _fill_formation(play)
+        run_frame()
+
+    return run_storm_frame
+
+
+def explosion_burst(seed: int):
+    rng = random.Random(seed)
+    play = _start_play(seed)
+    run_frame = _frame_runner(play)
+
+    def run_burst_frame():
+        for _ in range(10):
+            play.add_explosion(rng.randrange(c.GAME_SIZE.width), rng.randrange(c.STAGE_TOP_Y, c.STAGE_BOTTOM_Y),
+                               is_player_type=rng.random() < 0.1)
+        run_frame()
+
+    return run_burst_frame
+
+
+def starfield(seed: int, num_stars=DEFAULT_NUM_STARS):
+    rng = random.Random(seed)
+    stars = StarField(rng)
+    stars.stars = [random_star(rng) for _ in range(num_stars)]
+    screen = _screen()
+
+    def run_frame():
+        stars.update(c.SIMULATION_STEP)
+        render.fill(screen, c.BLACK)
+        stars.display(screen)
+
+    return run_frame
+
+
+def hud_churn(seed: int):
+    rng = random.Random(seed)
+    screen = _screen()
+    badges = tools.calc_stage_badges(255)
+    score = 0
+
+    def run_frame():
+        nonlocal score
+        score += rng.choice((50, 80, 150, 400, 800, 1600))
+        hud.display(screen, one_up_score=score, high_score=max(score, 30_000), num_extra_lives=3,
+                    stage_badges=badges, stage_badge_animation_step=sum(badges), show_1up=score % 2 == 0)
+
+    return run_frame
+
+
+def demo_replay(seed: int):
+    # the attract mode's recorded game, played over and over. The log brings its own seed
+    demo = Demo(new_persist(seed))
+    screen = _screen()
+
+    def run_frame():
+        nonlocal demo
+        if demo.is_done:
+            demo.cleanup()
+            demo = Demo(new_persist(seed))
+        demo.current_time += c.SIMULATION_STEP
+        demo.update(c.SIMULATION_STEP, None)
+        demo.display(screen)
+
+    return run_frame
+
+
+def _presented_demo(seed: int, scale: int, path: str):
+    # demo_replay, drawn and presented the way Control does it, onto a window scale times the game's size
+    window = render.set_scale(scale, path)
+    if render.scale_path != path:
+        raise RuntimeError("can't scale with {!r} here, it needs a display with a renderer".format(path))
+    demo = Demo(new_persist(seed))
+
+    def run_frame():
+        nonlocal demo
+        if demo.is_done:
+            demo.cleanup()
+            demo = Demo(new_persist(seed))
+        demo.current_time += c.SIMULATION_STEP
+        demo.update(c.SIMULATION_STEP, None)
+        surface = render.frame_surface(window)
+        render.begin_frame(surface)
+        demo.display(surface)
+        render.present(window)
+
+    return run_frame
+
+
+def present_scaled(seed: int, scale=DEFAULT_SCALE):
+    return _presented_demo(seed, scale, render.SCALED)
+
+
+def present_surface(seed: int, scale=DEFAULT_SCALE):
+    return _presented_demo(seed, scale, render.SURFACE)
+
+
+def present_sprites(seed: int, scale=DEFAULT_SCALE):
+    return _presented_demo(seed, scale, render.SPRITES)
+
+
+SCENARIOS = {
+    'idle_title': idle_title,
+    'full_formation': full_formation,
+    'missile_storm': missile_storm,
+    'explosion_burst': explosion_burst,
+    'starfield': starfield,
+    'hud_churn': hud_churn,
+    'demo_replay': demo_replay,
+    'present_surface': present_surface,
+    'present_sprites': present_sprites,
+}
+if not setup.HEADLESS:
+    # SDL's dummy video driver has no renderer to scale with
+    SCENARIOS['present_scaled'] = present_scaled
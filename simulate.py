@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+
+# Run games headless and as fast as possible, see source/simulate.py
+
+import os
+import sys
+
+os.environ['GALAGA_HEADLESS'] = '1'  # has to be set before the game gets imported
+
+import pygame
+from source import simulate
+
+if __name__ == '__main__':
+    simulate.main()
+    pygame.quit()
+    sys.exit()
@@ -0,0 +1,280 @@
+# assets.py
+
+"""
+Prebaked asset cache.
+One file holds every image as raw pixels already in the display's pixel format, every sound effect as
+decoded PCM (and as its source file, for a mixer with another format) and the (still compressed) music
+tracks. It is keyed by hashes of the source files, opened with mmap, and the images are made straight
+from the mapped memory, so starting the game doesn't decode any PNG or OGG file. setup.py rebuilds the
+cache whenever the sources change.
+
+The cache can also be packed into a zipapp together with the code:
+    python -m source.assets galaga.pyz
+The cache is stored uncompressed inside the archive, so it still gets memory-mapped from there.
+"""
+
+import hashlib
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import zipfile
+
+import pygame
+
+CACHE_FILE_NAME = 'assets.cache'
+STAGE_CACHE_FILE_NAME = 'stages.cache'  # the compiled stages also go into zipapps, see stages.py
+MAGIC = b'GALAGA-ASSETS'
+VERSION = 2
+ALIGNMENT = 16  # byte alignment of each blob in the file
+SOURCE_DIRS = ('graphics', 'audio')
+
+# Surface masks that frombuffer can use directly, so the surface points into the cache without a copy
+FROMBUFFER_FORMATS = {(0xff0000, 0xff00, 0xff, 0xff000000): 'BGRA',
+                      (0xff, 0xff00, 0xff0000, 0xff000000): 'RGBA',
+                      (0xff, 0xff00, 0xff0000, 0): 'RGBX'}
+
+
+def hash_sources(resource_dir) -> dict:
+    """
+    Hash every source asset file
+    :return: dict of relative path -> sha1 hex digest, empty if there are no source files (like in a zipapp)
+    """
+    hashes = {}
+    for sub_dir in SOURCE_DIRS:
+        directory = os.path.join(resource_dir, sub_dir)
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, filename), 'rb') as file:
+                hashes[sub_dir + '/' + filename] = hashlib.sha1(file.read()).hexdigest()
+    return hashes
+
+
+def _mixer_format():
+    mixer = pygame.mixer.get_init()
+    return list(mixer) if mixer else None
+
+
+def build_cache(path, source_hashes: dict, graphics: dict, sound_files: dict, music_files: dict):
+    """
+    Write a new cache file
+    :param path: where to write it
+    :param source_hashes: from hash_sources, to know when the cache is stale
+    :param graphics: image name -> surface, already converted for the display
+    :param sound_files: sound effect name -> file path, to be stored decoded
+    :param music_files: music track name -> file path, to be stored as is
+    """
+    blobs = []
+    offset = 0
+
+    def add_blob(data) -> dict:
+        nonlocal offset
+        entry = {'offset': offset, 'size': len(data)}
+        blobs.append(data)
+        offset += len(data)
+        padding = -offset % ALIGNMENT
+        if padding:
+            blobs.append(bytes(padding))
+            offset += padding
+        return entry
+
+    images = {}
+    for name, surface in graphics.items():
+        entry = add_blob(bytes(surface.get_buffer()))
+        entry.update(size_px=surface.get_size(), pitch=surface.get_pitch(), bitsize=surface.get_bitsize(),
+                     masks=surface.get_masks(), flags=surface.get_flags() & pygame.SRCALPHA,
+                     colorkey=surface.get_colorkey())
+        images[name] = entry
+
+    sounds = {name: add_blob(pygame.mixer.Sound(file_path).get_raw()) for name, file_path in sound_files.items()}
+    # the PCM only plays right in the mixer format it was decoded for, so keep the files to decode otherwise
+    sound_sources = {}
+    for name, file_path in sound_files.items():
+        with open(file_path, 'rb') as file:
+            sound_sources[name] = add_blob(file.read())
+
+    music = {}
+    for name, file_path in music_files.items():
+        with open(file_path, 'rb') as file:
+            music[name] = add_blob(file.read())
+
+    header = json.dumps({'version': VERSION, 'sources': source_hashes, 'mixer': _mixer_format(),
+                         'images': images, 'sounds': sounds, 'sound_sources': sound_sources,
+                         'music': music}).encode()
+    data_start = len(MAGIC) + 4 + len(header)
+    data_start += -data_start % ALIGNMENT
+
+    # write to a temp file first so a half-written cache never gets used
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(struct.pack('<I', len(header)))
+        file.write(header)
+        file.write(bytes(data_start - file.tell()))
+        for blob in blobs:
+            file.write(blob)
+    os.replace(temp_path, path)
+
+
+def _display_format(is_alpha: bool) -> tuple:
+    """
+    Get the (bitsize, masks) that convert or convert_alpha give for the current display
+    """
+    probe = pygame.Surface((1, 1), pygame.SRCALPHA if is_alpha else 0)
+    probe = probe.convert_alpha() if is_alpha else probe.convert()
+    return probe.get_bitsize(), probe.get_masks()
+
+
+def map_file(path):
+    """
+    Memory-map a cache file, or the cache member inside of the zipapp the game is running from
+    :return: (mmap, start offset of the cache in it), or None if there is no cache
+    """
+    if os.path.isfile(path):
+        with open(path, 'rb') as file:
+            return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ), 0
+
+    # running from a zipapp?
+    archive = getattr(__loader__, 'archive', None)
+    if archive is None:
+        return None
+    member = path.replace(os.sep, '/')
+    with zipfile.ZipFile(archive) as zip_file:
+        try:
+            info = zip_file.getinfo(member)
+        except KeyError:
+            return None
+    if info.compress_type != zipfile.ZIP_STORED:
+        return None
+    with open(archive, 'rb') as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    # skip the local file header to get to the data
+    name_length, extra_length = struct.unpack('<HH', mapped[info.header_offset + 26:info.header_offset + 30])
+    return mapped, info.header_offset + 30 + name_length + extra_length
+
+
+class AssetCache:
+    """
+    An open cache file
+    """
+
+    def __init__(self, mapped: mmap.mmap, start: int, header: dict, data_start: int):
+        self.mapped = mapped
+        self.view = memoryview(mapped)
+        self.header = header
+        self.data_start = start + data_start
+        self.image_entries = header['images']
+        self.sound_entries = header['sounds']
+        self.sound_source_entries = header['sound_sources']
+        # the decoded sounds are only any good with the mixer format they were decoded with
+        self.is_pcm_usable = header['mixer'] == _mixer_format()
+        self.music_entries = header['music']
+
+    @classmethod
+    def open(cls, path, source_hashes: dict):
+        """
+        Open a cache file
+        :param path: cache file path
+        :param source_hashes: the current source file hashes, or an empty dict to skip checking them
+        :return: the cache, or None if it is missing or stale. Without source files to rebuild it from, a cache
+        made for another mixer format is still used, and its sounds get decoded again as they are loaded
+        """
+        mapped = map_file(path)
+        if mapped is None:
+            return None
+        mapped, start = mapped
+        header_start = start + len(MAGIC) + 4
+        if mapped[start:start + len(MAGIC)] != MAGIC:
+            return None
+        header_length, = struct.unpack('<I', mapped[start + len(MAGIC):header_start])
+        header = json.loads(mapped[header_start:header_start + header_length])
+        if header['version'] != VERSION:
+            return None
+        if source_hashes and (header['sources'] != source_hashes or header['mixer'] != _mixer_format()):
+            return None
+        data_start = len(MAGIC) + 4 + header_length
+        data_start += -data_start % ALIGNMENT
+        return cls(mapped, start, header, data_start)
+
+    def _blob(self, entry: dict) -> memoryview:
+        start = self.data_start + entry['offset']
+        return self.view[start:start + entry['size']]
+
+    def load_image(self, name: str, display_formats: dict) -> pygame.Surface:
+        entry = self.image_entries[name]
+        width, height = entry['size_px']
+        masks = tuple(entry['masks'])
+        is_alpha = bool(entry['flags'])
+        data = self._blob(entry)
+        same_format = (entry['bitsize'], masks) == display_formats[is_alpha]
+        buffer_format = FROMBUFFER_FORMATS.get(masks)
+        if same_format and is_alpha and buffer_format and entry['pitch'] == width * 4:
+            # no copy, the surface uses the mapped memory
+            image = pygame.image.frombuffer(data, (width, height), buffer_format)
+        else:
+            image = pygame.Surface((width, height), entry['flags'], entry['bitsize'], masks)
+            # straight from the mapped memory into the surface (BufferProxy.write would only take a copy of it)
+            with memoryview(image.get_buffer()) as pixels:
+                pixels[:len(data)] = data
+            if not same_format:
+                # the cache was built for another display, this still beats decoding the PNG again
+                image = image.convert_alpha() if is_alpha else image.convert()
+        if entry['colorkey'] is not None:
+            image.set_colorkey(entry['colorkey'])
+        return image
+
+    def load_images(self) -> dict:
+        display_formats = {is_alpha: _display_format(is_alpha) for is_alpha in (False, True)}
+        return {name: self.load_image(name, display_formats) for name in self.image_entries}
+
+    def has_sound(self, name: str) -> bool:
+        return name in self.sound_entries
+
+    def load_sound(self, name: str) -> pygame.mixer.Sound:
+        if self.is_pcm_usable:
+            return pygame.mixer.Sound(buffer=self._blob(self.sound_entries[name]))
+        return pygame.mixer.Sound(file=io.BytesIO(self._blob(self.sound_source_entries[name])))
+
+    def has_music(self, name: str) -> bool:
+        return name in self.music_entries
+
+    def open_music(self, name: str) -> io.BytesIO:
+        return io.BytesIO(self._blob(self.music_entries[name]))
+
+
+def pack_zipapp(target, project_dir='.', cache_path=None):
+    """
+    Pack the code, the asset cache and the compiled stages into a single runnable zipapp
+    """
+    if cache_path is None:
+        cache_path = os.path.join(project_dir, 'resources', CACHE_FILE_NAME)
+    stage_cache_path = os.path.join(os.path.dirname(cache_path), STAGE_CACHE_FILE_NAME)
+    with zipfile.ZipFile(target + '.tmp', 'w') as zip_file:
+        zip_file.write(os.path.join(project_dir, 'galaga.py'), '__main__.py', zipfile.ZIP_DEFLATED)
+        source_dir = os.path.join(project_dir, 'source')
+        for filename in sorted(os.listdir(source_dir)):
+            if filename.endswith('.py'):
+                zip_file.write(os.path.join(source_dir, filename), 'source/' + filename, zipfile.ZIP_DEFLATED)
+        # stored, so that it can be memory-mapped straight out of the archive
+        zip_file.write(cache_path, 'resources/' + CACHE_FILE_NAME, zipfile.ZIP_STORED)
+        zip_file.write(stage_cache_path, 'resources/' + STAGE_CACHE_FILE_NAME, zipfile.ZIP_STORED)
+    with open(target, 'wb') as file:
+        file.write(b'#!/usr/bin/env python3\n')
+        with open(target + '.tmp', 'rb') as zip_data:
+            file.write(zip_data.read())
+    os.remove(target + '.tmp')
+    os.chmod(target, 0o755)
+
+
+if __name__ == '__main__':
+    # Build the caches (importing setup and loading a stage does that if they are stale) and pack everything
+    # into a zipapp
+    os.environ.setdefault('GALAGA_HEADLESS', '1')
+    from . import setup, stages
+
+    stages.get_stage(stages.FIRST_STAGE)
+
+    pack_zipapp(sys.argv[1] if len(sys.argv) > 1 else 'galaga.pyz')
@@ -0,0 +1,158 @@
+# audio.py
+
+"""
+Sound effects go through here instead of straight to the mixer.
+Each category of effects (the fighter, the enemies, the UI) gets its own reserved mixer channels, so a burst
+of explosions can only ever take the enemies' channels. Each effect can only play so many times at once, and
+past that its oldest voice gets cut off for the new one. Music is streamed with pygame.mixer.music, which
+plays on top of every channel, so nothing can cut it off.
+
+Playing an effect just queues it, and asking for the same one again before it is sent does nothing more.
+Control sends everything queued to the mixer once per frame, after drawing, however many ticks it ran:
+
+    play_sound('fighter_fire')
+"""
+
+from collections import namedtuple
+
+import pygame
+
+from . import setup
+from .profiler import PROFILER
+
+# Categories of sound effects
+PLAYER = 'player'
+ENEMIES = 'enemies'
+UI = 'ui'
+
+# mixer channels reserved for each category
+CATEGORY_CHANNELS = {PLAYER: 2, ENEMIES: 4, UI: 2}
+
+# effect -> category, anything not in here is UI
+SOUND_CATEGORIES = {'fighter_fire': PLAYER,
+                    'explosion': PLAYER,
+                    'fighter_captured': PLAYER,
+                    'fighter_returned': PLAYER,
+                    'enemy_hit_1': ENEMIES,
+                    'enemy_hit_2': ENEMIES,
+                    'enemy_hit_3': ENEMIES,
+                    'enemy_fire': ENEMIES,
+                    'flag_ship_1': ENEMIES,
+                    'flag_ship_2': ENEMIES,
+                    'tractor_beam': ENEMIES}
+
+# most voices of one effect playing at once, anything not in here can play once at a time
+MAX_VOICES = {'fighter_fire': 2, 'enemy_hit_1': 3, 'enemy_hit_2': 3, 'enemy_hit_3': 3, 'explosion': 2,
+              'stage_award': 2}
+
+# What a channel is playing. start is when it started, counted in voices, to tell the oldest apart
+Voice = namedtuple("Voice", "sound_name start")
+
+
+class AudioManager:
+
+    def __init__(self):
+        self.channels = {}  # category -> its reserved pygame.mixer.Channels
+        self.voices = {}  # channel -> Voice, for the last thing played on each channel
+        self.queued = {}  # effect -> None, for the effects to play at the end of the frame, in order
+        self.num_voices = 0  # voices ever started
+        self.num_stolen = 0  # voices cut off for a newer one
+        self.num_coalesced = 0  # plays that got folded into another one of the same frame
+
+    def init(self):
+        """
+        Reserve the channels, once the mixer is up
+        """
+        if not pygame.mixer.get_init():
+            return
+        num_reserved = sum(CATEGORY_CHANNELS.values())
+        pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), num_reserved))
+        # Sound.play() never picks a reserved channel, so nothing else can take them
+        pygame.mixer.set_reserved(num_reserved)
+        first = 0
+        for category, num_channels in CATEGORY_CHANNELS.items():
+            self.channels[category] = [pygame.mixer.Channel(i) for i in range(first, first + num_channels)]
+            first += num_channels
+
+    def play(self, sound_name: str):
+        """
+        Queue an effect (or a music track) to play at the end of the frame
+        """
+        if setup.MUTED or setup.HEADLESS:
+            return
+        if sound_name in self.queued:
+            self.num_coalesced += 1
+            return
+        self.queued[sound_name] = None
+
+    def flush(self):
+        """
+        Send the queued effects to the mixer
+        """
+        if not self.queued:
+            return
+        queued = self.queued
+        self.queued = {}
+        for sound_name in queued:
+            if sound_name in setup.MUSIC_FILES:
+                setup.play_music(sound_name)
+            else:
+                sound = setup.get_sfx(sound_name)
+                if sound is not None:
+                    self._play_sfx(sound_name, sound)
+        PROFILER.count('voices stolen', self.num_stolen)
+
+    def _play_sfx(self, sound_name: str, sound: pygame.mixer.Sound):
+        channels = self.channels.get(SOUND_CATEGORIES.get(sound_name, UI))
+        if not channels:
+            return  # no mixer
+        voices = self.voices
+        free_channel = None
+        oldest_channel = oldest_same_channel = None
+        num_same = 0
+        for channel in channels:
+            voice = voices.get(channel)
+            if voice is None or not channel.get_busy():
+                if free_channel is None:
+                    free_channel = channel
+                continue
+            if oldest_channel is None or voice.start < voices[oldest_channel].start:
+                oldest_channel = channel
+            if voice.sound_name == sound_name:
+                num_same += 1
+                if oldest_same_channel is None or voice.start < voices[oldest_same_channel].start:
+                    oldest_same_channel = channel
+
+        if num_same >= MAX_VOICES.get(sound_name, 1):
+            channel = oldest_same_channel
+        elif free_channel is not None:
+            channel = free_channel
+        else:
+            channel = oldest_channel
+        if channel is not free_channel:
+            self.num_stolen += 1
+        channel.play(sound)
+        voices[channel] = Voice(sound_name, self.num_voices)
+        self.num_voices += 1
+
+    def stop(self):
+        """
+        Stop every sound and the music, and forget anything queued
+        """
+        self.queued.clear()
+        if pygame.mixer.get_init():
+            pygame.mixer.stop()
+            pygame.mixer.music.stop()
+
+
+# the one the game plays everything through
+AUDIO = AudioManager()
+AUDIO.init()
+
+
+def play_sound(sound_name: str):
+    AUDIO.play(sound_name)
+
+
+def stop_sounds():
+    AUDIO.stop()
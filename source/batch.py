@@ -0,0 +1,218 @@
+# batch.py
+
+"""
+Balance testing: lots of seeded headless games over a pool of worker processes.
+Each game is a play state driven by a made-up input policy (see POLICIES), played until the game is over or
+it runs out of ticks. Every game's results, stage by stage, get written out as a line of JSON as soon as
+it is done, so a long run can be looked at while it is still going. At the end, a line with the results of
+every stage summed up over all the games gets written too.
+
+The graphics, sounds and stages get loaded once in the parent process. The workers are forked from it and
+share all of that copy-on-write, so starting one costs next to nothing.
+
+Like simulate, this has to run headless, so use the batch.py script next to galaga.py:
+    python batch.py -n 100000 -j 8 -o results.jsonl
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from . import constants as c, setup, replay, scoring, stages
+from .demo import create_demo_play, step_play
+from .states import new_persist
+
+DEFAULT_MAX_TICKS = 10 * 60 * 1000 // c.SIMULATION_STEP  # 10 minutes of game time
+MAX_GAMES_PER_TASK = 16  # games a worker gets handed at a time, at most
+
+# Input policies by name: (seed, number of ticks) -> replay.InputLog
+POLICIES = {'scripted': lambda seed, num_ticks: replay.scripted_log(seed, num_ticks, c.PLAY_STATE),
+            'random': replay.random_log}
+
+
+def _accuracy(num_hits: int, num_shots: int) -> float:
+    # the same as the game over screen shows
+    return 0 if num_shots == 0 else num_hits / num_shots
+
+
+def play_game(seed: int, policy: str, max_ticks: int = DEFAULT_MAX_TICKS) -> dict:
+    """
+    Play one game until it is over, or until max_ticks
+    :param seed: seed for the game's randomness and for the input policy
+    :param policy: name of the input policy in POLICIES
+    :param max_ticks: the most simulation ticks to play for
+    :return: the results of the game and of each stage it got to
+    """
+    replayer = replay.Replayer(POLICIES[policy](seed, max_ticks))
+    play = create_demo_play(new_persist(seed, scores=scoring.DEFAULT_SCORES))
+    step = c.SIMULATION_STEP
+    stage_results = []
+    # what the totals were when the current stage started
+    stage_num, stage_ticks, stage_score, stage_shots, stage_hits, stage_deaths = play.stage_num, 0, 0, 0, 0, 0
+
+    def end_stage(is_cleared: bool):
+        stage_results.append({'stage': stage_num,
+                              'cleared': is_cleared,
+                              'survival_ms': (ticks - stage_ticks) * step,
+                              'score': play.score - stage_score,
+                              'num_shots': play.num_shots - stage_shots,
+                              'num_hits': play.num_hits - stage_hits,
+                              'accuracy': _accuracy(play.num_hits - stage_hits, play.num_shots - stage_shots),
+                              'deaths': play.num_deaths - stage_deaths})
+
+    ticks = 0
+    while not play.should_show_game_over and not play.is_done:
+        pressed_keys, events = replayer.next_tick()
+        if pressed_keys is None:
+            break
+        step_play(play, pressed_keys, events, step)
+        ticks += 1
+        if play.stage_num != stage_num:
+            end_stage(True)
+            stage_num, stage_ticks, stage_score, stage_shots, stage_hits, stage_deaths = (
+                play.stage_num, ticks, play.score, play.num_shots, play.num_hits, play.num_deaths)
+    end_stage(False)
+
+    return {'type': 'game',
+            'seed': seed,
+            'policy': policy,
+            'is_over': play.should_show_game_over or play.is_done,
+            'survival_ms': ticks * step,
+            'stage': play.stage_num,
+            'score': play.score,
+            'num_shots': play.num_shots,
+            'num_hits': play.num_hits,
+            'accuracy': _accuracy(play.num_hits, play.num_shots),
+            'deaths': play.num_deaths,
+            'stages': stage_results}
+
+
+def _play_games(task: tuple) -> list:
+    seeds, policy, max_ticks = task
+    return [play_game(seed, policy, max_ticks) for seed in seeds]
+
+
+def _start_worker():
+    # SDL turns SIGTERM into a quit event, but a worker has to really stop when the pool terminates it
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    setup.set_muted(True)  # nobody is listening
+
+
+class StageTotals:
+    """
+    The results of one stage summed up over every game that got to it
+    """
+
+    def __init__(self, stage_num: int):
+        self.stage_num = stage_num
+        self.games = 0
+        self.cleared = 0
+        self.survival_ms = 0
+        self.score = 0
+        self.num_shots = 0
+        self.num_hits = 0
+        self.deaths = 0
+
+    def add(self, result: dict):
+        self.games += 1
+        self.cleared += result['cleared']
+        self.survival_ms += result['survival_ms']
+        self.score += result['score']
+        self.num_shots += result['num_shots']
+        self.num_hits += result['num_hits']
+        self.deaths += result['deaths']
+
+    def summary(self) -> dict:
+        games = max(self.games, 1)
+        return {'stage': self.stage_num,
+                'games': self.games,
+                'clear_rate': self.cleared / games,
+                'mean_survival_ms': self.survival_ms / games,
+                'mean_score': self.score / games,
+                'accuracy': _accuracy(self.num_hits, self.num_shots),
+                'deaths_per_game': self.deaths / games}
+
+
+def run_batch(num_games: int, num_workers: int, policy: str, first_seed: int = 0, max_ticks=DEFAULT_MAX_TICKS,
+              out=sys.stdout) -> list:
+    """
+    Play games over a pool of worker processes, writing each game's results to out as they finish
+    :param num_games: how many games to play. Their seeds count up from first_seed
+    :param num_workers: how many worker processes to play them in
+    :param policy: name of the input policy in POLICIES
+    :param max_ticks: the most simulation ticks per game
+    :param out: text file for the lines of JSON
+    :return: the summed up results of each stage (StageTotals.summary), first stage first
+    """
+    if policy not in POLICIES:
+        raise ValueError("unknown input policy {!r}".format(policy))
+
+    # load everything the games need before forking, so the workers all share it
+    stages.preload_all()
+    gc.collect()
+    gc.freeze()  # the collector would otherwise touch (and so copy) every shared object in each worker
+
+    # a few tasks per worker at least, so they all finish at about the same time
+    per_task = max(1, min(MAX_GAMES_PER_TASK, num_games // (num_workers * 4)))
+    last_seed = first_seed + num_games
+    tasks = [(range(seed, min(seed + per_task, last_seed)), policy, max_ticks)
+             for seed in range(first_seed, last_seed, per_task)]
+    totals = {}
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()  # each worker has to load everything itself
+    with context.Pool(num_workers, initializer=_start_worker) as pool:
+        for results in pool.imap_unordered(_play_games, tasks):
+            for result in results:
+                out.write(json.dumps(result) + '\n')
+                for stage_result in result['stages']:
+                    stage_num = stage_result['stage']
+                    if stage_num not in totals:
+                        totals[stage_num] = StageTotals(stage_num)
+                    totals[stage_num].add(stage_result)
+            out.flush()
+    gc.unfreeze()
+
+    summary = [totals[stage_num].summary() for stage_num in sorted(totals)]
+    out.write(json.dumps({'type': 'summary', 'games': num_games, 'policy': policy, 'stages': summary}) + '\n')
+    out.flush()
+    return summary
+
+
+def main(args=None):
+    if not setup.HEADLESS:
+        raise RuntimeError("set {}=1 before importing the game to run batches".format(setup.HEADLESS_ENV_VAR))
+
+    parser = argparse.ArgumentParser(description="Play lots of headless Galaga games for balance testing.")
+    parser.add_argument('-n', '--games', type=int, default=100, help="number of games to play")
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('-p', '--policy', choices=sorted(POLICIES), default='scripted',
+                        help="how the made-up input plays")
+    parser.add_argument('-s', '--seed', type=int, default=0, help="seed of the first game, the next count up from it")
+    parser.add_argument('-t', '--max-ticks', type=int, default=DEFAULT_MAX_TICKS,
+                        help="max. simulation ticks per game")
+    parser.add_argument('-o', '--output', metavar='PATH', help="file to write the JSON lines to, instead of stdout")
+    options = parser.parse_args(args)
+
+    out = open(options.output, 'w') if options.output else sys.stdout
+    start = time.perf_counter()
+    try:
+        summary = run_batch(options.games, options.workers, options.policy, options.seed, options.max_ticks, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds = time.perf_counter() - start
+
+    print("{} games in {:.1f}s ({:.1f} games/s)".format(options.games, seconds, options.games / max(seconds, 1e-9)),
+          file=sys.stderr)
+    print("{:>5} {:>7} {:>7} {:>10} {:>10} {:>9} {:>7}".format(
+        'stage', 'games', 'cleared', 'survival s', 'score', 'accuracy', 'deaths'), file=sys.stderr)
+    for stage in summary:
+        print("{stage:>5} {games:>7} {clear_rate:>7.1%} {survival:>10.1f} {mean_score:>10.0f} {accuracy:>9.1%} "
+              "{deaths_per_game:>7.2f}".format(survival=stage['mean_survival_ms'] / 1000, **stage), file=sys.stderr)
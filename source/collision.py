@@ -0,0 +1,124 @@
+# collision.py
+
+"""
+Broad-phase collision detection with a uniform grid (spatial hash).
+Entities are put into the grid cells that their rects overlap, and only entities sharing a cell get
+tested against each other with colliderect.
+The grid is meant to be rebuilt every tick.
+"""
+
+import pygame
+
+# Layers of things that can collide
+PLAYER = 0
+ENEMIES = 1
+PLAYER_MISSILES = 2
+ENEMY_MISSILES = 3
+NUM_LAYERS = 4
+
+DEFAULT_CELL_SIZE = 32
+
+
+class CollisionGrid:
+    """
+    Uniform grid over a bounding area, holding the sprites of each layer per cell
+    """
+
+    def __init__(self, bounds: pygame.Rect, cell_size: int = DEFAULT_CELL_SIZE):
+        self.bounds = pygame.Rect(bounds)
+        self.cell_size = cell_size
+        self.columns = -(-self.bounds.width // cell_size)
+        self.rows = -(-self.bounds.height // cell_size)
+        # cells[layer][cell index] -> list of sprites
+        self.cells = [[[] for _ in range(self.columns * self.rows)] for _ in range(NUM_LAYERS)]
+        self.members = [[] for _ in range(NUM_LAYERS)]
+        self._used_cells = []  # (layer, cell index) of every non-empty cell, for a cheap clear
+
+    def clear(self):
+        cells = self.cells
+        for layer, index in self._used_cells:
+            cells[layer][index].clear()
+        self._used_cells.clear()
+        for members in self.members:
+            members.clear()
+
+    def _cell_range(self, rect: pygame.Rect):
+        """
+        Get the range of cells a rect overlaps, or None if it is outside the bounds
+        """
+        bounds = self.bounds
+        if not bounds.colliderect(rect):
+            return None
+        size = self.cell_size
+        left = max(rect.left - bounds.left, 0) // size
+        top = max(rect.top - bounds.top, 0) // size
+        right = min(rect.right - 1 - bounds.left, bounds.width - 1) // size
+        bottom = min(rect.bottom - 1 - bounds.top, bounds.height - 1) // size
+        return left, top, right, bottom
+
+    def insert(self, sprite, layer: int):
+        """
+        Add a sprite (anything with a rect) into a layer of the grid
+        """
+        cell_range = self._cell_range(sprite.rect)
+        if cell_range is None:
+            return
+        left, top, right, bottom = cell_range
+        layer_cells = self.cells[layer]
+        columns = self.columns
+        for row in range(top, bottom + 1):
+            for column in range(left, right + 1):
+                index = row * columns + column
+                cell = layer_cells[index]
+                if not cell:
+                    self._used_cells.append((layer, index))
+                cell.append(sprite)
+        self.members[layer].append(sprite)
+
+    def rebuild(self, layers: dict):
+        """
+        Clear the grid and insert every sprite
+        :param layers: maps a layer to an iterable of sprites
+        """
+        self.clear()
+        insert = self.insert
+        for layer, sprites in layers.items():
+            for sprite in sprites:
+                insert(sprite, layer)
+
+    def candidate_pairs(self, layer_a: int, layer_b: int):
+        """
+        Yield each (a, b) pair of sprites from the two layers that share at least one grid cell
+        """
+        cells_a = self.cells[layer_a]
+        cells_b = self.cells[layer_b]
+        # iterate through the smaller layer and look up the other one
+        swap = len(self.members[layer_a]) > len(self.members[layer_b])
+        if swap:
+            cells_a, cells_b = cells_b, cells_a
+            layer_a, layer_b = layer_b, layer_a
+        columns = self.columns
+        for a in self.members[layer_a]:
+            left, top, right, bottom = self._cell_range(a.rect)
+            seen = None
+            multiple_cells = left != right or top != bottom
+            for row in range(top, bottom + 1):
+                for column in range(left, right + 1):
+                    for b in cells_b[row * columns + column]:
+                        if multiple_cells:
+                            # a pair that shares several cells should only come out once
+                            if seen is None:
+                                seen = set()
+                            elif b in seen:
+                                continue
+                            seen.add(b)
+                        if swap:
+                            yield b, a
+                        else:
+                            yield a, b
+
+    def collisions(self, layer_a: int, layer_b: int) -> list:
+        """
+        Get the (a, b) pairs of sprites from the two layers whose rects actually overlap
+        """
+        return [(a, b) for a, b in self.candidate_pairs(layer_a, layer_b) if a.rect.colliderect(b.rect)]
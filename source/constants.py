@@ -2,7 +2,7 @@
 from collections import namedtuple
 
 # persistent data shared between states
-Persist = namedtuple("Persist", "stars scores current_score one_up_score high_score num_shots num_hits stage_num")
+Persist = namedtuple("Persist", "stars scores current_score one_up_score high_score num_shots num_hits stage_num rng")
 
 # Point tuple
 Point = namedtuple("Point", "x y")
@@ -42,7 +42,12 @@ HIT_MISS_RATIO = 'Hit-miss ratio {: >10.1%}'  # text is yellow
 
 # Resources and other file paths
 RESOURCE_DIR = "resources"
-SCORE_FILE = "scores.txt"
+SCORE_FILE = "scores.txt"  # the old high scores, imported into SCORE_DB_FILE once
+SCORE_DB_FILE = "scores.db"  # the leaderboard
+PROFILE_EXPORT_PREFIX = "profile"  # profile.csv and profile.jsonl get written here when profiling
+DEMO_FILE = "demo.rec"  # the recorded game the demo plays back, in RESOURCE_DIR
+STAGE_FILE = "stages.json"  # the enemy waves of each stage, in RESOURCE_DIR
+STAGE_CACHE_FILE = "stages.cache"  # STAGE_FILE compiled, in RESOURCE_DIR
 
 # Game space
 GAME_SIZE = Area(224, 288)
@@ -53,12 +58,16 @@ STAGE_BOTTOM_Y = GAME_SIZE.height - 20  # Y-coord. for the bottom of the stage
 BADGE_Y = GAME_SIZE.height - 19  # Y-coord for the top of the stage badges
 
 # Timing and frequencies:
-FPS = 30  # Frames per second
+FPS = 60  # Frames per second (rendering)
+SIMULATION_STEP = 33  # milliseconds per simulation tick
+SIMULATION_RATE = 1000 / SIMULATION_STEP  # Simulation ticks per second, a bit over 30
+MAX_SIMULATION_STEPS = 5  # max. ticks to catch up on in one frame, after that the game just slows down
 ENEMY_ANIMATION_FREQ = 800  # milliseconds
 TEXT_FLASH_FREQ = 300  # "
 
 # Scoring
 NUM_TRACKED_SCORES = 5
+NO_NAME = '---'  # name on the leaderboard of a game nobody put their name in for
 
 # Used colors
 RED = (255, 0, 0)
@@ -75,8 +84,9 @@ PLAYER_SPEED = 0.085
 
 # Stage enemies formation
 FORMATION_OFFSET_Y = 20
-FORMATION_MIN_SPREAD = 4
-FORMATION_MAX_SPREAD = 8
-FORMATION_MAX_X = 16
+# the 10 slot rows are as wide as the screen can take when both the spread and the sway are at their most
+FORMATION_MIN_SPREAD = 1
+FORMATION_MAX_SPREAD = 5
+FORMATION_MAX_X = 8
 FORMATION_CYCLE_TIME = 8000 # millis
 
@@ -0,0 +1,81 @@
+# demo.py
+
+"""
+The attract mode: a recorded game played back, silently, until its log runs out or someone presses start.
+The log lives in resources/demo.rec and is made with:
+    python -m source.replay resources/demo.rec
+"""
+
+import os
+
+import pygame
+
+from . import constants as c, setup, replay
+from .audio import stop_sounds
+from .play import Play
+from .states import State, new_persist
+
+DEMO_PATH = os.path.join(c.RESOURCE_DIR, c.DEMO_FILE)
+DEMO_SEED = 1981  # for when there is no log file, like in a zipapp
+DEMO_SECONDS = 30
+
+
+def load_demo_log(path=DEMO_PATH) -> replay.InputLog:
+    """
+    Load the demo's log, or make up the usual one if the file isn't there
+    """
+    if os.path.isfile(path):
+        return replay.InputLog.load(path)
+    return replay.scripted_log(DEMO_SEED, DEMO_SECONDS * 1000 // c.SIMULATION_STEP)
+
+
+def create_demo_play(persist: c.Persist) -> Play:
+    """
+    Make the play state the demo runs, which skips the intro music
+    """
+    play = Play(persist)
+    play.done_starting()
+    return play
+
+
+def step_play(play: Play, pressed_keys, events, delta_time: int):
+    """
+    Advance a play state by one tick, the same way Control does
+    """
+    for event in events:
+        play.get_event(event)
+    play.current_time += delta_time
+    play.update(delta_time, pressed_keys)
+
+
+class Demo(State):
+
+    def __init__(self, persist):
+        State.__init__(self, persist)
+        self.log = load_demo_log()
+        self.replayer = replay.Replayer(self.log)
+
+        # The demo's game is a session of its own, with the seed it was recorded with
+        stop_sounds()
+        setup.set_muted(True)
+        self.play = create_demo_play(new_persist(self.log.seed, scores=persist.scores))
+
+    def cleanup(self):
+        setup.set_muted(False)
+        return self.persist
+
+    def get_event(self, event: pygame.event.Event):
+        if event.type == pygame.KEYDOWN and event.key in setup.START_KEYS:
+            self.next_state_name = c.TITLE_STATE
+            self.is_done = True
+
+    def update(self, delta_time: int, keys):
+        pressed_keys, events = self.replayer.next_tick()
+        if pressed_keys is None or self.play.is_done:
+            self.next_state_name = c.TITLE_STATE
+            self.is_done = True
+            return
+        step_play(self.play, pressed_keys, events, delta_time)
+
+    def display(self, surface: pygame.Surface):
+        self.play.display(surface)
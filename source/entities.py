@@ -0,0 +1,199 @@
+# entities.py
+
+"""
+Struct-of-arrays store for the positions and velocities of everything that moves on the stage.
+Each entity is one row in a set of NumPy arrays (float x/y, where it was last tick, velocity, kind and
+flags), so moving every missile is one vectorized step. Gameplay code gets at a single entity through an
+Entity handle, which reads and writes its row as plain Python floats.
+
+Every entity also keeps a pygame.Rect (centered on its rounded position) for collisions. Writing a
+position through a handle updates the rect right away, and the vectorized steps update the rects of
+whatever they moved.
+"""
+
+import weakref
+
+import numpy as np
+import pygame
+
+INITIAL_CAPACITY = 256
+
+# Kinds of entities
+OTHER = 0
+PLAYER = 1
+ENEMY = 2
+PLAYER_MISSILE = 3
+ENEMY_MISSILE = 4
+
+# Flags
+ACTIVE = 1  # the row belongs to an entity
+MOVING = 2  # moved by its velocity in EntityStore.move
+
+
+class EntityStore:
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.capacity = 0
+        self.free_rows = []
+        self.rects = []
+        self.num_entities = 0
+        self._allocate_arrays(capacity)
+
+    def _allocate_arrays(self, capacity: int):
+        """
+        Make the arrays (bigger), keeping the rows there already
+        """
+        old_capacity = self.capacity
+        names = ('x', 'y', 'last_x', 'last_y', 'vel_x', 'vel_y')
+        for name in names:
+            array = np.zeros(capacity)
+            if old_capacity:
+                array[:old_capacity] = getattr(self, name)
+            setattr(self, name, array)
+        for name in ('kind', 'flags'):
+            array = np.zeros(capacity, dtype=np.uint8)
+            if old_capacity:
+                array[:old_capacity] = getattr(self, name)
+            setattr(self, name, array)
+        # memoryviews give plain Python numbers for single rows, a lot faster than indexing an array
+        self.xs, self.ys = memoryview(self.x), memoryview(self.y)
+        self.last_xs, self.last_ys = memoryview(self.last_x), memoryview(self.last_y)
+        self.vel_xs, self.vel_ys = memoryview(self.vel_x), memoryview(self.vel_y)
+        self.kinds, self.flag_list = memoryview(self.kind), memoryview(self.flags)
+
+        self.rects.extend([None] * (capacity - old_capacity))
+        # hand out the low rows first
+        self.free_rows = list(range(capacity - 1, old_capacity - 1, -1)) + self.free_rows
+        self.capacity = capacity
+
+    def add(self, owner, x: float, y: float, width: int, height: int, kind: int = OTHER) -> 'Entity':
+        """
+        Add an entity, which stays in the store for as long as its owner exists
+        :return: its handle
+        """
+        if not self.free_rows:
+            self._allocate_arrays(self.capacity * 2)
+        row = self.free_rows.pop()
+        self.rects[row] = pygame.Rect(0, 0, width, height)
+        self.kinds[row] = kind
+        self.flag_list[row] = ACTIVE
+        self.vel_xs[row] = self.vel_ys[row] = 0.0
+        self.num_entities += 1
+        entity = Entity(self, row)
+        entity.move_to(x, y)
+        entity.save_position()
+        weakref.finalize(owner, self.remove, row)
+        return entity
+
+    def remove(self, row: int):
+        self.flag_list[row] = 0
+        self.rects[row] = None
+        self.free_rows.append(row)
+        self.num_entities -= 1
+
+    def save_positions(self):
+        """
+        Remember every entity's position as where it was last tick, for drawing in between ticks
+        """
+        self.last_x[:] = self.x
+        self.last_y[:] = self.y
+
+    def move(self, delta_time: int):
+        """
+        Move every entity flagged MOVING by its velocity
+        """
+        rows = np.flatnonzero(self.flags & MOVING)
+        if not rows.size:
+            return
+        x = self.x[rows] + self.vel_x[rows] * delta_time
+        y = self.y[rows] + self.vel_y[rows] * delta_time
+        self.x[rows] = x
+        self.y[rows] = y
+        rects = self.rects
+        for row, center in zip(rows.tolist(), zip(np.rint(x).astype(int).tolist(), np.rint(y).astype(int).tolist())):
+            rects[row].center = center
+
+
+class Entity:
+    """
+    Handle to one entity's row in the store
+    """
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store: EntityStore, row: int):
+        self.store = store
+        self.row = row
+
+    @property
+    def rect(self) -> pygame.Rect:
+        return self.store.rects[self.row]
+
+    @property
+    def x(self) -> float:
+        return self.store.xs[self.row]
+
+    @x.setter
+    def x(self, value: float):
+        store = self.store
+        store.xs[self.row] = value
+        store.rects[self.row].centerx = round(value)
+
+    @property
+    def y(self) -> float:
+        return self.store.ys[self.row]
+
+    @y.setter
+    def y(self, value: float):
+        store = self.store
+        store.ys[self.row] = value
+        store.rects[self.row].centery = round(value)
+
+    def move_to(self, x: float, y: float):
+        store = self.store
+        row = self.row
+        store.xs[row] = x
+        store.ys[row] = y
+        store.rects[row].center = (round(x), round(y))
+
+    @property
+    def last_x(self) -> float:
+        return self.store.last_xs[self.row]
+
+    @property
+    def last_y(self) -> float:
+        return self.store.last_ys[self.row]
+
+    def save_position(self):
+        store = self.store
+        row = self.row
+        store.last_xs[row] = store.xs[row]
+        store.last_ys[row] = store.ys[row]
+
+    @property
+    def kind(self) -> int:
+        return self.store.kinds[self.row]
+
+    @kind.setter
+    def kind(self, value: int):
+        self.store.kinds[self.row] = value
+
+    @property
+    def velocity(self) -> tuple:
+        return self.store.vel_xs[self.row], self.store.vel_ys[self.row]
+
+    @velocity.setter
+    def velocity(self, velocity: tuple):
+        """
+        Set the velocity (pixels per milli.), which EntityStore.move moves the entity by
+        """
+        store = self.store
+        row = self.row
+        store.vel_xs[row], store.vel_ys[row] = velocity
+        store.flag_list[row] |= MOVING
+
+    def stop(self):
+        self.store.flag_list[self.row] &= ~MOVING
+
+
+# the store every sprite lives in
+STORE = EntityStore()
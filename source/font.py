@@ -0,0 +1,117 @@
+# font.py
+
+"""
+Bitmap font rendering.
+Glyphs are tinted once per (color, background) pair into an atlas, and whole rendered strings are kept
+in a small LRU cache, so drawing text that does not change is just a blit.
+"""
+
+from collections import OrderedDict, namedtuple
+
+import pygame
+
+from . import setup
+
+MAX_CACHED_STRINGS = 128  # number of rendered strings to keep around
+
+# The font rows on the spritesheet (alphabet row and the digits/symbols row)
+ATLAS_RECT = pygame.Rect(0, setup.FONT_ALPHABET_Y, 26 * setup.FONT_CHAR_SIZE, 2 * setup.FONT_CHAR_SIZE)
+
+FontStats = namedtuple("FontStats", "hits misses hit_rate num_atlases num_strings memory_bytes")
+
+_atlases = {}  # (color, bg_color) -> tinted atlas surface
+_strings = OrderedDict()  # (text, color, bg_color) -> rendered surface
+_hits = 0
+_misses = 0
+
+
+def _color_key(color) -> tuple:
+    # pygame.Color is not hashable, so use plain tuples for the cache keys
+    if color is None:
+        return None
+    return tuple(pygame.Color(color))
+
+
+def _surface_bytes(surface: pygame.Surface) -> int:
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def get_atlas(color, bg_color=None) -> pygame.Surface:
+    """
+    Get the font atlas tinted with the given colors, building it the first time it is needed
+    :param color: color for the glyph pixels
+    :param bg_color: color for the background, or None for a transparent background
+    :return: the tinted atlas surface
+    """
+    key = (_color_key(color), _color_key(bg_color))
+    atlas = _atlases.get(key)
+    if atlas is None:
+        atlas = setup.get_image('sheet').subsurface(ATLAS_RECT).copy()
+        atlas.set_colorkey(None)
+        pixels = pygame.PixelArray(atlas)
+        if bg_color:
+            pixels.replace(pygame.Color('black'), bg_color)
+        pixels.replace(pygame.Color('white'), color)
+        pixels.close()
+        _atlases[key] = atlas
+    return atlas
+
+
+def _render(text: str, color, bg_color=None) -> pygame.Surface:
+    atlas = get_atlas(color, bg_color)
+    size = setup.FONT_CHAR_SIZE
+    surf = pygame.Surface((len(text) * size, size)).convert()
+    if bg_color is None:
+        surf.set_colorkey(pygame.Color('black'), pygame.RLEACCEL)
+    else:
+        surf.fill(bg_color)
+    for i, char in enumerate(text):
+        # get font location for the char, default to unknown symbol
+        font_data = setup.get_from_font(char.lower())
+        if not font_data:
+            font_data = setup.get_from_font(None)
+        area = (font_data[0] - ATLAS_RECT.x, font_data[1] - ATLAS_RECT.y, size, size)
+        surf.blit(atlas, (i * size, 0), area)
+    return surf
+
+
+def render(text: str, color, bg_color=None) -> pygame.Surface:
+    """
+    Get a surface with the text rendered on it using the custom bitmap font.
+    The returned surface is shared through the cache, so don't draw on it.
+    :param text:
+    :param color:
+    :param bg_color:
+    :return:
+    """
+    global _hits, _misses
+    key = (text, _color_key(color), _color_key(bg_color))
+    surf = _strings.get(key)
+    if surf is not None:
+        _hits += 1
+        _strings.move_to_end(key)
+        return surf
+    _misses += 1
+    surf = _render(text, color, bg_color)
+    _strings[key] = surf
+    if len(_strings) > MAX_CACHED_STRINGS:
+        _strings.popitem(last=False)
+    return surf
+
+
+def get_stats() -> FontStats:
+    """
+    Get the cache hit rate and how much memory the atlases and cached strings use
+    """
+    total = _hits + _misses
+    hit_rate = _hits / total if total else 0.0
+    memory = sum(_surface_bytes(s) for s in _atlases.values()) + sum(_surface_bytes(s) for s in _strings.values())
+    return FontStats(_hits, _misses, hit_rate, len(_atlases), len(_strings), memory)
+
+
+def clear_cache():
+    global _hits, _misses
+    _atlases.clear()
+    _strings.clear()
+    _hits = 0
+    _misses = 0
@@ -0,0 +1,102 @@
+# formation.py
+
+"""
+The enemy formation, which sways side to side and breathes in and out.
+The sway and the breathing only depend on the time within FORMATION_CYCLE_TIME, so they get looked up in
+tables made from tools.calc_formation (one entry per milli.) instead of being worked out again. Each tick
+the position of every slot gets updated once, and the enemies just read theirs by slot index.
+"""
+
+import numpy as np
+
+from . import constants as c
+from .tools import calc_formation
+
+NUM_COLUMNS = 10
+NUM_ROWS = 5
+NUM_SLOTS = NUM_COLUMNS * NUM_ROWS
+SLOT_SIZE = 16
+
+# Galaga's 40 enemy formation: (type, formation column, formation row)
+LAYOUT = ([('boss', x, 0) for x in range(3, 7)] +
+          [('butterfly', x, y) for y in (1, 2) for x in range(1, 9)] +
+          [('bee', x, y) for y in (3, 4) for x in range(10)])
+
+
+def _make_tables() -> tuple:
+    spreads = np.empty(c.FORMATION_CYCLE_TIME, dtype=np.intp)
+    x_offsets = np.empty(c.FORMATION_CYCLE_TIME, dtype=np.intp)
+    for time in range(c.FORMATION_CYCLE_TIME):
+        spreads[time], x_offsets[time], _ = calc_formation(time)
+    return spreads, x_offsets
+
+
+# spread and x offset of the formation for each milli. of the cycle
+SPREAD_TABLE, X_OFFSET_TABLE = _make_tables()
+
+
+def _centered_origin_x() -> int:
+    # the origin_x that centers everywhere the formation reaches over the whole cycle
+    left = int(X_OFFSET_TABLE.min())
+    right = int((X_OFFSET_TABLE + (NUM_COLUMNS - 1) * (SLOT_SIZE + SPREAD_TABLE)).max()) + SLOT_SIZE
+    return (c.GAME_SIZE.width - (right - left)) // 2 - left
+
+
+# Play's formation, which never goes off the sides of the screen
+CENTERED_ORIGIN_X = _centered_origin_x()
+
+# formation column and row of each slot
+_SLOT_COLUMNS = np.tile(np.arange(NUM_COLUMNS), NUM_ROWS)
+_SLOT_ROWS = np.repeat(np.arange(NUM_ROWS), NUM_COLUMNS)
+
+
+def slot_index(formation_x: int, formation_y: int) -> int:
+    return formation_y * NUM_COLUMNS + formation_x
+
+
+class Formation:
+    """
+    Where every slot of the formation is right now
+    """
+
+    def __init__(self, origin_x: int = 0, origin_y: int = c.STAGE_TOP_Y + 16):
+        """
+        :param origin_x: how far right of where tools.calc_formation_pos puts the slots they are
+        :param origin_y: how far down of where tools.calc_formation_pos puts the slots they are. By default the
+        formation hangs 16 px below the top of the stage, where Play has always drawn it
+        """
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.spread = None
+        self.x_offset = None
+        self.y_offset = origin_y + c.FORMATION_OFFSET_Y
+        # top left corner of each slot: where tools.calc_formation_pos puts it, moved by the origin
+        self.positions = np.zeros((NUM_SLOTS, 2), dtype=np.intp)
+        self.slot_positions = []  # the same, as a list of (x, y) tuples for reading one at a time
+        self.update(0)
+
+    def update(self, time: int):
+        """
+        Move the formation to where it is at a time (millis.)
+        """
+        if isinstance(time, int):
+            index = time % c.FORMATION_CYCLE_TIME
+            spread = int(SPREAD_TABLE[index])
+            x_offset = int(X_OFFSET_TABLE[index]) + self.origin_x
+        else:
+            spread, x_offset, _ = calc_formation(time)
+            x_offset += self.origin_x
+        # they are whole pixels, so most ticks nothing moves
+        if spread == self.spread and x_offset == self.x_offset:
+            return
+        self.spread = spread
+        self.x_offset = x_offset
+
+        step = SLOT_SIZE + spread
+        self.positions[:, 0] = x_offset + _SLOT_COLUMNS * step
+        self.positions[:, 1] = self.y_offset + _SLOT_ROWS * step
+        self.slot_positions = list(zip(self.positions[:, 0].tolist(), self.positions[:, 1].tolist()))
+
+    def slot_center(self, slot: int) -> tuple:
+        x, y = self.slot_positions[slot]
+        return x + SLOT_SIZE // 2, y + SLOT_SIZE // 2
@@ -0,0 +1,56 @@
+# frames.py
+
+"""
+Names for the sprite frames on the spritesheet.
+setup.py cuts each of these out once at load time (see setup.load_frames).
+"""
+
+from .constants import Rectangle
+
+SCORE_DIGIT_Y = 240
+SCORE_DIGIT_WIDTH = 4
+SCORE_DIGIT_HEIGHT = 8
+
+SHEET_FRAMES = {
+    # fighter
+    'fighter': Rectangle(96, 0, 16, 16),
+
+    # enemies (2 frames of flapping each)
+    'boss_1': Rectangle(96, 16, 16, 16),
+    'boss_2': Rectangle(112, 16, 16, 16),
+    'boss_hit_1': Rectangle(224, 16, 16, 16),
+    'boss_hit_2': Rectangle(240, 16, 16, 16),
+    'butterfly_1': Rectangle(96, 32, 16, 16),
+    'butterfly_2': Rectangle(112, 32, 16, 16),
+    'bee_1': Rectangle(224, 32, 16, 16),
+    'bee_2': Rectangle(240, 32, 16, 16),
+
+    # missiles
+    'enemy_missile': Rectangle(246, 51, 3, 8),
+    'player_missile': Rectangle(246, 67, 3, 8),
+
+    # explosions
+    'explosion_1': Rectangle(224, 80, 16, 16),
+    'explosion_2': Rectangle(240, 80, 16, 16),
+    'explosion_3': Rectangle(224, 96, 16, 16),
+    'explosion_4': Rectangle(0, 112, 32, 32),
+    'explosion_5': Rectangle(32, 112, 32, 32),
+    'player_explosion_1': Rectangle(64, 112, 32, 32),
+    'player_explosion_2': Rectangle(96, 112, 32, 32),
+    'player_explosion_3': Rectangle(128, 112, 32, 32),
+    'player_explosion_4': Rectangle(160, 112, 32, 32),
+
+    # HUD icons
+    'life': Rectangle(96, 0, 16, 16),
+    'badge_1': Rectangle(208, 48, 7, 16),
+    'badge_5': Rectangle(192, 48, 7, 16),
+    'badge_10': Rectangle(176, 48, 14, 16),
+    'badge_20': Rectangle(160, 48, 15, 16),
+    'badge_30': Rectangle(144, 48, 16, 16),
+    'badge_50': Rectangle(128, 48, 16, 16),
+}
+
+# small digits for the score popups
+for _digit in range(10):
+    SHEET_FRAMES['score_digit_{}'.format(_digit)] = Rectangle(_digit * SCORE_DIGIT_WIDTH, SCORE_DIGIT_Y,
+                                                              SCORE_DIGIT_WIDTH, SCORE_DIGIT_HEIGHT)
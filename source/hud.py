@@ -1,102 +1,156 @@
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 import pygame
 
-from . import constants as c
+from . import constants as c, render
 from .constants import Point
-from .tools import draw_text, grab_sheet
+from .setup import get_frame
+from .tools import draw_text
 
 GuiTuple = namedtuple("GuiTuple", "life stage_1 stage_5 stage_10 stage_20 stage_30 stage_50")
 
 BLINK_1UP = 450  # milliseconds
 
 # sprite resources for HUD
-ICONS = GuiTuple(grab_sheet(96, 0, 16, 16), grab_sheet(208, 48, 7, 16), grab_sheet(192, 48, 7, 16),
-                 grab_sheet(176, 48, 14, 16), grab_sheet(160, 48, 15, 16), grab_sheet(144, 48, 16, 16),
-                 grab_sheet(128, 48, 16, 16))
-
-
-def draw_lives(screen, num_extra_lives):
-    # lives
-    for i in range(num_extra_lives):
-        screen.blit(ICONS.life, (3 + i * 16, c.STAGE_BOTTOM_Y + 1, 16, 16))
-
-
-def draw_stage_badges(screen, stage_badges, stage_badge_animation_step):
-    # draw the stage level badges
-    draw_x = c.GAME_SIZE.width
-    h = c.BADGE_Y
-    number_to_draw = stage_badge_animation_step
-
-    for n in range(stage_badges.stage_1):
-        if number_to_draw > 0:
-            draw_x -= 8
-            screen.blit(ICONS.stage_1, (draw_x, h, 7, 16))
-            number_to_draw -= 1
+ICONS = GuiTuple(get_frame('life'), get_frame('badge_1'), get_frame('badge_5'), get_frame('badge_10'),
+                 get_frame('badge_20'), get_frame('badge_30'), get_frame('badge_50'))
+
+# The bands above and below the stage the HUD is drawn in
+TOP_RECT = pygame.Rect(0, 0, c.GAME_SIZE.width, c.STAGE_TOP_Y)
+BOTTOM_RECT = pygame.Rect(0, c.STAGE_BOTTOM_Y, c.GAME_SIZE.width, c.GAME_SIZE.height - c.STAGE_BOTTOM_Y)
+BADGE_HEIGHT = 16
+MAX_CACHED_BADGE_STRIPS = 32
+
+
+def _badge_icons(stage_badges, stage_badge_animation_step) -> list:
+    """
+    Get the badges to show, right to left
+    :return: list of (icon, width the icon takes up)
+    """
+    kinds = ((stage_badges.stage_1, ICONS.stage_1, 8),
+             (stage_badges.stage_5, ICONS.stage_5, 8),
+             (stage_badges.stage_10, ICONS.stage_10, 14),
+             (stage_badges.stage_20, ICONS.stage_20, 16),
+             (stage_badges.stage_30, ICONS.stage_30, 16),
+             (stage_badges.stage_50, ICONS.stage_50, 16))
+    icons = [(icon, width) for count, icon, width in kinds for _ in range(count)]
+    return icons[:max(stage_badge_animation_step, 0)]
+
+
+def render_badge_strip(stage_badges, stage_badge_animation_step) -> pygame.Surface:
+    """
+    Draw the stage badges onto a strip of their own, which goes against the right side of the screen
+    """
+    icons = _badge_icons(stage_badges, stage_badge_animation_step)
+    # noinspection PyArgumentList
+    strip = pygame.Surface((sum(width for _, width in icons), BADGE_HEIGHT)).convert()
+    strip.fill(c.BLACK)
+    draw_x = strip.get_width()
+    for icon, width in icons:
+        draw_x -= width
+        strip.blit(icon, (draw_x, 0))
+    return strip
+
+
+class HudLayer:
+    """
+    The HUD, drawn onto a surface for the top band and one for the bottom band.
+    Each field (the scores, the lives, the badges) gets drawn again only when what it shows changes. The band
+    with the change gets drawn onto a new copy of itself, so render's dirty rect tracking sees it.
+    """
+
+    def __init__(self):
+        self.top = self._new_band(TOP_RECT)
+        draw_text(self.top, c.HI_SCORE_MESSAGE, Point(c.GAME_CENTER.x, 10), c.RED, center_x=True)
+        self.bottom = self._new_band(BOTTOM_RECT)
+        self.keyed_top = None  # the top band with black see-through, for while it scrolls
+        self.keyed_top_source = None  # the top band it was made from
+        self.values = {}  # field name -> the value it shows
+        self.rects = {}  # field name -> where it was drawn on its band, to clear it
+        self.badge_strips = OrderedDict()  # (stage badges, animation step) -> strip, the most recent ones
+
+    @staticmethod
+    def _new_band(rect: pygame.Rect) -> pygame.Surface:
+        # noinspection PyArgumentList
+        band = pygame.Surface(rect.size).convert()
+        band.fill(c.BLACK)
+        return band
+
+    def _changed_fields(self, fields: dict) -> list:
+        changed = [name for name, value in fields.items() if self.values.get(name, self) != value]
+        self.values.update(fields)
+        return changed
+
+    def _clear(self, band: pygame.Surface, name: str):
+        rect = self.rects.pop(name, None)
+        if rect is not None:
+            band.fill(c.BLACK, rect)
+
+    def get_badge_strip(self, stage_badges, stage_badge_animation_step) -> pygame.Surface:
+        key = (stage_badges, stage_badge_animation_step)
+        strip = self.badge_strips.get(key)
+        if strip is not None:
+            self.badge_strips.move_to_end(key)
+            return strip
+        strip = self.badge_strips[key] = render_badge_strip(stage_badges, stage_badge_animation_step)
+        if len(self.badge_strips) > MAX_CACHED_BADGE_STRIPS:
+            self.badge_strips.popitem(last=False)
+        return strip
+
+    def update(self, one_up_score: int, high_score: int, num_extra_lives=0, stage_badges=None,
+               stage_badge_animation_step=None, show_1up=True):
+        """
+        Bring the bands up to date with what the HUD should show
+        """
+        changed = self._changed_fields({'1up': show_1up, 'score': one_up_score, 'high_score': high_score})
+        if changed:
+            top = self.top = self.top.copy()
+            for name in changed:
+                self._clear(top, name)
+            if '1up' in changed and show_1up:
+                self.rects['1up'] = draw_text(top, c.ONE_UP, Point(20, 10), c.RED)
+            if 'score' in changed:
+                self.rects['score'] = draw_text(top, c.HI_SCORE_NUM_FORMAT.format(one_up_score), Point(20, 20),
+                                                c.WHITE)
+            if 'high_score' in changed:
+                self.rects['high_score'] = draw_text(top, c.HI_SCORE_NUM_FORMAT.format(high_score), Point(83, 20),
+                                                     c.WHITE)
+
+        if stage_badges is None:
+            stage_badge_animation_step = None
+        changed = self._changed_fields({'lives': num_extra_lives,
+                                        'badges': (stage_badges, stage_badge_animation_step)})
+        if changed:
+            bottom = self.bottom = self.bottom.copy()
+            for name in changed:
+                self._clear(bottom, name)
+            if 'lives' in changed and num_extra_lives:
+                rects = [bottom.blit(ICONS.life, (3 + i * 16, 1)) for i in range(num_extra_lives)]
+                self.rects['lives'] = rects[0].unionall(rects[1:])
+            if 'badges' in changed and stage_badges is not None:
+                strip = self.get_badge_strip(stage_badges, stage_badge_animation_step)
+                self.rects['badges'] = bottom.blit(strip, (bottom.get_width() - strip.get_width(),
+                                                           c.BADGE_Y - BOTTOM_RECT.y))
+
+    def display(self, screen: pygame.Surface, offset_y: int = 0):
+        if offset_y:
+            # the band stays put while its text scrolls, over whatever is behind it
+            if self.keyed_top_source is not self.top:
+                self.keyed_top_source = self.top
+                self.keyed_top = self.top.copy()
+                self.keyed_top.set_colorkey(c.BLACK, pygame.RLEACCEL)
+            render.fill(screen, c.BLACK, TOP_RECT)
+            render.blit(screen, self.keyed_top, (0, offset_y))
         else:
-            return
+            render.blit(screen, self.top, TOP_RECT.topleft)
+        render.blit(screen, self.bottom, BOTTOM_RECT.topleft)
 
-    for n in range(stage_badges.stage_5):
-        if number_to_draw > 0:
-            draw_x -= 8
-            screen.blit(ICONS.stage_5, (draw_x, h, 7, 16))
-            number_to_draw -= 1
-        else:
-            return
 
-    for n in range(stage_badges.stage_10):
-        if number_to_draw > 0:
-            draw_x -= 14
-            screen.blit(ICONS.stage_10, (draw_x, h, 14, 16))
-            number_to_draw -= 1
-        else:
-            return
-
-    for n in range(stage_badges.stage_20):
-        if number_to_draw > 0:
-            draw_x -= 16
-            screen.blit(ICONS.stage_20, (draw_x, h, 16, 16))
-            number_to_draw -= 1
-        else:
-            return
-
-    for n in range(stage_badges.stage_30):
-        if number_to_draw > 0:
-            draw_x -= 16
-            screen.blit(ICONS.stage_30, (draw_x, h, 16, 16))
-            number_to_draw -= 1
-        else:
-            return
-
-    for n in range(stage_badges.stage_50):
-        if number_to_draw > 0:
-            draw_x -= 16
-            screen.blit(ICONS.stage_50, (draw_x, h, 16, 16))
-            number_to_draw -= 1
-        else:
-            return
+# the HUD every state shows
+HUD = HudLayer()
 
 
 def display(screen: pygame.Surface, one_up_score: int, high_score: int, offset_y: int = 0, num_extra_lives=0,
             stage_badges=None, stage_badge_animation_step=None, show_1up=True):
-    # clear the top and bottom for the hud when in play state
-    screen.fill(pygame.Color('black'), (0, 0, c.GAME_SIZE.width, c.STAGE_TOP_Y))
-    screen.fill(pygame.Color('black'), (0, c.STAGE_BOTTOM_Y, c.GAME_SIZE.width,
-                                        c.GAME_SIZE.height - c.STAGE_BOTTOM_Y))
-
-    # 1UP score
-    if show_1up:
-        draw_text(screen, c.ONE_UP, Point(20, 10 + offset_y), c.RED)
-    score_string = c.HI_SCORE_NUM_FORMAT.format(one_up_score)
-    draw_text(screen, score_string, Point(20, 20 + offset_y), c.WHITE)
-
-    # high score
-    high_score_string = c.HI_SCORE_NUM_FORMAT.format(high_score)
-    draw_text(screen, c.HI_SCORE_MESSAGE, Point(c.GAME_CENTER.x, 10 + offset_y), c.RED, center_x=True)
-    draw_text(screen, high_score_string, Point(83, 20 + offset_y), c.WHITE)
-
-    if num_extra_lives:
-        draw_lives(screen, num_extra_lives=num_extra_lives)
-
-    if stage_badges is not None:
-        draw_stage_badges(screen, stage_badges, stage_badge_animation_step)
+    HUD.update(one_up_score, high_score, num_extra_lives, stage_badges, stage_badge_animation_step, show_1up)
+    HUD.display(screen, offset_y)
@@ -1,80 +1,189 @@
 # main.py
 # Author: Izak Halseide
 
+import argparse
+
 import pygame
-from . import constants as c
-from .states import GameOver, Demo, Title, ScoreEntry, State
+from . import constants as c, render, replay, scoring
+from .audio import AUDIO
+from .profiler import PROFILER
+from .states import GameOver, Title, ScoreEntry, State, new_persist
 from .play import Play
+from .demo import Demo
 
+# Every game state, by name
+STATES = {c.TITLE_STATE: Title,
+          c.PLAY_STATE: Play,
+          c.SCORE_ENTRY_STATE: ScoreEntry,
+          c.GAME_OVER_STATE: GameOver,
+          c.DEMO_STATE: Demo}
 
 class Control(object):
     """
     Main class for running the game states and window
     """
 
-    def __init__(self, state_dict: dict, initial_state_name: str, persist=None):
+    def __init__(self, state_dict: dict, initial_state_name: str, persist=None, headless=False, uncapped=False,
+                 recorder=None, replayer=None):
         # Init
         self.state_dict = state_dict
         self.state_name = initial_state_name
+        self.headless = headless  # draw frames (if at all) without showing them
+        self.uncapped = uncapped  # run one tick per loop as fast as possible instead of in real time
+        self.recorder: replay.Recorder = recorder  # records the input of every tick
+        self.replayer: replay.Replayer = replayer  # feeds recorded input instead of the keyboard's
 
         self.clock = pygame.time.Clock()
         self.fps: int = c.FPS
+        self.simulation_time = 0  # milliseconds of game time that have been simulated
+        self.accumulator = 0  # milliseconds of real time that haven't been simulated yet
         self.paused = False
         self.running = True
         self.screen: pygame.Surface = pygame.display.get_surface()
         state_class: State.__class__ = self.state_dict[self.state_name]
         self.state: State = state_class(persist=persist)
+        self.state.start_time = self.state.current_time = self.simulation_time
+        self.state.preload()
 
     def flip_state(self):
         persist = self.state.cleanup()
         self.state_name = self.state.next_state_name
         state_class = self.state_dict[self.state_name]
         self.state = state_class(persist)
-        self.state.state_start_time = pygame.time.get_ticks()
+        self.state.start_time = self.state.current_time = self.simulation_time
+        self.state.preload()
 
     def poll_events(self):
+        events = []
         for event in pygame.event.get():
             event_type = event.type
             if event_type == pygame.QUIT:
                 self.running = False
                 self.state.cleanup()
                 return
-            self.state.get_event(event)
-        pressed_keys = pygame.key.get_pressed()
+            if event_type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                PROFILER.toggle()
+            elif event_type == pygame.KEYDOWN and event.key == pygame.K_F5:
+                render.toggle_mode()
+            elif event_type == pygame.KEYDOWN and event.key == pygame.K_F6:
+                render.toggle_diff_view()
+            elif event_type == pygame.KEYDOWN and event.key == pygame.K_F7:
+                render.toggle_palette_mode()
+            elif self.replayer is None:
+                self.state.get_event(event)
+                events.append(event)
+
+        if self.replayer is not None:
+            # the keyboard is ignored, the input comes from the log
+            pressed_keys, events = self.replayer.next_tick()
+            if pressed_keys is None:
+                self.running = False
+                return
+            for event in events:
+                self.state.get_event(event)
+        else:
+            pressed_keys = pygame.key.get_pressed()
+        if self.recorder is not None:
+            self.recorder.record(pressed_keys, events)
         return pressed_keys
 
+    def step(self):
+        """
+        Advance the game by one fixed simulation tick
+        """
+        # Poll events and get the pressed keys from pygame
+        pressed_keys = self.poll_events()
+        if not self.running:
+            return
+
+        self.simulation_time += c.SIMULATION_STEP
+        self.state.current_time = self.simulation_time  # update the state's time for it
+        with PROFILER.phase('update'):
+            self.state.update(c.SIMULATION_STEP, pressed_keys)
+
+        if self.state.is_done:
+            self.flip_state()
+        elif self.state.is_quit:
+            self.running = False
+
+    def draw_frame(self):
+        surface = render.frame_surface(self.screen)
+        render.begin_frame(surface)
+        with PROFILER.phase('display'):
+            self.state.display(surface)
+        PROFILER.display(surface)
+        if not self.headless:
+            with PROFILER.phase('present'):
+                render.present(self.screen)
+
     def main_loop(self):
+        max_lag = c.SIMULATION_STEP * c.MAX_SIMULATION_STEPS
         while self.running:
-            # TODO: fix huge delta times when the window gets unfocused or something (if possible?)
-            delta_time = self.clock.tick(self.fps)
-
-            # Poll events and get the pressed keys from pygame
-            pressed_keys = self.poll_events()
+            if self.uncapped:
+                self.clock.tick()
+                self.step()
+                render.interpolation = 1.0
+            else:
+                # Simulate in fixed steps for however much real time has passed. Long stalls (like when the
+                # window gets unfocused or dragged) are capped instead of being caught up on all at once.
+                self.accumulator = min(self.accumulator + self.clock.tick(self.fps), max_lag)
+                while self.running and self.accumulator >= c.SIMULATION_STEP:
+                    self.step()
+                    self.accumulator -= c.SIMULATION_STEP
+                # Draw in between the last two ticks
+                render.interpolation = self.accumulator / c.SIMULATION_STEP
             if not self.running:
                 break
 
-            self.state.current_time = pygame.time.get_ticks()  # update the state's time for it
-            self.state.update(delta_time, pressed_keys)
-
-            if self.state.is_done:
-                self.flip_state()
-            elif self.state.is_quit:
-                self.running = False
+            self.draw_frame()
+            # the sounds of every tick since the last frame
+            AUDIO.flush()
 
-            self.state.display(self.screen)
-            pygame.display.update()
 
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Play Galaga.")
+    parser.add_argument('--seed', type=int, help="seed for the game's randomness")
+    parser.add_argument('--record', metavar='PATH', help="record the input of the session to a file")
+    parser.add_argument('--replay', metavar='PATH', help="play back a recorded session")
+    parser.add_argument('--uncapped', action='store_true', help="run as fast as possible instead of in real time")
+    parser.add_argument('--palette', action='store_true', help="draw with an 8-bit palette, like the arcade machine")
+    parser.add_argument('--scale', type=int, choices=render.SCALES, default=1,
+                        help="make the window this many times bigger")
+    parser.add_argument('--scale-path', choices=render.SCALE_PATHS, default=render.SCALED,
+                        help="how frames get scaled up to the window (see source/render.py)")
+    options = parser.parse_args(args)
+    if options.record and options.replay:
+        parser.error("can't record and replay at the same time")
+    if options.palette:
+        render.set_palette_mode(True)
+    if options.scale != 1:
+        render.set_scale(options.scale, options.scale_path)
 
-def main():
     # This function begins the main game loop inside the CONTROL class
     initial_state = c.TITLE_STATE
-    state_dict = {c.TITLE_STATE: Title,
-                  c.PLAY_STATE: Play,
-                  c.SCORE_ENTRY_STATE: ScoreEntry,
-                  c.GAME_OVER_STATE: GameOver,
-                  c.DEMO_STATE: Demo}
+    state_dict = STATES
+    seed = options.seed
+    replayer = recorder = None
+    if options.replay:
+        try:
+            log = replay.InputLog.load(options.replay)
+        except ValueError as e:
+            parser.error(str(e))
+        if log.initial_state_name == c.DEMO_STATE:
+            parser.error("the demo's log gets played by the demo itself")
+        # a replayed game doesn't go on the leaderboard again
+        scoring.set_leaderboard(scoring.Leaderboard(scoring.MEMORY, import_path=c.SCORE_FILE))
+        replayer = replay.Replayer(log)
+        initial_state = log.initial_state_name
+        seed = log.seed
     # persist = c.Persist(stars=Stars(), scores=[], current_score=16000, one_up_score=0, high_score=100000, \
     # num_shots=132, num_hits=257)
-    persist = None
-    the_galaga = Control(state_dict=state_dict, initial_state_name=initial_state, persist=persist)
+    persist = new_persist(seed)
+    if options.record:
+        recorder = replay.Recorder(replay.InputLog(persist.rng.seed, initial_state))
+    the_galaga = Control(state_dict=state_dict, initial_state_name=initial_state, persist=persist,
+                         uncapped=options.uncapped, recorder=recorder, replayer=replayer)
     the_galaga.main_loop()
+    if recorder is not None:
+        recorder.log.save(options.record)
+    PROFILER.export()
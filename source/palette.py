@@ -0,0 +1,137 @@
+# palette.py
+
+"""
+The colors of the 8-bit palettized framebuffer mode (see render.set_palette_mode).
+Like the arcade machine, everything on the screen comes out of one palette of 256 colors. Every color in the
+graphics and the game's colors gets an entry, and images get converted to 8-bit surfaces with the same
+palette (exactly, without any dithering) the first time they are drawn.
+
+A couple of entries are set aside for things that change color as a whole. The title logo is drawn with its
+own entry, so flashing it is just changing what color that entry shows, when the frame gets presented.
+"""
+
+import numpy as np
+import pygame
+
+from . import constants as c, setup
+
+NUM_COLORS = 256
+TRANSPARENT = 0  # the colorkey of converted images
+TITLE = 1  # the title logo
+FIRST_SHARED = 2  # entries from here on are the plain colors
+
+PALETTE = None  # list of NUM_COLORS (r, g, b)
+_shared_colors = None  # numpy array of the plain colors, for finding the nearest one
+_shared_packed = None  # the plain colors packed into 0xRRGGBB ints, sorted the same
+_title_image = None
+_title_colors = {}  # id of a title image -> its color
+
+
+def _opaque_colors(image: pygame.Surface) -> np.ndarray:
+    rgb = pygame.surfarray.array3d(image).reshape(-1, 3)
+    return rgb[~_transparent_mask(image).reshape(-1)]
+
+
+def _transparent_mask(image: pygame.Surface) -> np.ndarray:
+    if image.get_flags() & pygame.SRCALPHA:
+        return pygame.surfarray.array_alpha(image) < 128
+    colorkey = image.get_colorkey()
+    if colorkey is not None:
+        return pygame.surfarray.array_colorkey(image) == 0
+    return np.zeros(image.get_size(), dtype=bool)
+
+
+def _build_palette():
+    global PALETTE, _shared_colors, _shared_packed
+    from .stars import LAYERS  # stars draws through render, which uses this module
+    colors = {tuple(pygame.Color(color))[:3] for color in (c.BLACK, c.WHITE, c.RED, c.BLUE, c.YELLOW,
+                                                             c.LIGHT_BLUE, c.LIGHT_GREEN)}
+    for layer in LAYERS:
+        colors.update(layer.colors)
+    for image in setup.GRAPHICS.values():
+        colors.update(map(tuple, np.unique(_opaque_colors(image), axis=0).tolist()))
+    colors = sorted(colors)
+    if len(colors) > NUM_COLORS - FIRST_SHARED:
+        raise ValueError("the graphics have {} colors, more than the palette holds".format(len(colors)))
+
+    # the entries set aside stay black, so a plain color drawn onto the frame never picks the title's entry
+    PALETTE = [(0, 0, 0)] * NUM_COLORS
+    PALETTE[FIRST_SHARED:FIRST_SHARED + len(colors)] = colors
+    _shared_colors = np.array(colors, dtype=np.int32)
+    _shared_packed = (_shared_colors[:, 0] << 16) | (_shared_colors[:, 1] << 8) | _shared_colors[:, 2]
+
+
+def get_palette() -> list:
+    if PALETTE is None:
+        _build_palette()
+    return PALETTE
+
+
+def get_display_colors() -> list:
+    """
+    Get what each entry shows when the frame is presented, to start with
+    """
+    colors = list(get_palette())
+    colors[TITLE] = title_color(setup.get_image('light_title'))
+    return colors
+
+
+def new_surface(size) -> pygame.Surface:
+    """
+    Make an 8-bit surface with the palette
+    """
+    # noinspection PyArgumentList
+    surface = pygame.Surface(size, depth=8)
+    surface.set_palette(get_palette())
+    return surface
+
+
+def to_indexed(image: pygame.Surface, index: int = None) -> pygame.Surface:
+    """
+    Convert an image to an 8-bit surface with the palette. Colors that aren't in the palette get the nearest
+    one, and see-through pixels get TRANSPARENT
+    :param index: draw every pixel that isn't see-through with this entry instead
+    """
+    get_palette()
+    transparent = _transparent_mask(image)
+    if index is None:
+        rgb = pygame.surfarray.array3d(image)
+        packed = (rgb[..., 0].astype(np.int32) << 16) | (rgb[..., 1].astype(np.int32) << 8) | rgb[..., 2]
+        # the plain colors are sorted, and so are their packed values
+        found = np.minimum(np.searchsorted(_shared_packed, packed), len(_shared_packed) - 1)
+        indices = (found + FIRST_SHARED).astype(np.uint8)
+        missing = (_shared_packed[found] != packed) & ~transparent
+        if missing.any():
+            for value in np.unique(packed[missing]).tolist():
+                color = (value >> 16, (value >> 8) & 0xff, value & 0xff)
+                nearest = FIRST_SHARED + int(np.argmin(((_shared_colors - color) ** 2).sum(axis=1)))
+                indices[missing & (packed == value)] = nearest
+    else:
+        indices = np.full(image.get_size(), index, dtype=np.uint8)
+    indices[transparent] = TRANSPARENT
+
+    surface = new_surface(image.get_size())
+    pygame.surfarray.blit_array(surface, indices)
+    if transparent.any():
+        surface.set_colorkey(TRANSPARENT, pygame.RLEACCEL)
+    return surface
+
+
+def title_color(image: pygame.Surface) -> tuple:
+    """
+    Get the color a title logo image is drawn in
+    """
+    color = _title_colors.get(id(image))
+    if color is None:
+        color = _title_colors[id(image)] = tuple(_opaque_colors(image)[0].tolist())
+    return color
+
+
+def get_title_image() -> pygame.Surface:
+    """
+    Get the title logo drawn with the TITLE entry
+    """
+    global _title_image
+    if _title_image is None:
+        _title_image = to_indexed(setup.get_image('light_title'), TITLE)
+    return _title_image
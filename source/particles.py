@@ -0,0 +1,157 @@
+# particles.py
+
+"""
+Engine for short-lived visual effects (explosions, debris sparks, hit flashes).
+Every active effect lives in a row of some NumPy arrays, so they all get advanced in one vectorized
+step per tick and drawn with one batched blit.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pygame
+
+from . import constants as c, render
+from .setup import get_frame
+
+MAX_PARTICLES = 1024
+
+# A kind of effect: the frames it animates through and how long each frame shows for (millis.)
+EffectKind = namedtuple("EffectKind", "frames frame_duration")
+
+# Effect kind ids
+PLAYER_EXPLOSION = 0
+ENEMY_EXPLOSION = 1
+SPARK = 2
+HIT_FLASH = 3
+
+PLAYER_FRAME_DURATION = 140
+OTHER_FRAME_DURATION = 120
+SPARK_FRAME_DURATION = 90
+HIT_FLASH_DURATION = 50
+
+PLAYER_FRAMES = ['player_explosion_1', 'player_explosion_2', 'player_explosion_3', 'player_explosion_4']
+OTHER_FRAMES = ['explosion_1', 'explosion_2', 'explosion_3', 'explosion_4', 'explosion_5']
+
+SPARK_COLORS = c.WHITE, c.YELLOW, c.RED
+SPARK_SPEED = 0.06  # pixels per milli.
+NUM_DEBRIS_SPARKS = 6
+
+
+def _make_dot(color, size) -> pygame.Surface:
+    dot = pygame.Surface((size, size)).convert()
+    dot.fill(color)
+    return dot
+
+
+def load_effect_kinds() -> tuple:
+    """
+    Get the effect kinds, in order of their ids
+    """
+    return (EffectKind([get_frame(name) for name in PLAYER_FRAMES], PLAYER_FRAME_DURATION),
+            EffectKind([get_frame(name) for name in OTHER_FRAMES], OTHER_FRAME_DURATION),
+            EffectKind([_make_dot(color, 1) for color in SPARK_COLORS], SPARK_FRAME_DURATION),
+            EffectKind([_make_dot(c.WHITE, 3)], HIT_FLASH_DURATION))
+
+
+class ParticleEngine:
+    """
+    Holds all of the active effects as a struct of arrays, packed into the first `count` rows
+    """
+
+    def __init__(self, capacity: int = MAX_PARTICLES, seed=None):
+        self.capacity = capacity
+        self.count = 0
+        self.num_dropped = 0  # spawns that didn't fit
+        self.rng = np.random.default_rng(seed)
+
+        self.x = np.zeros(capacity)
+        self.y = np.zeros(capacity)
+        self.vx = np.zeros(capacity)
+        self.vy = np.zeros(capacity)
+        self.age = np.zeros(capacity)
+        self.kind = np.zeros(capacity, dtype=np.intp)
+        self.frame = np.zeros(capacity, dtype=np.intp)
+
+        # Flatten every kind's frames into one image table, so (kind, frame) -> one index into it
+        self.kinds = load_effect_kinds()
+        self.images = []
+        first_image = []
+        for kind in self.kinds:
+            first_image.append(len(self.images))
+            self.images.extend(kind.frames)
+        self.first_image = np.array(first_image, dtype=np.intp)
+        self.num_frames = np.array([len(kind.frames) for kind in self.kinds], dtype=np.intp)
+        self.frame_duration = np.array([kind.frame_duration for kind in self.kinds], dtype=float)
+        self.half_width = np.array([image.get_width() // 2 for image in self.images], dtype=np.intp)
+        self.half_height = np.array([image.get_height() // 2 for image in self.images], dtype=np.intp)
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def spawn_many(self, kind: int, x, y, vx=0.0, vy=0.0):
+        """
+        Add effects of one kind. The positions and velocities can be scalars or arrays
+        """
+        x, y, vx, vy = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (x, y, vx, vy)))
+        num = x.size
+        room = self.capacity - self.count
+        if num > room:
+            self.num_dropped += num - room
+            num = room
+        start, end = self.count, self.count + num
+        self.x[start:end] = x.ravel()[:num]
+        self.y[start:end] = y.ravel()[:num]
+        self.vx[start:end] = vx.ravel()[:num]
+        self.vy[start:end] = vy.ravel()[:num]
+        self.age[start:end] = 0
+        self.kind[start:end] = kind
+        self.frame[start:end] = 0
+        self.count = end
+
+    def spawn(self, kind: int, x: float, y: float, vx: float = 0.0, vy: float = 0.0):
+        self.spawn_many(kind, x, y, vx, vy)
+
+    def spawn_burst(self, kind: int, x: float, y: float, num: int, speed: float):
+        """
+        Add effects flying outwards from a point in random directions
+        """
+        angles = self.rng.uniform(0, 2 * np.pi, num)
+        speeds = self.rng.uniform(0.5 * speed, speed, num)
+        self.spawn_many(kind, x, y, np.cos(angles) * speeds, np.sin(angles) * speeds)
+
+    def update(self, delta_time: int):
+        n = self.count
+        if not n:
+            return
+        age = self.age[:n]
+        kind = self.kind[:n]
+        age += delta_time
+        self.x[:n] += self.vx[:n] * delta_time
+        self.y[:n] += self.vy[:n] * delta_time
+        frame = (age // self.frame_duration[kind]).astype(np.intp)
+        self.frame[:n] = frame
+
+        # pack the effects that are still going to the front
+        alive = frame < self.num_frames[kind]
+        if not alive.all():
+            keep = np.flatnonzero(alive)
+            new_n = keep.size
+            for array in (self.x, self.y, self.vx, self.vy, self.age, self.kind, self.frame):
+                array[:new_n] = array[keep]
+            self.count = new_n
+
+    def display(self, surface: pygame.Surface):
+        n = self.count
+        if not n:
+            return
+        image_index = self.first_image[self.kind[:n]] + self.frame[:n]
+        # Center the images
+        draw_x = np.rint(self.x[:n]).astype(np.intp) - self.half_width[image_index]
+        draw_y = np.rint(self.y[:n]).astype(np.intp) - self.half_height[image_index]
+        images = self.images
+        render.blits(surface, [(images[i], (dx, dy)) for i, dx, dy in zip(image_index.tolist(), draw_x.tolist(),
+                                                                          draw_y.tolist())])
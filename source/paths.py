@@ -0,0 +1,168 @@
+# paths.py
+
+"""
+Flight paths for enemies, like the loops they enter the stage with and their dives at the fighter.
+A path is made of Bezier and arc segments. When the game loads, each path gets compiled into tables of
+positions and headings spaced evenly along its length, so following one is just stepping through the
+table. Every enemy on a path shares its table, flipped left to right and moved to wherever it needs to be.
+
+Path x coordinates are relative to a vertical line (mirroring flips them about it) that the follower's
+offset puts somewhere, like the middle of the screen or the spot a dive starts from.
+"""
+
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from . import constants as c
+
+SAMPLE_SPACING = 0.5  # pixels between table entries
+SEGMENT_SAMPLES = 64  # points each segment is measured with when compiling
+
+# Cubic Bezier curve through p0 and p3, pulled toward p1 and p2. The points are (x, y)
+Bezier = namedtuple("Bezier", "p0 p1 p2 p3")
+# Part of a circle, from start_angle to end_angle (radians, clockwise on screen when increasing)
+Arc = namedtuple("Arc", "center radius start_angle end_angle")
+
+ENTRY_SPEED = 0.13  # pixels per milli.
+DIVE_SPEED = 0.10
+JOIN_SPEED = 0.09  # flying from the end of a path to the slot in the formation
+
+# Offset that puts a path with screen-centered x on the screen
+SCREEN_CENTER_OFFSET = (c.GAME_CENTER.x, 0)
+
+# Every path, by name. The entry paths are centered on the screen and the dive paths start at (0, 0)
+PATHS = {
+    # in from the top, swooping out to the side and looping once before going up to the formation
+    'top_entry': [Bezier((-16, -16), (-16, 80), (-80, 110), (-80, 160)),
+                  Arc((-50, 160), 30, math.pi, -math.pi / 2),
+                  Bezier((-50, 130), (-66, 130), (-66, 100), (-50, 84))],
+    # in from the bottom corner, curling around toward the middle and back up
+    'side_entry': [Bezier((-128, 232), (-60, 224), (-24, 196), (-24, 160)),
+                   Arc((-54, 160), 30, 0, -math.pi / 2),
+                   Bezier((-54, 130), (-70, 130), (-76, 100), (-64, 80))],
+    # up and around, then down at the fighter and off the bottom of the screen
+    'dive': [Arc((-16, 0), 16, 0, -math.pi),
+             Bezier((-32, 0), (-32, 100), (40, 130), (40, 210)),
+             Bezier((40, 210), (40, 260), (0, 280), (0, 340))],
+}
+
+
+def _sample_bezier(segment: Bezier, t: np.ndarray) -> tuple:
+    (x0, y0), (x1, y1), (x2, y2), (x3, y3) = segment
+    u = 1 - t
+    a, b, d, e = u * u * u, 3 * u * u * t, 3 * u * t * t, t * t * t
+    return a * x0 + b * x1 + d * x2 + e * x3, a * y0 + b * y1 + d * y2 + e * y3
+
+
+def _sample_arc(segment: Arc, t: np.ndarray) -> tuple:
+    (center_x, center_y), radius, start_angle, end_angle = segment
+    angle = start_angle + (end_angle - start_angle) * t
+    return center_x + radius * np.cos(angle), center_y + radius * np.sin(angle)
+
+
+def _sample_segment(segment, t: np.ndarray) -> tuple:
+    if isinstance(segment, Bezier):
+        return _sample_bezier(segment, t)
+    if isinstance(segment, Arc):
+        return _sample_arc(segment, t)
+    raise TypeError("not a path segment: {!r}".format(segment))
+
+
+class CompiledPath:
+    """
+    A path's positions and headings, evenly spaced along its length
+    """
+
+    def __init__(self, name: str, segments: list):
+        self.name = name
+
+        # measure the path with lots of little straight lines
+        t = np.linspace(0.0, 1.0, SEGMENT_SAMPLES + 1)
+        xs, ys = [], []
+        for i, segment in enumerate(segments):
+            x, y = _sample_segment(segment, t)
+            # each segment starts where the last one ended
+            start = 0 if i == 0 else 1
+            xs.append(x[start:])
+            ys.append(y[start:])
+        x = np.concatenate(xs)
+        y = np.concatenate(ys)
+        distance = np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+        self.length = float(distance[-1])
+
+        # resample it by distance along it
+        even_distance = np.arange(0.0, self.length, SAMPLE_SPACING)
+        even_distance = np.append(even_distance, self.length)
+        self.xs = np.interp(even_distance, distance, x)
+        self.ys = np.interp(even_distance, distance, y)
+        dx = np.diff(self.xs, append=self.xs[-1] + (self.xs[-1] - self.xs[-2]))
+        dy = np.diff(self.ys, append=self.ys[-1] + (self.ys[-1] - self.ys[-2]))
+        self.headings = np.arctan2(dy, dx)  # radians, 0 is to the right and pi/2 is down the screen
+
+        # lists are faster than arrays to read single entries out of
+        self.points = list(zip(self.xs.tolist(), self.ys.tolist()))
+        self.heading_list = self.headings.tolist()
+        self.mirrored_heading_list = (math.pi - self.headings).tolist()
+
+    def __len__(self):
+        return len(self.points)
+
+
+def compile_paths(paths: dict) -> dict:
+    return {name: CompiledPath(name, segments) for name, segments in paths.items()}
+
+
+COMPILED_PATHS = compile_paths(PATHS)
+
+
+def get_path(path_name: str) -> CompiledPath:
+    return COMPILED_PATHS[path_name]
+
+
+class PathFollower:
+    """
+    Where one enemy is along a path
+    """
+    __slots__ = ('path', 'speed', 'mirror', 'offset_x', 'offset_y', 'distance', 'index')
+
+    def __init__(self, path: CompiledPath, speed: float, mirror=False, offset=(0, 0)):
+        """
+        :param path: the path to follow
+        :param speed: pixels per milli.
+        :param mirror: whether to flip the path left to right
+        :param offset: where (0, 0) of the path is on the screen
+        """
+        self.path = path
+        self.speed = speed
+        self.mirror = mirror
+        self.offset_x, self.offset_y = offset
+        self.distance = 0.0
+        self.index = 0
+
+    @property
+    def is_done(self) -> bool:
+        return self.index >= len(self.path) - 1
+
+    def advance(self, delta_time: int) -> bool:
+        """
+        Move along the path
+        :return: whether the end of the path has been reached
+        """
+        self.distance += self.speed * delta_time
+        self.index = min(int(self.distance / SAMPLE_SPACING), len(self.path) - 1)
+        return self.is_done
+
+    @property
+    def position(self) -> tuple:
+        x, y = self.path.points[self.index]
+        if self.mirror:
+            x = -x
+        return self.offset_x + x, self.offset_y + y
+
+    @property
+    def heading(self) -> float:
+        if self.mirror:
+            return self.path.mirrored_heading_list[self.index]
+        return self.path.heading_list[self.index]
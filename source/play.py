@@ -1,10 +1,11 @@
 import pygame
-from pygame.math import Vector2
-from . import constants as c, tools, setup, hud, scoring, sprites
-from .setup import play_sound, stop_sounds
+from . import constants as c, tools, setup, hud, scoring, sprites, collision, particles, formation, stages, pools, \
+    entities, render
+from .profiler import PROFILER
+from .audio import play_sound, stop_sounds
 from .stars import StarField
 from .tools import calc_stage_badges, draw_text
-from .states import State, draw_mid_text
+from .states import State, draw_mid_text, GAME_OVER_DURATION
 
 # Play state timings
 STAGE_DURATION = 1600
@@ -14,12 +15,19 @@ START_NOISE_WAIT = 0
 START_DURATION = START_NOISE_WAIT + INTRO_MUSIC_DURATION
 STAGE_BADGE_DURATION = 200
 FIRE_COOLDOWN = 200
+MISSILE_POOL_SIZE = 32  # fighter and enemy missiles on the stage at once
+ENEMY_FIRE_CHANCE = 0.5  # of a diving enemy firing at the fighter
+ENEMY_FIRE_DELAY = 500  # millis. into its dive that an enemy fires
+ENEMY_MISSILE_SPEED = 0.25  # pixels per milli. down the stage
+ENEMY_MISSILE_MAX_SLOPE = 0.5  # most pixels sideways per pixel down an enemy missile aims
+SCORE_TEXT_POOL_SIZE = 8
 
 # game area boundary
 STAGE_BOUNDS = pygame.Rect(0, c.STAGE_TOP_Y, c.GAME_SIZE.width, c.STAGE_BOTTOM_Y - c.STAGE_TOP_Y)
 
 
 class Play(State):
+    SOUNDS = ('fighter_fire', 'enemy_fire', 'enemy_hit_1', 'explosion', 'stage_award')
 
     def __init__(self, persist):
         # do the things all states must do...
@@ -41,6 +49,7 @@ class Play(State):
         self.last_fire_time = 0
         self.num_shots = 0
         self.num_hits = 0
+        self.num_deaths = 0
 
         # init stage number and badge icons
         self.stage_num = 0
@@ -53,17 +62,25 @@ class Play(State):
         # missile sprites and such
         self.missiles = pygame.sprite.Group()
         self.enemy_missiles = pygame.sprite.Group()
+        self.missile_pool = pools.Pool('missiles', sprites.Missile, MISSILE_POOL_SIZE)
+        self.text_sprites = pygame.sprite.Group()
+        self.score_text_pool = pools.Pool('score texts', lambda: sprites.ScoreText(group=self.text_sprites),
+                                          SCORE_TEXT_POOL_SIZE)
 
-        # Explosions sprites
-        self.explosions = pygame.sprite.Group()
+        # Explosions and other effects
+        self.effects = particles.ParticleEngine(seed=self.persist.rng.stream_seed('effects'))
 
         # enemies and level
-        self.formation_spread: int = 0
-        self.formation_x_offset: int = 0
-        self.formation_y_offset = c.STAGE_TOP_Y + 16
+        self.formation = formation.Formation(origin_x=formation.CENTERED_ORIGIN_X)
+        self.enemy_rng = self.persist.rng.stream('enemies')
+        self.dive_timer = 0
+        self.enemy_shots = []  # (diving enemy, time it fires at)
         self.the_stage = None
         self.enemies: pygame.sprite.Group = pygame.sprite.Group()
 
+        # broad-phase collision grid, rebuilt every tick
+        self.collision_grid = collision.CollisionGrid(STAGE_BOUNDS)
+
         # timers:
         self.blocking_timer = 0  # this timer is for timing how long to show messages on screen
         self.flashing_text_timer = 0
@@ -91,7 +108,8 @@ class Play(State):
                          high_score=self.high_score,
                          num_shots=self.num_shots,
                          num_hits=self.num_hits,
-                         stage_num=self.stage_num)
+                         stage_num=self.stage_num,
+                         rng=self.persist.rng)
 
     def get_event(self, event):
         if event.type == pygame.KEYDOWN:
@@ -120,20 +138,25 @@ class Play(State):
                 self.kill_player()
 
     def fighter_shoots(self):
+        m = self.missile_pool.acquire()
+        if m is None:
+            return
         play_sound('fighter_fire')
         # v is multiplied by speed in the missile class
-        v = Vector2(0, -0.350)
+        v = (0, -0.350)
         x = self.player.rect.centerx
         y = self.player.rect.top + 10
-        m = sprites.Missile(x, y, v, is_enemy=False)
+        m.reset(x, y, v, is_enemy=False)
         self.missiles.add(m)
         self.num_shots += 1
 
     def play_intro_music(self):
         # Make the game play the intro music and wait
         stop_sounds()
-        setup.get_sfx("theme").play()
+        setup.play_music("theme")
         self.has_started_intro_music = True
+        # the stages get loaded while the music plays
+        stages.preload_in_background()
 
     def animate_stage_badges(self, delta_time):
         if not self.is_animating_stage_badges:
@@ -151,59 +174,161 @@ class Play(State):
             play_sound('stage_award')
 
     def update(self, delta_time, keys):
+        # remember where everything was as of the last tick, for drawing in between ticks
+        entities.STORE.save_positions()
+
         # More important things to update
-        self.update_timers(delta_time)
-        self.update_player(delta_time, keys)
-        self.update_enemies(delta_time)
+        with PROFILER.phase('update_timers'):
+            self.update_timers(delta_time)
+        with PROFILER.phase('update_player'):
+            self.update_player(delta_time, keys)
+        with PROFILER.phase('update_enemies'):
+            self.update_enemies(delta_time)
 
         # Less important graphical things to update
-        self.update_text_sprites(delta_time)
-        self.update_explosions(delta_time)
-        self.update_stars(delta_time)
-        self.animate_stage_badges(delta_time)
-        self.update_missiles(delta_time)
+        with PROFILER.phase('update_text'):
+            self.update_text_sprites(delta_time)
+        with PROFILER.phase('update_effects'):
+            self.update_explosions(delta_time)
+        with PROFILER.phase('update_stars'):
+            self.update_stars(delta_time)
+        with PROFILER.phase('update_badges'):
+            self.animate_stage_badges(delta_time)
+        with PROFILER.phase('update_missiles'):
+            self.update_missiles(delta_time)
+        with PROFILER.phase('collisions'):
+            self.update_collisions()
+
+        if PROFILER.enabled:
+            PROFILER.count('enemies', len(self.enemies))
+            PROFILER.count('missiles', len(self.missiles))
+            PROFILER.count('enemy missiles', len(self.enemy_missiles))
+            PROFILER.count('effects', len(self.effects))
+            PROFILER.count('missile pool', self.missile_pool.high_water)
 
     def update_enemies(self, delta_time):
         # update enemies
         if self.the_stage and self.enemies:
+            # every enemy in the formation reads its slot from this
+            self.formation.update(self.current_time)
             self.enemies.update(delta_time, self.animation_flag)
+            self.update_dives(delta_time)
+            self.update_enemy_fire()
+        elif self.is_done_spawning_enemies:
+            # every enemy of the stage is gone
+            self.is_done_spawning_enemies = False
+            self.next_stage()
+            self.should_show_stage = True
+            self.blocking_timer = 0
+
+    def update_dives(self, delta_time):
+        if not (self.is_done_spawning_enemies and self.is_ready and self.is_player_alive):
+            return
+        self.dive_timer += delta_time
+        if self.dive_timer < self.the_stage.dive_interval:
+            return
+        self.dive_timer = 0
+        in_formation = [enemy for enemy in self.enemies if enemy.state == sprites.Enemy.IN_FORMATION]
+        if in_formation:
+            enemy = self.enemy_rng.choice(in_formation)
+            # dive in toward the middle of the stage
+            enemy.dive(mirror=enemy.x > c.GAME_CENTER.x)
+            if self.enemy_rng.random() < ENEMY_FIRE_CHANCE:
+                self.enemy_shots.append((enemy, self.current_time + ENEMY_FIRE_DELAY))
+
+    def update_enemy_fire(self):
+        if not self.enemy_shots:
+            return
+        waiting = []
+        for enemy, fire_time in self.enemy_shots:
+            if self.current_time < fire_time:
+                waiting.append((enemy, fire_time))
+            elif enemy.alive() and enemy.state == sprites.Enemy.DIVING and self.is_player_alive:
+                self.enemy_fires(enemy)
+        self.enemy_shots = waiting
+
+    def enemy_fires(self, enemy):
+        dy = self.player.y - enemy.y
+        if dy <= 0:
+            return  # already past the fighter
+        m = self.missile_pool.acquire()
+        if m is None:
+            return
+        play_sound('enemy_fire')
+        # aimed at where the fighter is now, but never much sideways
+        slope = max(-ENEMY_MISSILE_MAX_SLOPE, min(ENEMY_MISSILE_MAX_SLOPE, (self.player.x - enemy.x) / dy))
+        m.reset(enemy.x, enemy.rect.bottom, (slope * ENEMY_MISSILE_SPEED, ENEMY_MISSILE_SPEED), is_enemy=True)
+        self.enemy_missiles.add(m)
+
+    def spawn_enemies(self):
+        self.should_spawn_enemies = False
+        for spawn in self.the_stage.spawns:
+            enemy = sprites.Enemy(0, 0, spawn.enemy_type, self.formation, spawn.slot)
+            enemy.enter(spawn.path, spawn.mirror, spawn.time)
+            self.enemies.add(enemy)
+        self.is_done_spawning_enemies = True
+        self.dive_timer = 0
 
     def add_explosion(self, x, y, is_player_type=False):
-        self.explosions.add(sprites.Explosion(x, y, is_player_type=is_player_type))
+        if is_player_type:
+            self.effects.spawn(particles.PLAYER_EXPLOSION, x, y)
+        else:
+            self.effects.spawn(particles.ENEMY_EXPLOSION, x, y)
+            self.effects.spawn_burst(particles.SPARK, x, y, particles.NUM_DEBRIS_SPARKS, particles.SPARK_SPEED)
 
     def update_missiles(self, delta_time):
-        for a_missile in self.missiles.sprites():
-            a_missile.update(delta_time, self.animation_flag)
-
-            # Only work on the first enemy hit
-            for enemy in self.enemies:
-                if not enemy.is_visible:
-                    continue
-                if enemy.rect.colliderect(a_missile.rect):
-                    enemy.kill()
-                    a_missile.kill()
-                    self.num_hits += 1
-                    self.add_explosion(enemy.x, enemy.y)
-                    play_sound("enemy_hit_1")
-                    points = 0
-                    if isinstance(enemy, sprites.Bee):
-                        points = 400
-                    elif isinstance(enemy, sprites.Butterfly):
-                        points = 400
-                    elif isinstance(enemy, sprites.Purple):
-                        points = 800
-                        sprites.ScoreText(enemy.x, enemy.y, points)
-                    self.score += points
-                    self.high_score = max(self.score, self.high_score)
-                    if not STAGE_BOUNDS.contains(a_missile.rect):
-                        a_missile.kill()
-                    break
+        # every missile moves in one go
+        entities.STORE.move(delta_time)
+
+        # missiles that leave the stage are gone
+        for a_missile in self.missiles.sprites() + self.enemy_missiles.sprites():
+            if not STAGE_BOUNDS.contains(a_missile.rect):
+                a_missile.kill()
+
+    def update_collisions(self):
+        grid = self.collision_grid
+        grid.rebuild({collision.PLAYER: (self.player,) if self.is_player_alive else (),
+                      collision.ENEMIES: [enemy for enemy in self.enemies if enemy.is_visible],
+                      collision.PLAYER_MISSILES: self.missiles,
+                      collision.ENEMY_MISSILES: self.enemy_missiles})
+
+        # fighter missiles hitting enemies, where each missile only works on the first enemy hit
+        for a_missile, enemy in grid.collisions(collision.PLAYER_MISSILES, collision.ENEMIES):
+            if a_missile.alive() and enemy.alive():
+                a_missile.kill()
+                self.effects.spawn(particles.HIT_FLASH, a_missile.x, a_missile.rect.top)
+                self.num_hits += 1
+                self.destroy_enemy(enemy)
+
+        # enemy missiles hitting the fighter
+        for a_missile, _ in grid.collisions(collision.ENEMY_MISSILES, collision.PLAYER):
+            a_missile.kill()
+            self.kill_player()
+
+        # enemies crashing into the fighter
+        for enemy, _ in grid.collisions(collision.ENEMIES, collision.PLAYER):
+            if enemy.alive():
+                self.destroy_enemy(enemy)
+                self.kill_player()
+
+    def destroy_enemy(self, enemy):
+        enemy.kill()
+        self.add_explosion(enemy.x, enemy.y)
+        play_sound("enemy_hit_1")
+        points = enemy.points
+        if enemy.enemy_type in ('boss', 'boss_hit'):
+            score_text = self.score_text_pool.acquire()
+            if score_text is not None:
+                score_text.reset(enemy.x, enemy.y, points)
+        self.score += points
+        self.high_score = max(self.score, self.high_score)
 
     def kill_player(self):
         if self.player is None or not self.is_player_alive:
             return
         play_sound("explosion")
         self.is_player_alive = False
+        self.num_deaths += 1
         self.player.kill()
         self.add_explosion(self.player.x, self.player.y, is_player_type=True)
         self.reform_enemies()
@@ -271,6 +396,8 @@ class Play(State):
         self.can_control_player = True
         self.blocking_timer = 0
         self.is_ready = True
+        if self.should_spawn_enemies:
+            self.spawn_enemies()
 
     def done_starting(self):
         self.is_starting = False
@@ -284,7 +411,9 @@ class Play(State):
     def next_stage(self):
         self.stage_num += 1
 
-        # TODO: add enemies
+        # the enemies come in once the fighter is ready
+        self.the_stage = stages.get_stage(self.stage_num)
+        self.should_spawn_enemies = True
 
         self.update_stage_badges()
         self.start_animating_stage_badges()
@@ -315,30 +444,36 @@ class Play(State):
 
     def display(self, screen: pygame.Surface):
         # clear screen
-        screen.fill(c.BLACK)
+        render.fill(screen, c.BLACK)
         # stars
-        self.persist.stars.display(screen)
-        if self.the_stage:
-            # draw enemies
-            for enemy in self.enemies:
-                enemy.display(screen)
-        # draw player
-        if self.is_player_alive:
-            self.player.display(screen)
-        # draw bullets
-        for m in self.missiles:
-            m.display(screen)
+        with PROFILER.phase('draw_stars'):
+            self.persist.stars.display(screen)
+        with PROFILER.phase('draw_sprites'):
+            if self.the_stage:
+                # draw enemies
+                for enemy in self.enemies:
+                    enemy.display(screen)
+            # draw player
+            if self.is_player_alive:
+                self.player.display(screen)
+            # draw bullets
+            for m in self.missiles:
+                m.display(screen)
+            for m in self.enemy_missiles:
+                m.display(screen)
         # draw explosions
-        for x in self.explosions:
-            x.display(screen)
+        with PROFILER.phase('draw_effects'):
+            self.effects.display(screen)
         # display text sprites
-        for ts in sprites.ScoreText.text_sprites:
-            ts.display(screen)
+        with PROFILER.phase('draw_text'):
+            for ts in self.text_sprites:
+                ts.display(screen)
+            self.show_state(screen)
         # draw HUD
-        self.show_state(screen)
-        hud.display(screen, one_up_score=self.persist.one_up_score, high_score=self.persist.high_score,
-                    offset_y=0, num_extra_lives=self.extra_lives, stage_badges=self.stage_badges,
-                    stage_badge_animation_step=self.stage_badge_animation_step, show_1up=self.show_1up_text)
+        with PROFILER.phase('draw_hud'):
+            hud.display(screen, one_up_score=self.persist.one_up_score, high_score=self.persist.high_score,
+                        offset_y=0, num_extra_lives=self.extra_lives, stage_badges=self.stage_badges,
+                        stage_badge_animation_step=self.stage_badge_animation_step, show_1up=self.show_1up_text)
 
     def show_state(self, screen):
         if self.is_starting:
@@ -357,19 +492,20 @@ class Play(State):
             if self.can_control_player:
                 self.player.update(dt, keys)
 
-            if self.player.rect.left < STAGE_BOUNDS.left:
-                self.player.rect.left = STAGE_BOUNDS.left
-            elif self.player.rect.right > STAGE_BOUNDS.right - e:
-                self.player.rect.right = STAGE_BOUNDS.right - e
+            half_width = self.player.rect.width / 2
+            if self.player.x - half_width < STAGE_BOUNDS.left:
+                self.player.x = STAGE_BOUNDS.left + half_width
+            elif self.player.x + half_width > STAGE_BOUNDS.right - e:
+                self.player.x = STAGE_BOUNDS.right - e - half_width
 
     def update_text_sprites(self, delta_time):
         # update score text things
-        sprites.ScoreText.text_sprites.update(delta_time, self.animation_flag)
+        self.text_sprites.update(delta_time, self.animation_flag)
 
     def update_stars(self, delta_time):
         self.persist.stars.update(delta_time)
 
     def update_explosions(self, delta_time):
-        self.explosions.update(delta_time, self.animation_flag)
+        self.effects.update(delta_time)
 
 
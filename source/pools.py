@@ -0,0 +1,73 @@
+# pools.py
+
+"""
+Fixed-size pools of reusable objects, for things that come and go all the time like missiles.
+Every object gets made up front. Acquiring one takes it out of the pool, and releasing it (which killing
+a pooled sprite does) puts it back, so a firefight doesn't leave a trail of garbage behind.
+"""
+
+from collections import namedtuple
+
+PoolStats = namedtuple("PoolStats", "capacity active high_water exhausted acquired")
+
+# the most recently made pool of each name, for get_stats
+POOLS = {}
+
+
+class Pool:
+
+    def __init__(self, name: str, factory, capacity: int):
+        """
+        :param name: name to get the pool's stats by
+        :param factory: makes a new object with no arguments
+        :param capacity: how many objects the pool holds
+        """
+        self.name = name
+        self.capacity = capacity
+        self.free = []
+        for _ in range(capacity):
+            obj = factory()
+            obj.pool = self
+            obj.in_use = False
+            self.free.append(obj)
+        self.num_active = 0
+        self.high_water = 0  # the most objects that have been in use at once
+        self.num_exhausted = 0  # times there was nothing left to acquire
+        self.num_acquired = 0
+        POOLS[name] = self
+
+    def acquire(self):
+        """
+        Take an object out of the pool
+        :return: the object, or None if they are all in use
+        """
+        if not self.free:
+            self.num_exhausted += 1
+            return None
+        obj = self.free.pop()
+        obj.in_use = True
+        self.num_active += 1
+        self.num_acquired += 1
+        if self.num_active > self.high_water:
+            self.high_water = self.num_active
+        return obj
+
+    def release(self, obj):
+        """
+        Put an object back into the pool. Releasing it again before it is acquired does nothing
+        """
+        if not obj.in_use:
+            return
+        obj.in_use = False
+        self.num_active -= 1
+        self.free.append(obj)
+
+    def stats(self) -> PoolStats:
+        return PoolStats(self.capacity, self.num_active, self.high_water, self.num_exhausted, self.num_acquired)
+
+
+def get_stats() -> dict:
+    """
+    Get the stats of every pool, by name
+    """
+    return {name: pool.stats() for name, pool in POOLS.items()}
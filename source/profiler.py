@@ -0,0 +1,171 @@
+# profiler.py
+
+"""
+Low-overhead timing of named phases of each frame.
+Each phase keeps its most recent durations in a fixed-size ring buffer. When profiling is off, timing a
+phase just hands back a shared object that does nothing.
+
+    with PROFILER.phase('update_player'):
+        ...
+"""
+
+import csv
+import json
+from array import array
+from time import perf_counter_ns
+
+from . import constants as c
+from .tools import draw_text
+
+RING_SIZE = 512  # samples kept per phase
+OVERLAY_REFRESH = 15  # frames between refreshing the numbers on the overlay
+OVERLAY_LINE_HEIGHT = 9
+OVERLAY_Y = c.STAGE_TOP_Y + 2
+
+
+class _NullPhase:
+    """
+    Stands in for a phase when profiling is off
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class Phase:
+    """
+    Ring buffer of durations (nanoseconds) for one named phase, and a context manager to time it
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples = array('q', bytes(8 * RING_SIZE))
+        self.index = 0
+        self.count = 0  # total samples ever recorded
+        self._start = 0
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        self.record(perf_counter_ns() - self._start)
+        return False
+
+    def record(self, duration_ns: int):
+        self.samples[self.index] = duration_ns
+        self.index = (self.index + 1) % RING_SIZE
+        self.count += 1
+
+    def recent(self) -> list:
+        """
+        Get the samples currently in the ring buffer, oldest first
+        """
+        if self.count < RING_SIZE:
+            return self.samples[:self.count].tolist()
+        return self.samples[self.index:].tolist() + self.samples[:self.index].tolist()
+
+    def percentile(self, percent: float) -> int:
+        samples = sorted(self.recent())
+        if not samples:
+            return 0
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+
+class Profiler:
+
+    def __init__(self):
+        self.enabled = False
+        self.show_overlay = False
+        self.phases = {}  # name -> Phase, in the order they were first timed
+        self.counts = {}  # name -> latest entity count
+        self._overlay_lines = []
+        self._frames_until_refresh = 0
+
+    def toggle(self):
+        """
+        Turn profiling and its overlay on or off together
+        """
+        self.enabled = not self.enabled
+        self.show_overlay = self.enabled
+        self._frames_until_refresh = 0
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return _NULL_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(name)
+        return phase
+
+    def count(self, name: str, value: int):
+        if self.enabled:
+            self.counts[name] = value
+
+    def summary(self) -> list:
+        """
+        Get a list of stats dicts (times in microseconds), one for each phase
+        """
+        stats = []
+        for phase in self.phases.values():
+            recent = phase.recent()
+            stats.append({'phase': phase.name,
+                          'samples': phase.count,
+                          'p50_us': phase.percentile(50) / 1000,
+                          'p99_us': phase.percentile(99) / 1000,
+                          'mean_us': sum(recent) / len(recent) / 1000 if recent else 0.0,
+                          'max_us': max(recent, default=0) / 1000})
+        return stats
+
+    def display(self, screen):
+        if not self.show_overlay:
+            return
+        # the numbers only get refreshed every so often, so they can be read and the text cache stays useful
+        if self._frames_until_refresh <= 0:
+            self._frames_until_refresh = OVERLAY_REFRESH
+            lines = ['PHASE         P50US  P99US']
+            for stats in self.summary():
+                # the font has no underscore
+                name = stats['phase'].replace('_', ' ')
+                lines.append('{:<12.12}{:>7.0f}{:>7.0f}'.format(name, stats['p50_us'], stats['p99_us']))
+            for name, value in self.counts.items():
+                lines.append('{:<12.12}{:>7}'.format(name, value))
+            self._overlay_lines = lines
+        self._frames_until_refresh -= 1
+        for i, line in enumerate(self._overlay_lines):
+            draw_text(screen, line, (2, OVERLAY_Y + i * OVERLAY_LINE_HEIGHT), c.LIGHT_GREEN, c.BLACK)
+
+    def export_csv(self, path):
+        stats = self.summary()
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=['phase', 'samples', 'p50_us', 'p99_us', 'mean_us', 'max_us'])
+            writer.writeheader()
+            writer.writerows(stats)
+
+    def export_jsonl(self, path):
+        """
+        Write one line per phase, with its stats and the raw samples (nanoseconds) still in its ring buffer
+        """
+        with open(path, 'w') as file:
+            for stats, phase in zip(self.summary(), self.phases.values()):
+                stats['samples_ns'] = phase.recent()
+                file.write(json.dumps(stats) + '\n')
+            if self.counts:
+                file.write(json.dumps({'counts': self.counts}) + '\n')
+
+    def export(self, path_prefix=c.PROFILE_EXPORT_PREFIX):
+        """
+        Write the CSV and JSONL files, if anything was ever timed
+        """
+        if self.phases:
+            self.export_csv(path_prefix + '.csv')
+            self.export_jsonl(path_prefix + '.jsonl')
+
+
+PROFILER = Profiler()
@@ -0,0 +1,375 @@
+# render.py
+
+"""
+Presenting frames to the window.
+In the default full mode the whole window gets updated every frame.
+In dirty rect mode, everything drawn onto the screen goes through the functions here and gets recorded,
+and only the regions where this frame's drawing differs from the last frame's are passed to
+pygame.display.update. The diff view outlines those regions so you can see what got redrawn.
+
+Either way, palette mode has the game drawn onto an 8-bit palettized frame instead of the window (see
+palette.py). Images get converted to the palette the first time they are drawn, and the frame gets converted
+to the window's format once, when it is presented. Changing what a palette entry shows changes every pixel
+drawn with it, without drawing anything again.
+
+The game is always drawn at its own size, and the window can be a whole number of times bigger (see
+set_scale). There are three ways of getting the frame up to the window's size:
+  SCALED: let SDL scale the window's texture when it is shown (pygame.SCALED), which usually happens on the
+    GPU. Not every display driver can do it, and then the frame gets scaled as with SURFACE instead.
+  SURFACE: draw onto an offscreen surface and scale it (just its dirty rects, in dirty rect mode) straight
+    onto the window when presenting.
+  SPRITES: draw onto the window, with scaled copies of the images, made the first time each one gets drawn.
+"""
+
+import weakref
+
+import pygame
+
+from . import constants as c, palette
+
+FULL = 'full'
+DIRTY = 'dirty'
+
+# Ways of scaling the frame up to the window
+SCALED = 'scaled'
+SURFACE = 'surface'
+SPRITES = 'sprites'
+SCALE_PATHS = (SCALED, SURFACE, SPRITES)
+SCALES = (1, 2, 3, 4)
+
+# with more dirty regions than this, or more of the window dirty than this, just update the whole window
+MAX_DIRTY_RECTS = 512
+MAX_DIRTY_PORTION = 0.5
+DIFF_VIEW_COLOR = (255, 0, 255)
+
+mode = FULL
+show_diff = False  # outline the dirty regions
+interpolation = 1.0  # how far the frame is between the last two simulation ticks (0.0 -> 1.0)
+
+_screen = None  # the surface being tracked this frame
+_drawn = []  # draw records for this frame: (x, y, width, height, image or color, area)
+_last_drawn = set()
+_last_diff = []  # outlines drawn by the diff view, which have to be cleaned up next frame
+_needs_full_update = True
+
+palette_mode = False
+_frame = None  # the 8-bit frame of palette mode
+_display_colors = None  # what each palette entry shows when the frame gets presented
+_indexed_images = weakref.WeakKeyDictionary()  # image -> its 8-bit version
+
+scale = 1
+scale_path = SURFACE
+_native = None  # with SURFACE, the offscreen surface the game gets drawn onto
+_sprite_scale = 1  # with SPRITES, how much bigger everything gets drawn onto the window
+_window = None
+_scaled_images = weakref.WeakKeyDictionary()  # image -> its copy for SPRITES
+
+
+def set_mode(new_mode: str):
+    global mode
+    assert new_mode in (FULL, DIRTY)
+    mode = new_mode
+    invalidate()
+
+
+def toggle_mode():
+    set_mode(FULL if mode == DIRTY else DIRTY)
+
+
+def toggle_diff_view():
+    global show_diff
+    show_diff = not show_diff
+    invalidate()
+
+
+def set_scale(factor: int, path: str = SCALED) -> pygame.Surface:
+    """
+    Open the window at a whole number of times the game's size
+    :param factor: one of SCALES
+    :param path: how to get the frame up to the window's size, one of SCALE_PATHS
+    :return: the window
+    """
+    global scale, scale_path, _native, _sprite_scale, _window, _frame
+    assert factor in SCALES and path in SCALE_PATHS
+    _native = None
+    _sprite_scale = 1
+    _frame = None  # its size goes with the surface that gets drawn onto
+    _scaled_images.clear()
+    if factor == 1:
+        window = pygame.display.set_mode(c.GAME_SIZE)
+    elif path == SCALED:
+        try:
+            window = pygame.display.set_mode(c.GAME_SIZE, pygame.SCALED)
+            _resize_scaled_window(factor)
+        except pygame.error:
+            # no renderer to scale with, like the dummy video driver
+            return set_scale(factor, SURFACE)
+    else:
+        window = pygame.display.set_mode((c.GAME_SIZE.width * factor, c.GAME_SIZE.height * factor))
+        if path == SURFACE:
+            # noinspection PyArgumentList
+            _native = pygame.Surface(c.GAME_SIZE).convert()
+        else:
+            _sprite_scale = factor
+    scale, scale_path, _window = factor, path, window
+    invalidate()
+    return window
+
+
+def _resize_scaled_window(factor: int):
+    # pygame.SCALED picks a factor of its own that fits the desktop, so set the window's size after it
+    try:
+        from pygame._sdl2.video import Window
+    except ImportError:
+        return  # keep the one SDL picked
+    Window.from_display_module().size = (c.GAME_SIZE.width * factor, c.GAME_SIZE.height * factor)
+
+
+def set_palette_mode(is_on: bool):
+    global palette_mode, _display_colors
+    palette_mode = is_on
+    if is_on and _display_colors is None:
+        _display_colors = palette.get_display_colors()
+    invalidate()
+
+
+def toggle_palette_mode():
+    set_palette_mode(not palette_mode)
+
+
+def set_palette_color(index: int, color):
+    """
+    Change what a palette entry shows, from the next frame that gets presented on
+    """
+    color = tuple(color)
+    if _display_colors[index] != color:
+        _display_colors[index] = color
+        invalidate()  # the pixels that weren't drawn again change too
+
+
+def frame_surface(window: pygame.Surface) -> pygame.Surface:
+    """
+    Get the surface to draw a frame onto: the window, the offscreen surface that gets scaled onto it, or the
+    8-bit frame in palette mode
+    """
+    global _frame
+    surface = window if _native is None else _native
+    if not palette_mode:
+        return surface
+    if _frame is None or _frame.get_size() != surface.get_size():
+        _frame = palette.new_surface(surface.get_size())
+    return _frame
+
+
+def _is_scaled(dest: pygame.Surface) -> bool:
+    # whether dest gets drawn onto in window coordinates, with SPRITES
+    return _sprite_scale > 1 and (dest is _window or dest is _frame)
+
+
+def _scaled(image: pygame.Surface) -> pygame.Surface:
+    scaled = _scaled_images.get(image)
+    if scaled is None:
+        width, height = image.get_size()
+        scaled = pygame.transform.scale(image, (width * _sprite_scale, height * _sprite_scale))
+        colorkey = image.get_colorkey()
+        if colorkey is not None:
+            scaled.set_colorkey(colorkey, pygame.RLEACCEL)
+        _scaled_images[image] = scaled
+    return scaled
+
+
+def _scale_rect(rect, factor: int) -> pygame.Rect:
+    x, y, width, height = rect
+    return pygame.Rect(int(x) * factor, int(y) * factor, width * factor, height * factor)
+
+
+def _unscale_rect(rect: pygame.Rect, factor: int) -> pygame.Rect:
+    # the smallest rect that covers rect once it is scaled by factor
+    left, top = rect.left // factor, rect.top // factor
+    return pygame.Rect(left, top, -(-rect.right // factor) - left, -(-rect.bottom // factor) - top)
+
+
+def _indexed(image: pygame.Surface) -> pygame.Surface:
+    if image.get_bitsize() == 8:
+        return image
+    indexed = _indexed_images.get(image)
+    if indexed is None:
+        indexed = _indexed_images[image] = palette.to_indexed(image)
+    return indexed
+
+
+def invalidate():
+    """
+    Make the next present update the whole window
+    """
+    global _needs_full_update
+    _needs_full_update = True
+
+
+def begin_frame(screen: pygame.Surface):
+    """
+    Start recording what gets drawn onto the screen
+    """
+    global _screen
+    _screen = screen
+    _drawn.clear()
+
+
+def blit(dest: pygame.Surface, image: pygame.Surface, position, area=None, special_flags=0) -> pygame.Rect:
+    if _is_scaled(dest):
+        return _blit_scaled(dest, image, position, area, special_flags)
+    rect = dest.blit(_indexed(image) if dest is _frame else image, position, area, special_flags)
+    if dest is _screen:
+        _drawn.append((rect.x, rect.y, rect.width, rect.height, image, area and tuple(area)))
+    return rect
+
+
+def _blit_scaled(dest: pygame.Surface, image: pygame.Surface, position, area, special_flags) -> pygame.Rect:
+    """
+    blit with SPRITES, where position and area are in the game's coordinates
+    :return: the rect that got drawn onto, in the game's coordinates
+    """
+    factor = _sprite_scale
+    scaled = _scaled(image)
+    if dest is _frame:
+        scaled = _indexed(scaled)
+    scaled_area = area and _scale_rect(area, factor)
+    rect = dest.blit(scaled, (int(position[0]) * factor, int(position[1]) * factor), scaled_area, special_flags)
+    if dest is _screen:
+        _drawn.append((rect.x, rect.y, rect.width, rect.height, image, area and tuple(area)))
+    return _unscale_rect(rect, factor)
+
+
+def blits(dest: pygame.Surface, sequence: list):
+    """
+    Batched blit of (image, position) pairs
+    """
+    # the same few images get blitted over and over, so each one gets looked up once
+    if _is_scaled(dest):
+        images = {image: _scaled(image) for image in {image for image, _ in sequence}}
+        if dest is _frame:
+            images = {image: _indexed(scaled) for image, scaled in images.items()}
+        factor = _sprite_scale
+        to_draw = [(images[image], (int(position[0]) * factor, int(position[1]) * factor))
+                   for image, position in sequence]
+    elif dest is _frame:
+        images = {image: _indexed(image) for image in {image for image, _ in sequence}}
+        to_draw = [(images[image], position) for image, position in sequence]
+    else:
+        to_draw = sequence
+    if dest is _screen:
+        rects = dest.blits(to_draw)
+        _drawn.extend((rect.x, rect.y, rect.width, rect.height, image, None)
+                      for rect, (image, _) in zip(rects, sequence))
+    else:
+        dest.blits(to_draw, doreturn=False)
+
+
+def fill(dest: pygame.Surface, color, rect=None):
+    """
+    Surface.fill, except that the 8-bit frame gets filled through a pixel array. SDL fills 8-bit surfaces a
+    byte at a time, which takes longer than filling a 32-bit one
+    """
+    if rect is not None and _is_scaled(dest):
+        rect = _scale_rect(rect, _sprite_scale)
+    if dest is not _frame:
+        dest.fill(color, rect)
+        return
+    rect = dest.get_rect() if rect is None else dest.get_rect().clip(rect)
+    pixels = pygame.surfarray.pixels2d(dest)
+    pixels[rect.left:rect.right, rect.top:rect.bottom] = dest.map_rgb(color)
+    del pixels  # unlocks the frame
+
+
+def set_at(dest: pygame.Surface, position, color):
+    if _is_scaled(dest):
+        # a pixel is a square of them
+        factor = _sprite_scale
+        x, y = int(position[0]) * factor, int(position[1]) * factor
+        dest.fill(color, (x, y, factor, factor))
+        if dest is _screen:
+            _drawn.append((x, y, factor, factor, color, None))
+        return
+    dest.set_at(position, color)
+    if dest is _screen:
+        _drawn.append((position[0], position[1], 1, 1, color, None))
+
+
+def dirty_rects() -> list:
+    """
+    Get the regions where this frame's drawing differs from the last frame's drawing
+    """
+    drawn = set(_drawn)
+    return [pygame.Rect(record[:4]) for record in drawn.symmetric_difference(_last_drawn)]
+
+
+def present(screen: pygame.Surface):
+    """
+    Show the frame that was drawn onto the window (or onto frame_surface)
+    """
+    global _last_drawn, _last_diff, _needs_full_update
+    is_full = mode == FULL or _needs_full_update
+    rects = [] if mode == FULL and not show_diff else dirty_rects()
+    if palette_mode or _native is not None:
+        # the diff view's outlines were drawn onto the window, and have to be drawn over too
+        redraw = rects + (_last_diff if _native is None else [_unscale_rect(rect, scale) for rect in _last_diff])
+        if palette_mode:
+            _present_frame(screen if _native is None else _native, is_full, redraw)
+        if _native is not None:
+            _present_native(screen, is_full, redraw)
+            rects = [_scale_rect(rect, scale) for rect in rects]
+    if mode == FULL:
+        if show_diff:
+            _draw_diff_view(screen, rects)
+        pygame.display.update()
+    else:
+        if show_diff:
+            outlines = _draw_diff_view(screen, rects)
+            rects.extend(outlines)
+            rects.extend(_last_diff)
+            _last_diff = outlines
+        if _needs_full_update or _is_mostly_dirty(screen, rects):
+            pygame.display.update()
+        elif rects:
+            pygame.display.update(rects)
+    _needs_full_update = False
+    _last_drawn = set(_drawn)
+
+
+def _present_frame(dest: pygame.Surface, is_full: bool, rects: list):
+    """
+    Convert the 8-bit frame onto the window (or _native), each palette entry showing its display color
+    """
+    _frame.set_palette(_display_colors)
+    if is_full:
+        dest.blit(_frame, (0, 0))
+    else:
+        for rect in rects:
+            dest.blit(_frame, rect, rect)
+    _frame.set_palette(palette.get_palette())  # so plain colors get drawn with the plain entries
+
+
+def _present_native(window: pygame.Surface, is_full: bool, rects: list):
+    """
+    Scale the offscreen surface onto the window, all of it or just rects of it
+    """
+    if is_full:
+        pygame.transform.scale(_native, window.get_size(), window)
+        return
+    bounds = _native.get_rect()
+    for rect in rects:
+        rect = rect.clip(bounds)
+        if rect:
+            scaled = _scale_rect(rect, scale)
+            pygame.transform.scale(_native.subsurface(rect), scaled.size, window.subsurface(scaled))
+
+
+def _is_mostly_dirty(screen: pygame.Surface, rects: list) -> bool:
+    if len(rects) > MAX_DIRTY_RECTS:
+        return True
+    dirty_area = sum(rect.width * rect.height for rect in rects)
+    return dirty_area > MAX_DIRTY_PORTION * screen.get_width() * screen.get_height()
+
+
+def _draw_diff_view(screen: pygame.Surface, rects: list) -> list:
+    return [pygame.draw.rect(screen, DIFF_VIEW_COLOR, rect.inflate(2, 2), 1) for rect in rects]
@@ -0,0 +1,251 @@
+# replay.py
+
+"""
+Compact input recording and deterministic replay.
+Each simulation tick's input is one byte: which of the game's keys are held, and which of them were
+pressed during the tick. The bytes are run-length encoded, since the input hardly changes from one tick to
+the next. Replaying a log with the session's seed gives exactly the same game.
+
+Log file format (little endian):
+    magic, version (u8), seed (u64), simulation step in millis (u16), initial state name (u8 length + utf-8),
+    number of ticks (u32), then runs of (key byte (u8), run length (varint))
+"""
+
+import random
+import struct
+import sys
+
+import pygame
+
+from . import constants as c
+
+MAGIC = b'GREC'
+VERSION = 1
+
+# Keys that get recorded, one bit each for "held" and one more for "pressed this tick"
+RECORDED_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE, pygame.K_RETURN)
+PRESSED_SHIFT = len(RECORDED_KEYS)
+_KEY_BITS = {key: 1 << i for i, key in enumerate(RECORDED_KEYS)}
+
+
+class KeyState:
+    """
+    Stands in for pygame.key.get_pressed() with the held keys from a key byte
+    """
+    __slots__ = ('mask',)
+
+    def __init__(self, mask: int):
+        self.mask = mask
+
+    def __getitem__(self, key) -> bool:
+        bit = _KEY_BITS.get(key)
+        return bit is not None and bool(self.mask & bit)
+
+
+def encode_tick(pressed_keys, keydown_events) -> int:
+    """
+    Pack a tick's input into a key byte
+    :param pressed_keys: the keys held at the end of the tick, like from pygame.key.get_pressed()
+    :param keydown_events: the KEYDOWN events of the tick
+    """
+    mask = 0
+    for key, bit in _KEY_BITS.items():
+        if pressed_keys[key]:
+            mask |= bit
+    for event in keydown_events:
+        bit = _KEY_BITS.get(event.key)
+        if bit is not None:
+            mask |= bit << PRESSED_SHIFT
+    return mask
+
+
+def decode_events(mask: int) -> list:
+    """
+    Make the KEYDOWN events for the keys pressed during a tick
+    """
+    return [pygame.event.Event(pygame.KEYDOWN, key=key, mod=0, unicode='', scancode=0)
+            for key, bit in _KEY_BITS.items() if mask & (bit << PRESSED_SHIFT)]
+
+
+def _write_varint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, index: int):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[index]
+        index += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, index
+        shift += 7
+
+
+class InputLog:
+    """
+    A recording of one session: its seed, the state it started in, and the runs of key bytes
+    """
+
+    def __init__(self, seed: int, initial_state_name: str = c.TITLE_STATE, step: int = c.SIMULATION_STEP):
+        self.seed = seed
+        self.initial_state_name = initial_state_name
+        self.step = step
+        self.runs = []  # [key byte, number of ticks]
+        self.num_ticks = 0
+
+    def append(self, mask: int):
+        if self.runs and self.runs[-1][0] == mask:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([mask, 1])
+        self.num_ticks += 1
+
+    def ticks(self):
+        """
+        Iterate over every tick's key byte
+        """
+        for mask, run_length in self.runs:
+            for _ in range(run_length):
+                yield mask
+
+    def to_bytes(self) -> bytes:
+        name = self.initial_state_name.encode()
+        out = bytearray(MAGIC)
+        out += struct.pack('<BQHB', VERSION, self.seed, self.step, len(name))
+        out += name
+        out += struct.pack('<I', self.num_ticks)
+        for mask, run_length in self.runs:
+            out.append(mask)
+            _write_varint(out, run_length)
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("not an input log")
+        index = len(MAGIC)
+        version, seed, step, name_length = struct.unpack_from('<BQHB', data, index)
+        if version != VERSION:
+            raise ValueError("unsupported input log version {}".format(version))
+        index += struct.calcsize('<BQHB')
+        name = bytes(data[index:index + name_length]).decode()
+        index += name_length
+        num_ticks, = struct.unpack_from('<I', data, index)
+        index += 4
+        log = cls(seed, name, step)
+        while index < len(data):
+            mask = data[index]
+            run_length, index = _read_varint(data, index + 1)
+            log.runs.append([mask, run_length])
+        log.num_ticks = num_ticks
+        return log
+
+    def save(self, path):
+        with open(path, 'wb') as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as file:
+            log = cls.from_bytes(file.read())
+        if log.step != c.SIMULATION_STEP:
+            # the game would tick at another rate than the log was recorded at, and drift from it
+            raise ValueError("{} was recorded with a {} ms step, the game steps {} ms".format(
+                path, log.step, c.SIMULATION_STEP))
+        return log
+
+
+class Recorder:
+    """
+    Records the input of every tick into a log
+    """
+
+    def __init__(self, log: InputLog):
+        self.log = log
+
+    def record(self, pressed_keys, events):
+        self.log.append(encode_tick(pressed_keys, [event for event in events if event.type == pygame.KEYDOWN]))
+
+
+class Replayer:
+    """
+    Plays a log back, one tick at a time
+    """
+
+    def __init__(self, log: InputLog):
+        self.log = log
+        self._ticks = log.ticks()
+        self.tick_num = 0
+        self.is_done = log.num_ticks == 0
+
+    def next_tick(self):
+        """
+        Get the next tick's input
+        :return: (held keys, list of KEYDOWN events), or (None, None) at the end of the log
+        """
+        mask = next(self._ticks, None)
+        if mask is None:
+            self.is_done = True
+            return None, None
+        self.tick_num += 1
+        self.is_done = self.tick_num >= self.log.num_ticks
+        return KeyState(mask), decode_events(mask)
+
+
+def scripted_log(seed: int, num_ticks: int, initial_state_name: str = c.DEMO_STATE) -> InputLog:
+    """
+    Make up a plausible session: the fighter wanders from side to side and fires every so often
+    :param seed: the session seed, which also drives the made-up input
+    :param num_ticks: how long the session is
+    :param initial_state_name: the state the session starts in
+    """
+    rng = random.Random(seed)
+    log = InputLog(seed, initial_state_name)
+    moves = (0, _KEY_BITS[pygame.K_LEFT], _KEY_BITS[pygame.K_RIGHT])
+    fire = _KEY_BITS[pygame.K_SPACE]
+    move = 0
+    move_ticks = 0
+    was_firing = False
+    for _ in range(num_ticks):
+        if move_ticks <= 0:
+            move = rng.choice(moves)
+            move_ticks = rng.randint(8, 40)
+        move_ticks -= 1
+        # a tap of the fire button takes two ticks, pressed and then released
+        is_firing = not was_firing and rng.random() < 0.2
+        was_firing = is_firing
+        log.append(move | (fire | fire << PRESSED_SHIFT if is_firing else 0))
+    return log
+
+
+def random_log(seed: int, num_ticks: int, initial_state_name: str = c.PLAY_STATE) -> InputLog:
+    """
+    Make up a session of button mashing: every tick the fighter goes a random way, and fires half the time
+    :param seed: the session seed, which also drives the made-up input
+    :param num_ticks: how long the session is
+    :param initial_state_name: the state the session starts in
+    """
+    rng = random.Random(seed)
+    log = InputLog(seed, initial_state_name)
+    moves = (0, _KEY_BITS[pygame.K_LEFT], _KEY_BITS[pygame.K_RIGHT])
+    fire = _KEY_BITS[pygame.K_SPACE]
+    was_firing = False
+    for _ in range(num_ticks):
+        is_firing = not was_firing and rng.random() < 0.5
+        was_firing = is_firing
+        log.append(rng.choice(moves) | (fire | fire << PRESSED_SHIFT if is_firing else 0))
+    return log
+
+
+if __name__ == '__main__':
+    # Write the demo's made-up session:
+    #   python -m source.replay resources/demo.rec [seed] [seconds]
+    path = sys.argv[1]
+    demo_seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1981
+    seconds = int(sys.argv[3]) if len(sys.argv) > 3 else 30
+    scripted_log(demo_seed, seconds * 1000 // c.SIMULATION_STEP).save(path)
@@ -0,0 +1,45 @@
+# rng.py
+
+"""
+Seeded random number streams owned by a game session.
+Every part of the game that needs randomness gets its own named stream from the session, so a session
+started with the same seed (and fed the same input) plays out exactly the same.
+"""
+
+import hashlib
+import random
+
+import numpy as np
+
+
+def new_seed() -> int:
+    return random.SystemRandom().getrandbits(63)
+
+
+class RandomStreams:
+
+    def __init__(self, seed=None):
+        self.seed = new_seed() if seed is None else seed
+        self._streams = {}
+
+    def stream_seed(self, name: str) -> int:
+        """
+        Get a seed for a named stream, which only depends on the session seed and the name
+        """
+        digest = hashlib.sha256('{}:{}'.format(self.seed, name).encode()).digest()
+        return int.from_bytes(digest[:8], 'little')
+
+    def stream(self, name: str) -> random.Random:
+        """
+        Get the named stream, creating it the first time
+        """
+        stream = self._streams.get(name)
+        if stream is None:
+            stream = self._streams[name] = random.Random(self.stream_seed(name))
+        return stream
+
+    def numpy_stream(self, name: str) -> np.random.Generator:
+        """
+        Get a new NumPy generator for a named stream
+        """
+        return np.random.default_rng(self.stream_seed(name))
@@ -1,33 +1,232 @@
+# scoring.py
+
+"""
+The leaderboard, which keeps every game ever played (name, score, stage, shots and hits) in an SQLite
+database. Scores are indexed, so the top scores come straight off the index. The rank of a score is
+looked up by bisecting a sorted array of every score, which is read off the index once and then kept up
+to date.
+
+New games get written in transactions on a background thread, so ending a game never waits on the
+disk. Until a game has been written it is kept in memory, and queries see it all the same.
+The old scores file (five "NAME SCORE" lines) gets imported the first time the database is made.
+"""
+
+import atexit
+import bisect
+import queue
+import sqlite3
+import threading
+from array import array
 from collections import namedtuple
-from . import constants as c
+
+from . import constants as c, setup
 
 ScoreRecord = namedtuple('Score', 'name score')
+RunRecord = namedtuple('Run', 'name score stage_num num_shots num_hits')
 
 NUM_TRACKED_SCORES = c.NUM_TRACKED_SCORES
+MEMORY = ':memory:'  # path of a leaderboard that is never saved
+SCHEMA_VERSION = 1
 
+# Shown when there are no scores at all
+DEFAULT_SCORES = [ScoreRecord('AAA', 30_000),
+                  ScoreRecord('BBB', 20_000),
+                  ScoreRecord('CCC', 10_000),
+                  ScoreRecord('DDD', 9_000),
+                  ScoreRecord('EEE', 8_000)]
 
-def load_scores() -> list:
+_SCHEMA = """
+CREATE TABLE runs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    stage INTEGER NOT NULL,
+    shots INTEGER NOT NULL,
+    hits INTEGER NOT NULL
+);
+CREATE INDEX runs_by_score ON runs (score DESC, id);
+"""
+_INSERT = "INSERT INTO runs (id, name, score, stage, shots, hits) VALUES (?, ?, ?, ?, ?, ?)"
+
+_leaderboard = None  # the one get_leaderboard gives
+
+
+def read_score_file(path: str) -> list:
+    """
+    Read the scores out of an old style scores file
+    :return: list of ScoreRecords, empty if there is no file
+    """
     scores = []
-    with open(c.SCORE_FILE) as file:
-        # Read a max of NUM_TRACKED_SCORES lines
-        for line, _ in zip(file, range(NUM_TRACKED_SCORES)):
-            name, score = line.split(' ')
-            name = name[:3]  # Limit name length to 3
-            score = int(score)  # The score is an int.
-            record = ScoreRecord(name, score)
-            scores.append(record)
-    if not scores:
-        return [ScoreRecord('AAA', 30_000),
-                ScoreRecord('BBB', 20_000),
-                ScoreRecord('CCC', 10_000),
-                ScoreRecord('DDD', 9_000),
-                ScoreRecord('EEE', 8_000)]
+    try:
+        with open(path) as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                name, score = line.split()
+                scores.append(ScoreRecord(name[:3], int(score)))  # names are at most 3 letters
+    except FileNotFoundError:
+        pass  # no scores yet
     return scores
 
 
-def save_scores(scores):
-    sorted_scores = sorted(scores)
-    lines = ["{} {}".format(record.name, record.score) for record in sorted_scores[:NUM_TRACKED_SCORES]]
-    with open(c.SCORE_FILE) as file:
-        file.writelines(lines)
+class Leaderboard:
+
+    def __init__(self, path: str, import_path: str = None):
+        """
+        :param path: the database file, made if it isn't there, or MEMORY
+        :param import_path: old style scores file to fill a newly made database with
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.sorted_scores = None  # every score, smallest first, for rank. Read the first time it is needed
+        self.pending = {}  # row id -> run, for runs that have been submitted but might not be written yet
+        self.lock = threading.Lock()
+        self._create(import_path)
+        # ids get handed out here, so a run is the same row before and after it is written
+        self.next_id = self.connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM runs").fetchone()[0]
+
+        self.queue = None
+        self.writer = None
+        if path != MEMORY:
+            # readers don't wait on the writer, and the writer doesn't wait on readers
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.queue = queue.Queue()
+            self.writer = threading.Thread(target=self._write_runs, name='leaderboard writer', daemon=True)
+            self.writer.start()
+
+    def _create(self, import_path: str):
+        connection = self.connection
+        if connection.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION:
+            return
+        with connection:
+            connection.executescript("BEGIN;" + _SCHEMA)
+            if import_path is not None:
+                connection.executemany(_INSERT, [(None, record.name, record.score, 0, 0, 0)
+                                                 for record in read_score_file(import_path)])
+            connection.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+
+    def _write_runs(self):
+        """
+        Write submitted runs as they come, until None comes
+        """
+        connection = sqlite3.connect(self.path)
+        try:
+            while True:
+                run = self.queue.get()
+                runs = [run]
+                # whatever else piled up goes in the same transaction
+                while True:
+                    try:
+                        runs.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+                to_write = [run for run in runs if run is not None]
+                if to_write:
+                    with connection:
+                        connection.executemany(_INSERT, to_write)
+                    with self.lock:
+                        for row in to_write:
+                            del self.pending[row[0]]
+                for _ in runs:
+                    self.queue.task_done()
+                if None in runs:
+                    return
+        finally:
+            connection.close()
 
+    def submit(self, run: RunRecord):
+        """
+        Add a finished game, without waiting for it to be written
+        """
+        run = RunRecord(run.name[:3], *run[1:])
+        row_id = self.next_id
+        self.next_id += 1
+        if self.sorted_scores is not None:
+            bisect.insort(self.sorted_scores, run.score)
+        if self.queue is None:
+            with self.connection:
+                self.connection.execute(_INSERT, (row_id, *run))
+            return
+        with self.lock:
+            self.pending[row_id] = run
+        self.queue.put((row_id, *run))
+
+    def top(self, k: int = NUM_TRACKED_SCORES) -> list:
+        """
+        Get the k best runs, best first. Ties go to whoever got the score first
+        :return: list of RunRecords
+        """
+        with self.lock:
+            pending = dict(self.pending)
+        rows = self.connection.execute(
+            "SELECT id, name, score, stage, shots, hits FROM runs ORDER BY score DESC, id LIMIT ?", (k,)).fetchall()
+        # a run can get written in between, so skip the ones that are already in the rows
+        for row in rows:
+            pending.pop(row[0], None)
+        rows.extend((row_id, *run) for row_id, run in pending.items())
+        rows.sort(key=lambda row: (-row[2], row[0]))
+        return [RunRecord(*row[1:]) for row in rows[:k]]
+
+    def _read_sorted_scores(self) -> array:
+        with self.lock:
+            pending = dict(self.pending)
+        # the index hands the scores over in order already. A run can get written in between, so skip the ones
+        # that are still in pending, and put those in after
+        scores = array('q', (score for row_id, score in self.connection.execute(
+            "SELECT id, score FROM runs ORDER BY score") if row_id not in pending))
+        for run in pending.values():
+            bisect.insort(scores, run.score)
+        return scores
+
+    def rank(self, score: int) -> int:
+        """
+        Get the place a score would take on the leaderboard, 1 being the top
+        """
+        if self.sorted_scores is None:
+            self.sorted_scores = self._read_sorted_scores()
+        return len(self.sorted_scores) - bisect.bisect_right(self.sorted_scores, score) + 1
+
+    def flush(self):
+        """
+        Wait for every submitted run to be written
+        """
+        if self.queue is not None:
+            self.queue.join()
+
+    def close(self):
+        if self.writer is not None and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        self.connection.close()
+
+
+def get_leaderboard() -> Leaderboard:
+    """
+    Get the game's leaderboard, opening it the first time. Headless games get one that is never saved
+    """
+    global _leaderboard
+    if _leaderboard is None:
+        path = MEMORY if setup.HEADLESS else c.SCORE_DB_FILE
+        set_leaderboard(Leaderboard(path, import_path=c.SCORE_FILE))
+    return _leaderboard
+
+
+def set_leaderboard(leaderboard: Leaderboard):
+    """
+    Use a different leaderboard, like a MEMORY one for games that shouldn't count
+    """
+    global _leaderboard
+    if _leaderboard is not None:
+        atexit.unregister(_leaderboard.close)
+        _leaderboard.close()
+    _leaderboard = leaderboard
+    atexit.register(leaderboard.close)
+
+
+def load_scores() -> list:
+    """
+    Get the NUM_TRACKED_SCORES best scores
+    :return: list of ScoreRecords, best first
+    """
+    scores = [ScoreRecord(run.name, run.score) for run in get_leaderboard().top(NUM_TRACKED_SCORES)]
+    return scores or list(DEFAULT_SCORES)
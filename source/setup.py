@@ -1,9 +1,11 @@
 import os
+from collections import OrderedDict
 from string import ascii_lowercase
 
 import pygame
 
-from . import constants as c
+from . import constants as c, assets
+from .frames import SHEET_FRAMES
 
 # font spritesheet coordinates and stuff
 FONT_ALPHABET_Y = 224
@@ -12,15 +14,30 @@ FONT_CHAR_SIZE = 8
 # Pygame key constants
 START_KEYS = [pygame.K_SPACE, pygame.K_RETURN]
 
+# Set this environment variable to 1 before importing the game to run without a display or sound device
+HEADLESS_ENV_VAR = 'GALAGA_HEADLESS'
+HEADLESS = os.environ.get(HEADLESS_ENV_VAR) == '1'
+
+# Long tracks that get streamed with pygame.mixer.music instead of being decoded into memory
+MUSIC_TRACKS = ('theme', 'theme_echoed', 'game_over', 'new_high_score', 'perfect_challenge', 'fighter_captured',
+                'wait')
+MAX_CACHED_SOUNDS = 10  # decoded sound effects to keep in memory
+MUTED = False  # whether audio.play_sound and play_music do nothing, like during the demo
+
 # Setup pygame
-SCREEN = FONT = SOUNDS = GRAPHICS = None
+SCREEN = FONT = SOUNDS = SOUND_FILES = MUSIC_FILES = GRAPHICS = FRAMES = ASSETS = None
 
 
 def setup_game():
-    global SCREEN, FONT, SOUNDS, GRAPHICS
+    global SCREEN, FONT, SOUNDS, FRAMES
 
-    # Center the window
-    os.environ['SDL_VIDEO_CENTERED'] = '1'
+    if HEADLESS:
+        # SDL's dummy drivers still give a display surface to convert images for, it just never gets shown
+        os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    else:
+        # Center the window
+        os.environ['SDL_VIDEO_CENTERED'] = '1'
 
     pygame.init()
     SCREEN = pygame.display.set_mode(c.DEFAULT_SCREEN_SIZE)
@@ -28,8 +45,41 @@ def setup_game():
 
     # Load these
     FONT = load_font()
-    SOUNDS = load_all_sfx(os.path.join(c.RESOURCE_DIR, "audio"), (".ogg",))
+    load_assets()
+    SOUNDS = OrderedDict()  # decoded lazily, see get_sfx
+    FRAMES = load_frames(GRAPHICS['sheet'], SHEET_FRAMES)
+
+
+def load_assets():
+    """
+    Load the graphics and find the sounds, through the prebaked asset cache if it is up to date.
+    Otherwise load them from the source files and write a new cache for next time.
+    """
+    global SOUND_FILES, MUSIC_FILES, GRAPHICS, ASSETS
+
+    audio_dir = os.path.join(c.RESOURCE_DIR, "audio")
+    audio_files = find_all_sfx(audio_dir, (".ogg",)) if os.path.isdir(audio_dir) else {}
+    MUSIC_FILES = {name: path for name, path in audio_files.items() if name in MUSIC_TRACKS}
+    SOUND_FILES = {name: path for name, path in audio_files.items() if name not in MUSIC_TRACKS}
+
+    cache_path = os.path.join(c.RESOURCE_DIR, assets.CACHE_FILE_NAME)
+    source_hashes = assets.hash_sources(c.RESOURCE_DIR)
+    ASSETS = assets.AssetCache.open(cache_path, source_hashes)
+    if ASSETS is not None:
+        GRAPHICS = ASSETS.load_images()
+        # when running from a zipapp, the sounds only exist in the cache
+        for name in ASSETS.sound_entries:
+            SOUND_FILES.setdefault(name, None)
+        for name in ASSETS.music_entries:
+            MUSIC_FILES.setdefault(name, None)
+        return
+
     GRAPHICS = load_all_gfx(os.path.join(c.RESOURCE_DIR, "graphics"), ('.png', ".bmp"))
+    try:
+        assets.build_cache(cache_path, source_hashes, GRAPHICS, SOUND_FILES, MUSIC_FILES)
+    except OSError:
+        return  # can't write it here, so just go without
+    ASSETS = assets.AssetCache.open(cache_path, source_hashes)
 
 
 def load_all_gfx(directory, accept=('.png', '.bmp', '.gif'), color_key=pygame.Color('black')) -> dict:
@@ -47,14 +97,37 @@ def load_all_gfx(directory, accept=('.png', '.bmp', '.gif'), color_key=pygame.Co
     return graphics
 
 
-def load_all_sfx(directory, accept=(".ogg", ".wav")) -> dict:
+def load_frames(sheet: pygame.Surface, frame_rects: dict, color_key=pygame.Color('black')) -> dict:
+    """
+    Cut named frames out of a sheet once, as standalone surfaces in the display format.
+    Frames that share a rectangle share a surface.
+    """
+    cut = {}
+    frames = {}
+    for name, rect in frame_rects.items():
+        rect = tuple(rect)
+        frame = cut.get(rect)
+        if frame is None:
+            frame = sheet.subsurface(rect).copy()
+            # sprites are mostly transparent, so run-length encoding the colorkey makes blits cheaper
+            frame.set_colorkey(color_key, pygame.RLEACCEL)
+            cut[rect] = frame
+        frames[name] = frame
+    return frames
+
+
+def find_all_sfx(directory, accept=(".ogg", ".wav")) -> dict:
+    """
+    Find the sound files in a directory, without decoding them
+    :return: dict of sound name -> file path
+    """
     accept_all = len(accept) == 0
-    effects = {}
+    files = {}
     for filename in os.listdir(directory):
         name, ext = os.path.splitext(filename)
         if accept_all or ext.lower() in accept:
-            effects[name] = pygame.mixer.Sound(os.path.join(directory, filename))
-    return effects
+            files[name] = os.path.join(directory, filename)
+    return files
 
 
 def load_font() -> dict:
@@ -83,11 +156,36 @@ def load_font() -> dict:
 
 
 def get_sfx(sound_name: str) -> pygame.mixer.Sound:
-    return SOUNDS.get(sound_name)
+    """
+    Get a sound effect, decoding it the first time it is needed.
+    Only the most recently used effects stay decoded.
+    """
+    sound = SOUNDS.get(sound_name)
+    if sound is not None:
+        SOUNDS.move_to_end(sound_name)
+        return sound
+    if sound_name not in SOUND_FILES:
+        return None
+    if ASSETS is not None and ASSETS.has_sound(sound_name):
+        sound = ASSETS.load_sound(sound_name)
+    else:
+        sound = pygame.mixer.Sound(SOUND_FILES[sound_name])
+    SOUNDS[sound_name] = sound
+    if len(SOUNDS) > MAX_CACHED_SOUNDS:
+        SOUNDS.popitem(last=False)
+    return sound
 
 
 def has_sfx(sound_name: str) -> bool:
-    return get_sfx(sound_name) is not None
+    return sound_name in SOUND_FILES or sound_name in MUSIC_FILES
+
+
+def preload_sfx(sound_names):
+    """
+    Decode some sound effects ahead of time, so that playing them later doesn't have to
+    """
+    for name in sound_names:
+        get_sfx(name)
 
 
 def get_image(image_name: str) -> pygame.Surface:
@@ -98,6 +196,14 @@ def has_image(image_name: str) -> bool:
     return get_image(image_name) is not None
 
 
+def get_frame(frame_name: str) -> pygame.Surface:
+    return FRAMES.get(frame_name)
+
+
+def has_frame(frame_name: str) -> bool:
+    return get_frame(frame_name) is not None
+
+
 def get_from_font(character) -> tuple:
     return FONT.get(character)
 
@@ -106,12 +212,23 @@ def has_char_in_font(character: str) -> bool:
     return get_from_font(character) is not None
 
 
-def play_sound(sound_name):
-    SOUNDS.get(sound_name).play()
+def set_muted(muted: bool):
+    global MUTED
+    MUTED = muted
 
 
-def stop_sounds():
-    pygame.mixer.stop()
+def play_music(track_name, loops=0):
+    """
+    Stream a long track (only one can play at a time)
+    """
+    if MUTED:
+        return
+    path = MUSIC_FILES[track_name]
+    if path is None:
+        pygame.mixer.music.load(ASSETS.open_music(track_name))
+    else:
+        pygame.mixer.music.load(path)
+    pygame.mixer.music.play(loops)
 
 
 # load all the resources
@@ -0,0 +1,82 @@
+# simulate.py
+
+"""
+Headless simulation of games, running as fast as the CPU allows.
+The environment variable in setup.HEADLESS_ENV_VAR has to be set before the game is imported, so use the
+simulate.py script next to galaga.py to run this.
+"""
+
+import argparse
+import time
+from collections import namedtuple
+
+from . import constants as c, setup, replay
+from .main import Control, STATES
+from .states import new_persist
+
+DEFAULT_MAX_TICKS = 10 * 60 * 1000 // c.SIMULATION_STEP  # 10 minutes of game time
+
+GameResult = namedtuple("GameResult", "ticks seconds score num_shots num_hits stage_num")
+
+
+def run_game(max_ticks=DEFAULT_MAX_TICKS, draw=False, seed=None, log=None) -> GameResult:
+    """
+    Play one game headlessly from the start of the play state until it is over, or until max_ticks
+    :param max_ticks: the most simulation ticks to run for
+    :param draw: whether to still draw each frame (without showing it)
+    :param seed: seed for the game's randomness, or None for a random one
+    :param log: a recorded session (replay.InputLog) to play back until it runs out, instead of a game without
+    any input. It starts in whatever state it was recorded from, with its own seed
+    :return: the results of the game
+    """
+    if log is None:
+        initial_state, replayer = c.PLAY_STATE, None
+    else:
+        initial_state, replayer, seed = log.initial_state_name, replay.Replayer(log), log.seed
+    control = Control(STATES, initial_state, persist=new_persist(seed), headless=True, uncapped=True,
+                      replayer=replayer)
+    start = time.perf_counter()
+    ticks = 0
+    while control.running and (replayer or control.state_name == c.PLAY_STATE) and ticks < max_ticks:
+        control.step()
+        ticks += 1
+        if draw:
+            control.draw_frame()
+    seconds = time.perf_counter() - start
+
+    persist = control.state.cleanup()
+    return GameResult(ticks, seconds, persist.current_score, persist.num_shots, persist.num_hits,
+                      persist.stage_num)
+
+
+def main(args=None):
+    if not setup.HEADLESS:
+        raise RuntimeError("set {}=1 before importing the game to simulate".format(setup.HEADLESS_ENV_VAR))
+
+    parser = argparse.ArgumentParser(description="Run Galaga games headless and uncapped.")
+    parser.add_argument('-n', '--games', type=int, default=1, help="number of games to run")
+    parser.add_argument('-t', '--max-ticks', type=int, default=DEFAULT_MAX_TICKS,
+                        help="max. simulation ticks per game")
+    parser.add_argument('-d', '--draw', action='store_true', help="draw every frame offscreen too")
+    parser.add_argument('-s', '--seed', type=int, help="seed of the first game, the next games count up from it")
+    parser.add_argument('-r', '--replay', metavar='PATH', help="play back a recorded session in every game")
+    options = parser.parse_args(args)
+    try:
+        log = replay.InputLog.load(options.replay) if options.replay else None
+    except ValueError as e:
+        parser.error(str(e))
+    if log is not None and log.initial_state_name == c.DEMO_STATE:
+        parser.error("the demo's log gets played by the demo itself")
+
+    total_ticks = 0
+    total_seconds = 0.0
+    for game_num in range(options.games):
+        seed = None if options.seed is None else options.seed + game_num
+        result = run_game(options.max_ticks, options.draw, seed, log)
+        total_ticks += result.ticks
+        total_seconds += result.seconds
+        print("game {}: {} ticks in {:.2f}s ({:.0f} ticks/s), score {}, stage {}, {}/{} hits".format(
+            game_num + 1, result.ticks, result.seconds, result.ticks / max(result.seconds, 1e-9), result.score,
+            result.stage_num, result.num_hits, result.num_shots))
+    print("total: {} ticks in {:.2f}s ({:.0f} ticks/s)".format(total_ticks, total_seconds,
+                                                              total_ticks / max(total_seconds, 1e-9)))
@@ -1,8 +1,64 @@
+import math
+import weakref
+from collections import OrderedDict
 from .tools import time_millis
 import pygame
-from . import constants as c, tools
-from .constants import Rectangle
-from .tools import grab_sheet
+from . import constants as c, tools, render, paths, entities
+from .setup import get_frame
+
+ROTATION_STEPS = 16  # headings a rotated image can show
+# Points that get shown when scored, from the enemies and the bonuses
+SCORE_VALUES = (50, 80, 100, 150, 160, 300, 400, 500, 800, 1000, 1500, 1600, 2000, 3000)
+MAX_CACHED_SCORE_SURFACES = 16  # for any other numbers
+
+# source image -> list of its flip variants, indexed by flip_horizontal + 2 * flip_vertical
+_flip_cache = weakref.WeakKeyDictionary()
+# source image -> list of its rotations, indexed by rotation step
+_rotation_cache = weakref.WeakKeyDictionary()
+
+
+def get_flipped(image: pygame.Surface, flip_horizontal: bool, flip_vertical: bool) -> pygame.Surface:
+    """
+    Get a flipped version of an image, creating each variant only the first time it is asked for
+    """
+    index = flip_horizontal + 2 * flip_vertical
+    if index == 0:
+        return image
+    variants = _flip_cache.get(image)
+    if variants is None:
+        variants = [None, None, None, None]  # no reference to the image itself, or it would never be freed
+        _flip_cache[image] = variants
+    flipped = variants[index]
+    if flipped is None:
+        flipped = pygame.transform.flip(image, flip_horizontal, flip_vertical)
+        variants[index] = flipped
+    return flipped
+
+
+def heading_to_step(heading: float) -> int:
+    """
+    Get the rotation step (0 is facing up, counting clockwise) closest to a heading (radians, 0 is right and
+    pi/2 is down the screen)
+    """
+    return round((heading + math.pi / 2) * ROTATION_STEPS / (2 * math.pi)) % ROTATION_STEPS
+
+
+def get_rotated(image: pygame.Surface, step: int) -> pygame.Surface:
+    """
+    Get an image turned clockwise by some rotation steps, creating each rotation only the first time it is
+    asked for
+    """
+    if step == 0:
+        return image
+    rotations = _rotation_cache.get(image)
+    if rotations is None:
+        rotations = [None] * ROTATION_STEPS  # no reference to the image itself, or it would never be freed
+        _rotation_cache[image] = rotations
+    rotated = rotations[step]
+    if rotated is None:
+        rotated = pygame.transform.rotate(image, -step * 360 / ROTATION_STEPS)
+        rotations[step] = rotated
+    return rotated
 
 
 class GalagaSprite(pygame.sprite.Sprite):
@@ -11,14 +67,16 @@ class GalagaSprite(pygame.sprite.Sprite):
     Useful for sprites that can flip their images, show/hide, and have their images offset from
     their centers, as well as having centered sprites.
     """
+    pool = None  # the pools.Pool the sprite belongs to, if it is pooled
+    in_use = False
+    KIND = entities.OTHER
 
     def __init__(self, x, y, width, height, *groups: pygame.sprite.Group):
         super(GalagaSprite, self).__init__(groups)
 
-        # Rectangle and position
-        self.rect = pygame.Rect(0, 0, width, height)
-        self.x = x
-        self.y = y
+        # Position (sub-pixel), velocity and rectangle live in the entity store
+        self.entity = entities.STORE.add(self, x, y, width, height, self.KIND)
+        self.rect = self.entity.rect
 
         # Display and image variables
         self.image = None
@@ -29,43 +87,69 @@ class GalagaSprite(pygame.sprite.Sprite):
         self.flip_vertical: bool = False
 
     @property
-    def x(self):
-        return self.rect.centerx
+    def x(self) -> float:
+        return self.entity.x
 
     @x.setter
-    def x(self, value: int):
-        self.rect.centerx = value
+    def x(self, value: float):
+        self.entity.x = value
 
     @property
-    def y(self):
-        return self.rect.centery
+    def y(self) -> float:
+        return self.entity.y
 
     @y.setter
-    def y(self, value: int):
-        self.rect.centery = value
+    def y(self, value: float):
+        self.entity.y = value
+
+    @property
+    def last_x(self) -> float:
+        # position as of the previous simulation tick, for drawing in between ticks
+        return self.entity.last_x
+
+    @property
+    def last_y(self) -> float:
+        return self.entity.last_y
+
+    def save_position(self):
+        """
+        Remember the current position as the previous tick's position
+        """
+        self.entity.save_position()
+
+    def kill(self):
+        super(GalagaSprite, self).kill()
+        if self.pool is not None:
+            # back into its pool to be used again
+            self.pool.release(self)
 
     def update(self, delta_time: int, flash_flag: bool):
         pass
 
     def display(self, surface: pygame.Surface):
         if self.image is not None and self.is_visible:
-            image = pygame.transform.flip(self.image, self.flip_horizontal, self.flip_vertical)
+            image = get_flipped(self.image, self.flip_horizontal, self.flip_vertical)
             img_width, img_height = image.get_size()
+            # Draw in between the last tick's position and the current one
+            alpha = render.interpolation
+            x = round(self.last_x + (self.x - self.last_x) * alpha)
+            y = round(self.last_y + (self.y - self.last_y) * alpha)
             # Center the image
-            x = self.x - img_width // 2 + self.image_offset_x
-            y = self.y - img_height // 2 + self.image_offset_y
-            surface.blit(image, (x, y))
+            x = x - img_width // 2 + self.image_offset_x
+            y = y - img_height // 2 + self.image_offset_y
+            render.blit(surface, image, (x, y))
 
 
 class Player(GalagaSprite):
+    KIND = entities.PLAYER
 
     def __init__(self, x, y):
         super(Player, self).__init__(x, y, 14, 12)
-        self.image = grab_sheet(6 * 16, 0 * 16, 16, 16)
+        self.image = get_frame('fighter')
         self.image_offset_x = 1
 
     def update(self, delta_time, keys):
-        s = round(c.PLAYER_SPEED * delta_time)
+        s = c.PLAYER_SPEED * delta_time
         if keys[pygame.K_RIGHT]:
             self.x += s
         elif keys[pygame.K_LEFT]:
@@ -73,99 +157,161 @@ class Player(GalagaSprite):
 
 
 class Enemy(GalagaSprite):
+    KIND = entities.ENEMY
 
     FRAMES = {
-            'test': [(96, 32, 16, 16)],
+            'test': ['butterfly_1'],
+            'bee': ['bee_1', 'bee_2'],
+            'butterfly': ['butterfly_1', 'butterfly_2'],
+            'boss': ['boss_1', 'boss_2'],
+            'boss_hit': ['boss_hit_1', 'boss_hit_2'],
+            }
+
+    POINTS = {
+            'bee': 400,
+            'butterfly': 400,
+            'boss': 800,
+            'boss_hit': 800,
             }
 
-    def __init__(self, x, y, enemy_type):
+    # What an enemy is doing
+    WAITING = 0  # waiting to come onto the stage
+    ENTERING = 1  # flying in along its entry path
+    JOINING = 2  # flying straight to its slot in the formation
+    IN_FORMATION = 3
+    DIVING = 4
+
+    def __init__(self, x, y, enemy_type, formation=None, slot=None):
         super(Enemy, self).__init__(x, y, 16, 16)
         self.enemy_type = enemy_type
+        # the formation.Formation and the slot in it that the enemy sits in, if it is in one
+        self.formation = formation
+        self.slot = slot
+        self.state = self.IN_FORMATION
+        self.follower: paths.PathFollower = None
+        self.wait_time = 0
+        self.heading = -math.pi / 2  # facing up
+        self.animation_flag = False
+
+    @property
+    def points(self) -> int:
+        return self.POINTS.get(self.enemy_type, 0)
+
+    def move_to_slot(self):
+        self.entity.move_to(*self.formation.slot_center(self.slot))
+
+    def jump_to(self, x, y):
+        # move without drawing the in between
+        self.entity.move_to(x, y)
+        self.save_position()
+
+    def enter(self, path_name: str, mirror: bool, delay: int):
+        """
+        Fly onto the stage along an entry path, after a delay (millis.)
+        """
+        self.state = self.WAITING
+        self.is_visible = False
+        self.wait_time = delay
+        self.follower = paths.PathFollower(paths.get_path(path_name), paths.ENTRY_SPEED, mirror,
+                                           paths.SCREEN_CENTER_OFFSET)
+
+    def dive(self, mirror: bool):
+        """
+        Leave the formation and dive down past the bottom of the stage
+        """
+        self.state = self.DIVING
+        self.follower = paths.PathFollower(paths.get_path('dive'), paths.DIVE_SPEED, mirror, (self.x, self.y))
+
+    def update(self, delta_time: int, flash_flag: bool):
+        self.animation_flag = flash_flag
+        state = self.state
+        if state == self.IN_FORMATION:
+            if self.formation is not None:
+                self.move_to_slot()
+        elif state == self.WAITING:
+            self.wait_time -= delta_time
+            if self.wait_time <= 0:
+                self.state = self.ENTERING
+                self.is_visible = True
+                self.jump_to(*self.follower.position)
+        elif state == self.JOINING:
+            self.fly_to_slot(delta_time)
+        else:
+            is_done = self.follower.advance(delta_time)
+            self.entity.move_to(*self.follower.position)
+            self.heading = self.follower.heading
+            if is_done:
+                self.follower = None
+                self.state = self.JOINING
+                if state == self.DIVING:
+                    # come back in from the top of the stage
+                    self.jump_to(self.formation.slot_center(self.slot)[0], c.STAGE_TOP_Y - self.rect.height)
+
+    def fly_to_slot(self, delta_time: int):
+        slot_x, slot_y = self.formation.slot_center(self.slot)
+        dx = slot_x - self.x
+        dy = slot_y - self.y
+        distance = math.hypot(dx, dy)
+        step = paths.JOIN_SPEED * delta_time
+        if distance <= step:
+            self.move_to_slot()
+            self.state = self.IN_FORMATION
+            self.heading = -math.pi / 2
+        else:
+            self.entity.move_to(self.x + dx * step / distance, self.y + dy * step / distance)
+            self.heading = math.atan2(dy, dx)
 
-    def get_frame (self):
+    def get_frame(self):
+        if self.animation_flag and len(self.FRAMES[self.enemy_type]) > 1:
+            return 1
         return 0
 
     def display(self, surface: pygame.Surface):
-        frame_num = get_frame()
-        x, y, w, h = self.FRAMES[self.enemy_type][frame_num]
-        self.image = grab_sheet(x, y, w, h)
+        frame_num = self.get_frame()
+        image = get_frame(self.FRAMES[self.enemy_type][frame_num])
+        self.image = get_rotated(image, heading_to_step(self.heading))
         super(Enemy, self).display(surface)
 
 
 class Missile(GalagaSprite):
-    ENEMY_MISSILE = 246, 51, 3, 8
-    PLAYER_MISSILE = 246, 67, 3, 8
+    ENEMY_MISSILE = 'enemy_missile'
+    PLAYER_MISSILE = 'player_missile'
 
-    def __init__(self, x, y, vel, is_enemy):
+    def __init__(self, x=0, y=0, vel=(0, 0), is_enemy=False):
         super(Missile, self).__init__(x, y, 2, 10)
-        self.vel = vel
+        self.reset(x, y, vel, is_enemy)
+
+    def reset(self, x, y, vel, is_enemy):
+        """
+        Fire the missile (again) from somewhere
+        :param vel: (x, y) pixels per milli. EntityStore.move moves it from then on
+        """
+        self.entity.move_to(x, y)
+        self.save_position()
+        self.entity.velocity = vel
         self.is_enemy = is_enemy
+        self.entity.kind = entities.ENEMY_MISSILE if is_enemy else entities.PLAYER_MISSILE
 
         if self.is_enemy:
-            img_slice = self.ENEMY_MISSILE
+            self.image = get_frame(self.ENEMY_MISSILE)
         else:
-            img_slice = self.PLAYER_MISSILE
-        ix, iy, w, h = img_slice
-        self.image = grab_sheet(ix, iy, w, h)
+            self.image = get_frame(self.PLAYER_MISSILE)
 
-    def update(self, delta_time: int, flash_flag: bool):
-        vel = self.vel * delta_time
-        self.x += round(vel.x)
-        self.y += round(vel.y)
-
-
-class Explosion(GalagaSprite):
-    PLAYER_FRAME_DURATION = 140
-    OTHER_FRAME_DURATION = 120
-
-    PLAYER_FRAMES = [Rectangle(64, 112, 32, 32), Rectangle(96, 112, 32, 32), Rectangle(128, 112, 32, 32),
-                     Rectangle(160, 112, 32, 32)]
-
-    OTHER_FRAMES = [Rectangle(224, 80, 16, 16), Rectangle(240, 80, 16, 16), Rectangle(224, 96, 16, 16),
-                    Rectangle(0, 112, 32, 32), Rectangle(32, 112, 32, 32)]
-
-    def __init__(self, x: int, y: int, is_player_type=False):
-        super(Explosion, self).__init__(x, y, 16, 16)
-        self.is_player_type = is_player_type
-
-        self.frame_timer = 0
+    def kill(self):
+        self.entity.stop()
+        super(Missile, self).kill()
 
-        if self.is_player_type:
-            self.image = grab_sheet(64, 112, 32, 32)
-            self.frames = iter(self.PLAYER_FRAMES)
-            self.frame_duration = self.PLAYER_FRAME_DURATION
-        else:
-            self.image = grab_sheet
-            self.frames = iter(self.OTHER_FRAMES)
-            self.frame_duration = self.OTHER_FRAME_DURATION
-
-        self.frame = None
-        self.next_frame()
 
-    def next_frame(self):
-        self.frame = next(self.frames)
-        x, y, w, h = self.frame
-        self.image = grab_sheet(x, y, w, h)
-        self.frame_timer = 0
-
-    def update(self, delta_time: int, flash_flag: bool):
-        self.frame_timer += delta_time
-        if self.frame_timer >= self.frame_duration:
-            try:
-                self.next_frame()
-            except StopIteration:
-                self.kill()
-                return
-
-    def display(self, surface: pygame.Surface):
-        super(Explosion, self).display(surface)
+def score_color(number) -> tuple:
+    # choose color based on the number
+    if number in (800, 1000):
+        return c.BLUE
+    return c.YELLOW
 
 
-def create_score_surface(number):
-    sheet_y = 240
+def create_score_surface(number, color=None):
     char_width = 5
     char_height = 8
-    sheet_char_width = 4
 
     number = int(number)
     str_num = str(number)
@@ -175,18 +321,12 @@ def create_score_surface(number):
     # noinspection PyArgumentList
     surface = pygame.Surface((char_width * length, char_height)).convert_alpha()
 
-    # choose color based on the number
-    color = None
-    if number in (800, 1000):
-        color = c.BLUE
-    else:
-        color = c.YELLOW
+    if color is None:
+        color = score_color(number)
 
     # blit each individual char
     for i, character in enumerate(str_num):
-        value = int(character)
-        sheet_x = value * sheet_char_width
-        number_sprite = grab_sheet(sheet_x, sheet_y, 4, 8)
+        number_sprite = get_frame('score_digit_' + character)
         surface.blit(number_sprite, (i * char_width, 0))
 
     # replace white with color
@@ -197,15 +337,57 @@ def create_score_surface(number):
     return surface
 
 
-class ScoreText(GalagaSprite):
-    # The class keeps track of the text sprites
-    text_sprites = pygame.sprite.Group()
+def get_score_surface(number, color=None) -> pygame.Surface:
+    """
+    Get the surface showing a number of points. The usual ones are made ahead of time and any others get made
+    the first time they are asked for, so showing points hardly ever makes a surface
+    """
+    number = int(number)
+    if color is None:
+        color = score_color(number)
+    key = (number, color)
+    surface = _score_surfaces.get(key)
+    if surface is not None:
+        return surface
+    surface = _other_score_surfaces.get(key)
+    if surface is not None:
+        _other_score_surfaces.move_to_end(key)
+        return surface
+    surface = _other_score_surfaces[key] = create_score_surface(number, color)
+    if len(_other_score_surfaces) > MAX_CACHED_SCORE_SURFACES:
+        _other_score_surfaces.popitem(last=False)
+    return surface
+
+
+# (points, color) -> surface, for the points Galaga shows
+_score_surfaces = {(points, score_color(points)): create_score_surface(points) for points in SCORE_VALUES}
+# (points, color) -> surface, for the most recent other numbers
+_other_score_surfaces = OrderedDict()
+
 
-    def __init__(self, x, y, number, lifetime=950):
-        super(ScoreText, self).__init__(x, y, 1, 1, self.text_sprites)  # BB size doesn't matter here
-        self.number = number
-        self.image = create_score_surface(self.number)
+class ScoreText(GalagaSprite):
+    def __init__(self, x=0, y=0, number=None, lifetime=950, group=None):
+        super(ScoreText, self).__init__(x, y, 1, 1)  # BB size doesn't matter here
+        # the group that keeps track of the text sprites while they're shown
+        self.group = group
+        self.number = None
+        self.lifetime = 0
+        if number is not None:
+            self.reset(x, y, number, lifetime)
+
+    def reset(self, x, y, number, lifetime=950):
+        """
+        Show a number somewhere (again)
+        """
+        self.x = x
+        self.y = y
+        self.save_position()
+        if number != self.number:
+            self.number = number
+            self.image = get_score_surface(self.number)
         self.lifetime = lifetime
+        if self.group is not None:
+            self.group.add(self)
 
     def update(self, delta_time: int, flash_flag: bool):
         # Wait to die
@@ -0,0 +1,241 @@
+# stages.py
+
+"""
+The enemies that come into each stage, and how they get there.
+Stages are declared in resources/stages.json: named sets of waves, and which set (and how often the enemies
+dive) each range of stages 1 to 255 uses. A wave is some enemies that fly in one after another along the
+same entry path, and then take their slots in the formation.
+
+The file gets validated once and compiled into resources/stages.cache, which holds the spawn timeline of
+every stage (sorted by spawn time) as packed records, so loading a stage just unpacks its records. The
+cache gets rebuilt whenever stages.json changes.
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from . import constants as c, formation, paths
+from .assets import map_file
+
+FIRST_STAGE = 1
+LAST_STAGE = 255  # the most stage badges can show
+ENEMY_TYPES = ('bee', 'butterfly', 'boss')
+
+MAGIC = b'GALAGA-STAGES'
+VERSION = 1
+_HEADER = struct.Struct('<H20sB')  # cache version, sha1 of stages.json, number of paths
+_STAGE_ENTRY = struct.Struct('<IHH')  # index of the first spawn record, number of spawns, dive interval
+_SPAWN = struct.Struct('<IBBBB')  # time, formation slot, enemy type index, path index, mirror
+
+# time: millis. into the stage, slot: formation slot index, path: entry path name, mirror: flip the path
+Spawn = namedtuple("Spawn", "time slot enemy_type path mirror")
+Stage = namedtuple("Stage", "stage_num dive_interval spawns")
+
+SOURCE_PATH = os.path.join(c.RESOURCE_DIR, c.STAGE_FILE)
+CACHE_PATH = os.path.join(c.RESOURCE_DIR, c.STAGE_CACHE_FILE)
+
+_cache = None  # the open StageCache
+_stages = {}  # stage number -> Stage, for every stage loaded so far
+_lock = threading.Lock()
+_preload_thread = None
+
+
+def _check(condition, message, *args):
+    if not condition:
+        raise ValueError("{}: {}".format(c.STAGE_FILE, message.format(*args)))
+
+
+def _is_int(value, minimum, maximum) -> bool:
+    return type(value) is int and minimum <= value <= maximum
+
+
+def _compile_waves(name: str, waves: list, path_ids: dict) -> list:
+    """
+    Check a set of waves and turn it into a spawn timeline
+    :return: list of (time, slot, enemy type index, path index, mirror), sorted by time
+    """
+    _check(isinstance(waves, list) and waves, "waves '{}' has to be a list of waves", name)
+    timeline = []
+    slots = set()
+    for wave_num, wave in enumerate(waves, 1):
+        where = "wave {} of '{}'".format(wave_num, name)
+        _check(isinstance(wave, dict), "{} has to be an object", where)
+        _check(wave.get('path') in path_ids, "{} has an unknown path {!r}", where, wave.get('path'))
+        _check(isinstance(wave.get('mirror', False), bool), "{}: mirror has to be true or false", where)
+        _check(_is_int(wave.get('start'), 0, 0xffffffff), "{}: start has to be a time in millis.", where)
+        _check(_is_int(wave.get('spacing'), 0, 0xffff), "{}: spacing has to be a time in millis.", where)
+        enemies = wave.get('enemies')
+        _check(isinstance(enemies, list) and enemies, "{} has no enemies", where)
+        for i, enemy in enumerate(enemies):
+            _check(isinstance(enemy, list) and len(enemy) == 3, "{}: enemies are [type, x, y]", where)
+            enemy_type, formation_x, formation_y = enemy
+            _check(enemy_type in ENEMY_TYPES, "{} has an unknown enemy type {!r}", where, enemy_type)
+            _check(_is_int(formation_x, 0, formation.NUM_COLUMNS - 1) and
+                   _is_int(formation_y, 0, formation.NUM_ROWS - 1),
+                   "{}: ({}, {}) isn't in the formation", where, formation_x, formation_y)
+            slot = formation.slot_index(formation_x, formation_y)
+            _check(slot not in slots, "{}: two enemies of '{}' share the slot ({}, {})", where, name,
+                   formation_x, formation_y)
+            slots.add(slot)
+            time = wave['start'] + i * wave['spacing']
+            _check(time <= 0xffffffff, "{} goes on for too long", where)
+            timeline.append((time, slot, ENEMY_TYPES.index(enemy_type), path_ids[wave['path']],
+                             int(wave.get('mirror', False))))
+    timeline.sort(key=lambda spawn: spawn[0])
+    return timeline
+
+
+def compile_stages(document: dict, source_hash: bytes) -> bytes:
+    """
+    Validate the stage declarations and pack them into the compiled form
+    :param document: the contents of stages.json
+    :param source_hash: sha1 of stages.json, to know when the compiled form is stale
+    :raise ValueError: if anything in the declarations is wrong
+    """
+    _check(isinstance(document, dict) and document.get('version') == 1, "unsupported version")
+    path_names = sorted(paths.PATHS)
+    path_ids = {name: i for i, name in enumerate(path_names)}
+
+    wave_sets = document.get('waves')
+    _check(isinstance(wave_sets, dict) and wave_sets, "'waves' has to map names to lists of waves")
+    timelines = {name: _compile_waves(name, waves, path_ids) for name, waves in wave_sets.items()}
+
+    # every set of waves is stored once, however many stages use it
+    records = []
+    timeline_start = {}
+    for name, timeline in timelines.items():
+        timeline_start[name] = len(records)
+        records.extend(timeline)
+
+    stage_entries = [None] * (LAST_STAGE + 1)
+    ranges = document.get('stages')
+    _check(isinstance(ranges, list), "'stages' has to be a list")
+    for stage_range in ranges:
+        _check(isinstance(stage_range, dict), "every entry of 'stages' has to be an object")
+        stage_nums = stage_range.get('stages')
+        _check(isinstance(stage_nums, list) and len(stage_nums) == 2 and
+               _is_int(stage_nums[0], FIRST_STAGE, LAST_STAGE) and _is_int(stage_nums[1], stage_nums[0], LAST_STAGE),
+               "{!r} isn't a range of stages from {} to {}", stage_nums, FIRST_STAGE, LAST_STAGE)
+        first, last = stage_nums
+        name = stage_range.get('waves')
+        _check(name in timelines, "stages {}-{} use unknown waves {!r}", first, last, name)
+        dive_interval = stage_range.get('dive_interval')
+        _check(_is_int(dive_interval, 1, 0xffff), "stages {}-{} need a dive_interval in millis.", first, last)
+        for stage_num in range(first, last + 1):
+            _check(stage_entries[stage_num] is None, "stage {} is declared more than once", stage_num)
+            stage_entries[stage_num] = (timeline_start[name], len(timelines[name]), dive_interval)
+    for stage_num in range(FIRST_STAGE, LAST_STAGE + 1):
+        _check(stage_entries[stage_num] is not None, "stage {} isn't declared", stage_num)
+
+    out = bytearray(MAGIC)
+    out += _HEADER.pack(VERSION, source_hash, len(path_names))
+    for name in path_names:
+        encoded = name.encode()
+        out.append(len(encoded))
+        out += encoded
+    for stage_num in range(FIRST_STAGE, LAST_STAGE + 1):
+        out += _STAGE_ENTRY.pack(*stage_entries[stage_num])
+    for record in records:
+        out += _SPAWN.pack(*record)
+    return bytes(out)
+
+
+class StageCache:
+    """
+    The compiled stages, which can be in memory or memory-mapped
+    """
+
+    def __init__(self, data, start: int = 0):
+        self.data = data
+        if data[start:start + len(MAGIC)] != MAGIC:
+            raise ValueError("not a compiled stage file")
+        index = start + len(MAGIC)
+        self.version, self.source_hash, num_paths = _HEADER.unpack_from(data, index)
+        index += _HEADER.size
+        self.path_names = []
+        for _ in range(num_paths):
+            length = data[index]
+            self.path_names.append(bytes(data[index + 1:index + 1 + length]).decode())
+            index += 1 + length
+        self.stage_index = index
+        self.records_start = index + _STAGE_ENTRY.size * (LAST_STAGE - FIRST_STAGE + 1)
+
+    def load(self, stage_num: int) -> Stage:
+        first_record, num_spawns, dive_interval = _STAGE_ENTRY.unpack_from(
+            self.data, self.stage_index + _STAGE_ENTRY.size * (stage_num - FIRST_STAGE))
+        start = self.records_start + first_record * _SPAWN.size
+        path_names = self.path_names
+        spawns = tuple(Spawn(time, slot, ENEMY_TYPES[type_index], path_names[path_index], bool(mirror))
+                       for time, slot, type_index, path_index, mirror
+                       in _SPAWN.iter_unpack(self.data[start:start + num_spawns * _SPAWN.size]))
+        return Stage(stage_num, dive_interval, spawns)
+
+
+def is_fresh(cache: StageCache, source_hash: bytes) -> bool:
+    """
+    Whether a compiled cache is what compiling stages.json (with that hash) would give now.
+    The spawn records refer to paths by their index in the path table, so the paths have to be the same too
+    """
+    return cache.version == VERSION and cache.source_hash == source_hash and cache.path_names == sorted(paths.PATHS)
+
+
+def _open_cache() -> StageCache:
+    """
+    Open the compiled stages, compiling them first if they are missing or stale
+    """
+    source_hash = None
+    if os.path.isfile(SOURCE_PATH):
+        with open(SOURCE_PATH, 'rb') as file:
+            source = file.read()
+        source_hash = hashlib.sha1(source).digest()
+
+    mapped = map_file(CACHE_PATH)
+    if mapped is not None and mapped[0][mapped[1]:mapped[1] + len(MAGIC)] == MAGIC:
+        cache = StageCache(*mapped)
+        # without the source (like in a zipapp) the cache is all there is
+        if is_fresh(cache, source_hash or cache.source_hash):
+            return cache
+    if source_hash is None:
+        raise FileNotFoundError("no stage data in {} to compile the stages from".format(SOURCE_PATH))
+
+    data = compile_stages(json.loads(source), source_hash)
+    try:
+        with open(CACHE_PATH + '.tmp', 'wb') as file:
+            file.write(data)
+        os.replace(CACHE_PATH + '.tmp', CACHE_PATH)
+    except OSError:
+        pass  # fine, it just gets compiled again next time
+    return StageCache(data)
+
+
+def get_stage(stage_num: int) -> Stage:
+    stage = _stages.get(stage_num)
+    if stage is not None:
+        return stage
+    if not FIRST_STAGE <= stage_num <= LAST_STAGE:
+        raise ValueError("there is no stage {}".format(stage_num))
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = _open_cache()
+        stage = _stages[stage_num] = _cache.load(stage_num)
+    return stage
+
+
+def preload_all():
+    for stage_num in range(FIRST_STAGE, LAST_STAGE + 1):
+        get_stage(stage_num)
+
+
+def preload_in_background():
+    """
+    Load every stage in a background thread (only the first call does anything)
+    """
+    global _preload_thread
+    if _preload_thread is None:
+        _preload_thread = threading.Thread(target=preload_all, name='stage preload', daemon=True)
+        _preload_thread.start()
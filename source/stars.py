@@ -1,8 +1,8 @@
 import random
 from collections import namedtuple
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 
-from . import constants as c
+from . import constants as c, render
 
 NUM_OF_RANDOM_STARS = 64
 
@@ -38,12 +38,12 @@ class Star:
     show: bool = True
 
 
-def random_star() -> Star:
-    x = random.randint(0, c.GAME_SIZE.width)
-    y = random.randint(0, c.GAME_SIZE.height)
-    layer = random.randint(0, len(LAYERS) - 1)
-    color = random.choice(LAYERS[layer].colors)
-    phase = random.randint(0, len(TWINKLING_PHASES) - 1)
+def random_star(rng=random) -> Star:
+    x = rng.randint(0, c.GAME_SIZE.width)
+    y = rng.randint(0, c.GAME_SIZE.height)
+    layer = rng.randint(0, len(LAYERS) - 1)
+    color = rng.choice(LAYERS[layer].colors)
+    phase = rng.randint(0, len(TWINKLING_PHASES) - 1)
     return Star(x, y, color, layer, phase, speed=LAYERS[layer].speed)
 
 
@@ -52,10 +52,14 @@ class StarField:
     Aesthetic stars for the background
     """
 
-    def __init__(self):
+    def __init__(self, rng=random):
+        """
+        :param rng: where the stars' random positions and colors come from, like a session's 'stars' stream
+        """
         self._moving: int = 1
-        self.stars = [random_star() for _ in range(NUM_OF_RANDOM_STARS)]
-        self.twinkling_timers = [phase for phase in TWINKLING_PHASES]
+        self.stars = [random_star(rng) for _ in range(NUM_OF_RANDOM_STARS)]
+        # copies, so that every star field (and so every session) twinkles the same from its start
+        self.twinkling_timers = [replace(phase) for phase in TWINKLING_PHASES]
         self.current_time = 0
 
     @property
@@ -84,8 +88,10 @@ class StarField:
                 timer.is_shown = True
 
     def display(self, screen):
+        # draw in between the last two ticks
+        display_time = self.current_time - (1 - render.interpolation) * c.SIMULATION_STEP
         for star in self.stars:
             is_shown = self.twinkling_timers[star.twinkle_phase].is_shown
             if is_shown:
-                y = round((star.start_y + (star.speed * self.current_time * self._moving)) % c.GAME_SIZE.height)
-                screen.set_at((star.start_x, y), star.color)
+                y = round((star.start_y + (star.speed * display_time * self._moving)) % c.GAME_SIZE.height)
+                render.set_at(screen, (star.start_x, y), star.color)
@@ -2,8 +2,9 @@
 
 import pygame
 from pygame.math import Vector2
-from . import constants as c, tools, setup, hud, scoring, sprites
-from .setup import play_sound, stop_sounds
+from . import constants as c, tools, setup, hud, scoring, sprites, render, palette
+from .audio import play_sound, stop_sounds
+from .rng import RandomStreams
 from .stars import StarField
 from .tools import calc_stage_badges, draw_text
 
@@ -24,11 +25,33 @@ COPY_Y = START_Y + 60
 MENU_SPEED = 3
 TITLE_FLASH_TIME = 150  # millis.
 TITLE_FLASH_NUM = 12
+TITLE_DEMO_WAIT = 6000  # millis. the title sits still for before the demo starts
 
 # How many milliseconds to show the game over screen
 GAME_OVER_STATE_DURATION = 14500
 
 
+def new_persist(seed=None, scores=None) -> c.Persist:
+    """
+    Create the persistent data for a fresh session
+    :param seed: seed for all of the session's randomness, or None for a new random one
+    :param scores: the high scores, if they are already loaded
+    """
+    if scores is None:
+        scores = scoring.load_scores()
+    high_score = max(scores, key=lambda record: record.score).score
+    rng = RandomStreams(seed)
+    return c.Persist(stars=StarField(rng.stream('stars')),
+                     scores=scores,
+                     current_score=0,
+                     one_up_score=0,
+                     high_score=high_score,
+                     num_shots=0,
+                     num_hits=0,
+                     stage_num=0,
+                     rng=rng)
+
+
 def draw_mid_text(screen, text, color, line=1):
     x, y = c.GAME_CENTER.x, c.GAME_CENTER.y + LINE_TEXT_HEIGHT * (line - 1)
     tools.draw_text(screen, text, (x, y), color, center_y=True, center_x=True)
@@ -38,18 +61,22 @@ class State:
     """
     Base class for game states.
     """
+    SOUNDS = ()  # sound effects the state uses, decoded when the state starts
 
     def __init__(self, persist):
         self.persist: c.Persist = persist
         self.next_state_name = None  # Next state
         self.is_done = False  # Ready to switch to next state
         self.is_quit = False  # Wants to quit the program
-        self.current_time = 0  # Current time since the beginning of the pygame ticks
+        self.current_time = 0  # Current game time, in millis. of simulated time
         self.start_time = 0  # When the state started
 
     def cleanup(self):
         return self.persist
 
+    def preload(self):
+        setup.preload_sfx(self.SOUNDS)
+
     def get_event(self, event: pygame.event.Event):
         raise NotImplementedError()
 
@@ -65,16 +92,7 @@ class Title(State):
     def __init__(self, persist):
         # initialize the persistent data because it is the initial state
         if persist is None:
-            scores = scoring.load_scores()
-            high_score = max(scores, key=lambda record: record.score).score
-            persist = c.Persist(stars=StarField(),
-                                scores=scores,
-                                current_score=0,
-                                one_up_score=0,
-                                high_score=high_score,
-                                num_shots=0,
-                                num_hits=0,
-                                stage_num=0)
+            persist = new_persist()
         State.__init__(self, persist)
 
         # whether it is in a scrolling state
@@ -120,7 +138,10 @@ class Title(State):
                     self.flash_num += 1
                     self.is_title_white = not self.is_title_white
             else:
-                pass  # TODO: make it flash later or invoke demo?
+                self.timer += delta_time
+                if self.timer >= TITLE_DEMO_WAIT:
+                    self.next_state_name = c.DEMO_STATE
+                    self.is_done = True
         elif self.offset_y > 0:
             self.offset_y -= MENU_SPEED
             if self.offset_y <= 0:
@@ -128,7 +149,7 @@ class Title(State):
 
     def display(self, screen):
         # draw background
-        screen.fill(c.BLACK)
+        render.fill(screen, c.BLACK)
         self.persist.stars.display(screen)
         # title normal
         if not self.is_flashing:
@@ -137,7 +158,11 @@ class Title(State):
             surf = WHITE_TITLE
         else:
             surf = GREEN_TITLE
-        screen.blit(surf, (TITLE_X, TITLE_Y + self.offset_y))
+        if render.palette_mode:
+            # flashing is just a change to what the title's palette entry shows
+            render.set_palette_color(palette.TITLE, palette.title_color(surf))
+            surf = palette.get_title_image()
+        render.blit(screen, surf, (TITLE_X, TITLE_Y + self.offset_y))
         # draw 1up and high score hud
         hud.display(screen, one_up_score=0, high_score=0, offset_y=self.offset_y)
         # draw start text
@@ -151,12 +176,17 @@ class GameOver(State):
     def __init__(self, persist):
         super(GameOver, self).__init__(persist)
         play_sound("game_over")
-        self.start_time = pygame.time.get_ticks()
 
         self.persist.stars.moving = 1
 
         self.stage_badges = calc_stage_badges(self.persist.stage_num)
 
+        # onto the leaderboard (written in the background)
+        leaderboard = scoring.get_leaderboard()
+        leaderboard.submit(scoring.RunRecord(c.NO_NAME, self.persist.current_score, self.persist.stage_num,
+                                             self.persist.num_shots, self.persist.num_hits))
+        self.persist = self.persist._replace(scores=scoring.load_scores())
+
         # Just render the surface once
         if self.persist.num_shots == 0:
             self.ratio = 0
@@ -174,7 +204,7 @@ class GameOver(State):
             stop_sounds()
 
     def display(self, screen: pygame.Surface):
-        screen.fill(c.BLACK)
+        render.fill(screen, c.BLACK)
         self.persist.stars.display(screen)
 
         x, y = c.GAME_CENTER.x, 100
@@ -196,19 +226,6 @@ class GameOver(State):
                     stage_badges=self.stage_badges, stage_badge_animation_step=sum(self.stage_badges))
 
 
-class Demo(State):
-    # TODO: implement
-
-    def update(self, delta_time: int, keys):
-        pass
-
-    def display(self, surface: pygame.Surface):
-        pass
-
-    def get_event(self, event: pygame.event.Event):
-        pass
-
-
 class ScoreEntry(State):
 
     def __init__(self, persist):
@@ -6,7 +6,7 @@ import time
 import pygame
 from functools import wraps
 from . import constants as c
-from . import setup
+from . import setup, font, render
 from math import sin
 
 
@@ -34,36 +34,8 @@ def map_value(value, in_start, in_stop, out_start, out_stop):
     return out_start + (out_stop - out_start) * ((value - in_start) / (in_stop - in_start))
 
 
-def _font_render(text: str, color: pygame.Color, bg_color=None):
-    """
-    Create a pygame image with the text rendered on it using the custom bitmap font
-    :param text:
-    :param color:
-    :param bg_color:
-    :return:
-    """
-    surf = pygame.Surface((len(text) * setup.FONT_CHAR_SIZE, setup.FONT_CHAR_SIZE))
-    if bg_color is None:
-        surf.set_colorkey(pygame.Color('black'))
-    for i, char in enumerate(text):
-        # get font location for the char, default to unknown symbol
-        font_data = setup.get_from_font(char.lower())
-        if not font_data:
-            font_data = setup.get_from_font(None)
-        # grab the image at location
-        glyph = grab_sheet(font_data[0], font_data[1], setup.FONT_CHAR_SIZE, setup.FONT_CHAR_SIZE)
-        surf.blit(glyph, (i * setup.FONT_CHAR_SIZE, 0), )
-    # replace colors
-    pixels = pygame.PixelArray(surf)
-    if bg_color:
-        pixels.replace(pygame.Color('black'), bg_color)
-    pixels.replace(pygame.Color('white'), color)
-    pixels.close()
-    return surf
-
-
 def draw_text(surface, text, position, color, background_color=None, center_x=False, center_y=False):
-    text_surface = _font_render(str(text), color, background_color)
+    text_surface = font.render(str(text), color, background_color)
     x, y = position
     width, height = text_surface.get_size()
     if center_x:
@@ -73,7 +45,7 @@ def draw_text(surface, text, position, color, background_color=None, center_x=Fa
     if surface is None:
         return text_surface
     else:
-        return surface.blit(text_surface, (x, y))
+        return render.blit(surface, text_surface, (x, y))
 
 
 def grab_sheet(x: int, y: int, width: int, height: int) -> pygame.Surface:
@@ -179,7 +151,7 @@ def calc_formation(time):
     norm_time = 2 * math.pi * mod_time / c.FORMATION_CYCLE_TIME
 
     middle_spread = (c.FORMATION_MAX_SPREAD + c.FORMATION_MIN_SPREAD) / 2
-    spread_magnitude = c.FORMATION_MAX_SPREAD - c.FORMATION_MIN_SPREAD
+    spread_magnitude = (c.FORMATION_MAX_SPREAD - c.FORMATION_MIN_SPREAD) / 2
     offset = sin(norm_time) * spread_magnitude
     spread = round(middle_spread + offset)
 
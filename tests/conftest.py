@@ -0,0 +1,11 @@
+# conftest.py
+
+"""
+The tests run the game headless, like simulate.py does.
+"""
+
+import os
+import sys
+
+os.environ.setdefault('GALAGA_HEADLESS', '1')  # has to be set before the game gets imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,25 @@
+# test_assets.py
+
+import pygame
+
+from source import assets, setup
+
+
+def build_for_another_mixer(monkeypatch, path, source_hashes, sound_files):
+    with monkeypatch.context() as patch:
+        patch.setattr(assets, '_mixer_format', lambda: [11025, 8, 1])
+        assets.build_cache(path, source_hashes, {}, sound_files, {})
+
+
+def test_cache_for_another_mixer(monkeypatch, tmp_path):
+    name, file_path = sorted((name, path) for name, path in setup.SOUND_FILES.items() if path is not None)[0]
+    path = str(tmp_path / assets.CACHE_FILE_NAME)
+    source_hashes = {'audio/' + name: 'hash'}
+    build_for_another_mixer(monkeypatch, path, source_hashes, {name: file_path})
+
+    # with the sources around, it gets rebuilt
+    assert assets.AssetCache.open(path, source_hashes) is None
+    # without them (like in a zipapp) the sounds get decoded from the cache instead
+    cache = assets.AssetCache.open(path, {})
+    assert not cache.is_pcm_usable
+    assert cache.load_sound(name).get_raw() == pygame.mixer.Sound(file_path).get_raw()
@@ -0,0 +1,21 @@
+# test_audio.py
+
+from source import setup
+from source.audio import AudioManager
+
+
+def test_one_play_per_effect_and_frame(monkeypatch):
+    monkeypatch.setattr(setup, 'HEADLESS', False)
+    monkeypatch.setattr(setup, 'MUTED', False)
+    audio = AudioManager()  # without channels, so flush doesn't get to the mixer
+    # a frame that had to catch up on a few ticks, with a hit in each
+    for _ in range(3):
+        audio.play('enemy_hit_1')
+    audio.play('fighter_fire')
+    assert list(audio.queued) == ['enemy_hit_1', 'fighter_fire']
+    assert audio.num_coalesced == 2
+
+    audio.flush()
+    assert not audio.queued
+    audio.play('enemy_hit_1')
+    assert list(audio.queued) == ['enemy_hit_1']
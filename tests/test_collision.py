@@ -0,0 +1,46 @@
+# test_collision.py
+
+import random
+
+import pygame
+import pytest
+
+from source import collision
+
+BOUNDS = pygame.Rect(0, 0, 224, 288)
+
+
+class Thing:
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)
+
+
+def random_things(rng: random.Random, count: int, max_size: int) -> list:
+    # some of them stick out of the bounds, or are outside altogether
+    return [Thing((rng.randint(-40, BOUNDS.right + 10), rng.randint(-40, BOUNDS.bottom + 10),
+                   rng.randint(1, max_size), rng.randint(1, max_size))) for _ in range(count)]
+
+
+def naive_collisions(things_a, things_b) -> set:
+    return {(a, b) for a in things_a for b in things_b
+            if a.rect.colliderect(b.rect) and BOUNDS.colliderect(a.rect) and BOUNDS.colliderect(b.rect)}
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_grid_pairs_match_naive_pairs(seed):
+    rng = random.Random(seed)
+    grid = collision.CollisionGrid(BOUNDS)
+    # a layer with more sprites than the other gets looked up from the smaller one, so try both ways round
+    layers = {collision.PLAYER: random_things(rng, 3, 20),
+              collision.ENEMIES: random_things(rng, 40, 24),
+              collision.PLAYER_MISSILES: random_things(rng, 60, 8),
+              collision.ENEMY_MISSILES: random_things(rng, 10, 80)}
+    for _ in range(2):  # rebuilding has to start from an empty grid
+        grid.rebuild(layers)
+        for layer_a in layers:
+            for layer_b in layers:
+                if layer_a == layer_b:
+                    continue
+                pairs = grid.collisions(layer_a, layer_b)
+                assert len(pairs) == len(set(pairs)), "a pair came out more than once"
+                assert set(pairs) == naive_collisions(layers[layer_a], layers[layer_b])
@@ -0,0 +1,30 @@
+# test_formation.py
+
+from source import constants as c, formation
+from source.tools import calc_formation_pos_from_time
+
+
+def test_positions_match_calc_formation_pos():
+    the_formation = formation.Formation(origin_x=0, origin_y=0)
+    slots = [(x, y) for y in range(formation.NUM_ROWS) for x in range(formation.NUM_COLUMNS)]
+    for time in range(c.FORMATION_CYCLE_TIME):
+        the_formation.update(time)
+        expected = [calc_formation_pos_from_time(x, y, time) for x, y in slots]
+        assert the_formation.slot_positions == expected, "at {} ms".format(time)
+
+
+def test_origin_moves_every_slot():
+    moved = formation.Formation(origin_x=5, origin_y=7)
+    unmoved = formation.Formation(origin_x=0, origin_y=0)
+    for time in (0, 1234, c.FORMATION_CYCLE_TIME - 1):
+        moved.update(time)
+        unmoved.update(time)
+        assert (moved.positions - unmoved.positions).tolist() == [[5, 7]] * formation.NUM_SLOTS
+
+
+def test_play_formation_stays_on_screen():
+    the_formation = formation.Formation(origin_x=formation.CENTERED_ORIGIN_X)
+    for time in range(c.FORMATION_CYCLE_TIME):
+        the_formation.update(time)
+        xs = the_formation.positions[:, 0]
+        assert xs.min() >= 0 and xs.max() + formation.SLOT_SIZE <= c.GAME_SIZE.width, "at {} ms".format(time)
@@ -0,0 +1,30 @@
+# test_play.py
+
+from source import sprites
+from source.play import ENEMY_FIRE_DELAY, Play
+from source.states import new_persist
+
+
+def start_play() -> Play:
+    play = Play(new_persist(1))
+    play.done_starting()
+    play.should_spawn_enemies = False
+    play.done_showing_stage()
+    play.done_with_ready()
+    return play
+
+
+def test_diving_enemy_fires_at_the_fighter():
+    play = start_play()
+    enemy = sprites.Enemy(0, 0, 'bee', play.formation, 0)
+    enemy.move_to_slot()
+    play.enemies.add(enemy)
+    enemy.dive(mirror=False)
+    play.enemy_shots.append((enemy, play.current_time + ENEMY_FIRE_DELAY))
+
+    play.current_time += ENEMY_FIRE_DELAY
+    play.update_enemy_fire()
+    assert len(play.enemy_missiles) == 1
+    missile = play.enemy_missiles.sprites()[0]
+    assert missile.is_enemy and missile.entity.velocity[1] > 0
+    assert not play.enemy_shots
@@ -0,0 +1,59 @@
+# test_replay.py
+
+import pytest
+
+from source import constants as c, replay
+from source.demo import create_demo_play, step_play
+from source.states import new_persist
+
+NUM_TICKS = 60 * 1000 // c.SIMULATION_STEP
+
+
+def play_back(log: replay.InputLog, recorder: replay.Recorder = None):
+    play = create_demo_play(new_persist(log.seed))
+    replayer = replay.Replayer(log)
+    while not replayer.is_done and not play.should_show_game_over:
+        pressed_keys, events = replayer.next_tick()
+        if recorder is not None:
+            recorder.record(pressed_keys, events)
+        step_play(play, pressed_keys, events, log.step)
+    return play
+
+
+def test_log_round_trip():
+    log = replay.InputLog(12345, c.PLAY_STATE)
+    # long runs need more than one byte for their length
+    for mask, run_length in ((0, 1), (0b0001, 127), (0b0010, 128), (0b10101, 1), (0b0100, 70000)):
+        for _ in range(run_length):
+            log.append(mask)
+
+    loaded = replay.InputLog.from_bytes(log.to_bytes())
+    assert (loaded.seed, loaded.initial_state_name, loaded.step) == (12345, c.PLAY_STATE, c.SIMULATION_STEP)
+    assert loaded.num_ticks == log.num_ticks
+    assert loaded.runs == log.runs
+    assert list(loaded.ticks()) == list(log.ticks())
+
+
+def test_replay_gives_the_same_game(tmp_path):
+    recorded = replay.InputLog(7, c.PLAY_STATE)
+    play = play_back(replay.scripted_log(7, NUM_TICKS, c.PLAY_STATE), replay.Recorder(recorded))
+    assert play.num_shots > 0 and play.score > 0
+    path = tmp_path / 'session.rec'
+    recorded.save(path)
+
+    replayed = play_back(replay.InputLog.load(path))
+    assert replayed.score == play.score
+    assert (replayed.num_shots, replayed.num_hits) == (play.num_shots, play.num_hits)
+    assert replayed.stage_num == play.stage_num
+
+
+def test_load_refuses_another_step(tmp_path):
+    path = tmp_path / 'session.rec'
+    replay.InputLog(7, c.PLAY_STATE, step=c.SIMULATION_STEP + 1).save(path)
+    with pytest.raises(ValueError):
+        replay.InputLog.load(path)
+
+
+def test_from_bytes_refuses_other_files():
+    with pytest.raises(ValueError):
+        replay.InputLog.from_bytes(b'GIF89a' + bytes(32))
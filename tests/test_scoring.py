@@ -0,0 +1,113 @@
+# test_scoring.py
+
+import random
+import timeit
+
+from source import scoring
+from source.scoring import Leaderboard, RunRecord, ScoreRecord
+
+
+def run(name: str, score: int) -> RunRecord:
+    return RunRecord(name, score, 1, 10, 5)
+
+
+class HeldRuns(list):
+    """
+    Stands in for a leaderboard's queue, keeping the runs from ever getting to the writer
+    """
+
+    def put(self, row):
+        self.append(row)
+
+
+def fill(board: Leaderboard, num_runs: int):
+    # straight into the database, which is quicker than submitting them one at a time
+    rng = random.Random(num_runs)
+    with board.connection:
+        board.connection.executemany(scoring._INSERT, [(None, 'AAA', rng.randrange(1_000_000), 1, 10, 5)
+                                                       for _ in range(num_runs)])
+
+
+def write_score_file(tmp_path):
+    path = tmp_path / 'scores.txt'
+    path.write_text("ABCD 30000\nBBB 20000\n\nCCC 10000\n")
+    return str(path)
+
+
+def test_read_score_file(tmp_path):
+    assert scoring.read_score_file(write_score_file(tmp_path)) == [
+        ScoreRecord('ABC', 30000), ScoreRecord('BBB', 20000), ScoreRecord('CCC', 10000)]
+    assert scoring.read_score_file(str(tmp_path / 'missing.txt')) == []
+
+
+def test_import_only_when_made(tmp_path):
+    path = str(tmp_path / 'scores.db')
+    board = Leaderboard(path, import_path=write_score_file(tmp_path))
+    assert [(r.name, r.score) for r in board.top()] == [('ABC', 30000), ('BBB', 20000), ('CCC', 10000)]
+    board.submit(run('DDD', 25000))
+    board.close()
+
+    # opening it again doesn't import the scores a second time
+    board = Leaderboard(path, import_path=write_score_file(tmp_path))
+    try:
+        assert [(r.name, r.score) for r in board.top()] == [
+            ('ABC', 30000), ('DDD', 25000), ('BBB', 20000), ('CCC', 10000)]
+    finally:
+        board.close()
+
+
+def test_rank():
+    board = Leaderboard(scoring.MEMORY)
+    for name, score in (('AAA', 300), ('BBB', 200), ('CCC', 200), ('DDD', 100)):
+        board.submit(run(name, score))
+    assert [board.rank(score) for score in (400, 300, 250, 200, 150, 100, 0)] == [1, 1, 2, 2, 4, 4, 5]
+    # ties go to whoever got the score first
+    assert [r.name for r in board.top(3)] == ['AAA', 'BBB', 'CCC']
+    # runs submitted after the first rank count too
+    board.submit(run('EEE', 250))
+    assert [board.rank(score) for score in (300, 250, 200)] == [1, 2, 3]
+    board.close()
+
+
+def test_rank_counts_pending_runs(tmp_path):
+    board = Leaderboard(str(tmp_path / 'scores.db'))
+    try:
+        board.submit(run('AAA', 300))
+        board.flush()
+        # hold the next runs back from the writer, so they stay pending
+        writer_queue = board.queue
+        board.queue = held = HeldRuns()
+        board.submit(run('BBB', 200))
+        board.submit(run('CCC', 400))
+        board.queue = writer_queue
+        assert len(board.pending) == 2
+        ranks = [board.rank(score) for score in (500, 300, 250, 100)]
+        assert ranks == [1, 2, 3, 4]
+        assert [r.name for r in board.top()] == ['CCC', 'AAA', 'BBB']
+
+        for row in held:
+            board.queue.put(row)
+        board.flush()
+        assert not board.pending
+        assert [board.rank(score) for score in (500, 300, 250, 100)] == ranks
+    finally:
+        board.close()
+
+    board = Leaderboard(str(tmp_path / 'scores.db'))
+    try:
+        assert [board.rank(score) for score in (500, 300, 250, 100)] == ranks
+    finally:
+        board.close()
+
+
+def test_rank_scales_with_the_log_of_the_runs():
+    times = []
+    for num_runs in (1_000, 100_000):
+        board = Leaderboard(scoring.MEMORY)
+        fill(board, num_runs)
+        assert board.rank(-1) == num_runs + 1
+        # the lowest score is the worst case for counting the better runs one by one
+        times.append(min(timeit.repeat(lambda: board.rank(0), number=200, repeat=5)))
+        board.close()
+    # 100 times the runs; counting them would take about 100 times as long, bisecting them not even twice
+    assert times[1] < times[0] * 10
@@ -0,0 +1,71 @@
+# test_stages.py
+
+import copy
+
+import pytest
+
+from source import paths, stages
+
+SOURCE_HASH = bytes(20)
+
+
+def good_document() -> dict:
+    return {'version': 1,
+            'waves': {'first': [{'path': 'top_entry', 'mirror': False, 'start': 0, 'spacing': 100,
+                                 'enemies': [['bee', 4, 3], ['boss', 4, 0]]},
+                                {'path': 'side_entry', 'mirror': True, 'start': 50, 'spacing': 100,
+                                 'enemies': [['butterfly', 5, 1]]}]},
+            'stages': [{'stages': [stages.FIRST_STAGE, stages.LAST_STAGE], 'waves': 'first', 'dive_interval': 2000}]}
+
+
+def first_wave(document: dict) -> dict:
+    return document['waves']['first'][0]
+
+
+# (what is wrong, how to make it wrong, what the error says)
+BAD_DOCUMENTS = [
+    ("version", lambda d: d.update(version=2), "unsupported version"),
+    ("no waves", lambda d: d.update(waves={}), "'waves' has to map"),
+    ("empty waves", lambda d: d['waves'].update(first=[]), "has to be a list of waves"),
+    ("unknown path", lambda d: first_wave(d).update(path='loop_the_loop'), "unknown path"),
+    ("mirror", lambda d: first_wave(d).update(mirror='yes'), "mirror has to be true or false"),
+    ("start", lambda d: first_wave(d).update(start=-1), "start has to be a time"),
+    ("spacing", lambda d: first_wave(d).update(spacing=1.5), "spacing has to be a time"),
+    ("no enemies", lambda d: first_wave(d).update(enemies=[]), "has no enemies"),
+    ("enemy shape", lambda d: first_wave(d)['enemies'].append(['bee', 1]), "enemies are"),
+    ("enemy type", lambda d: first_wave(d)['enemies'].append(['wasp', 1, 1]), "unknown enemy type"),
+    ("outside the formation", lambda d: first_wave(d)['enemies'].append(['bee', 10, 0]), "isn't in the formation"),
+    ("shared slot", lambda d: first_wave(d)['enemies'].append(['bee', 5, 1]), "share the slot"),
+    ("stages", lambda d: d.update(stages={}), "'stages' has to be a list"),
+    ("stage range", lambda d: d['stages'][0].update(stages=[3, 2]), "isn't a range of stages"),
+    ("unknown waves", lambda d: d['stages'][0].update(waves='second'), "use unknown waves"),
+    ("dive interval", lambda d: d['stages'][0].update(dive_interval=0), "need a dive_interval"),
+    ("declared twice", lambda d: d['stages'].append(copy.deepcopy(d['stages'][0])), "declared more than once"),
+    ("undeclared stage", lambda d: d['stages'][0].update(stages=[stages.FIRST_STAGE, 10]), "stage 11 isn't declared"),
+]
+
+
+def test_compiled_stages_load_back():
+    cache = stages.StageCache(stages.compile_stages(good_document(), SOURCE_HASH))
+    assert stages.is_fresh(cache, SOURCE_HASH)
+    stage = cache.load(stages.LAST_STAGE)
+    assert stage.dive_interval == 2000
+    assert [(spawn.time, spawn.enemy_type, spawn.path, spawn.mirror) for spawn in stage.spawns] == [
+        (0, 'bee', 'top_entry', False), (50, 'butterfly', 'side_entry', True), (100, 'boss', 'top_entry', False)]
+
+
+@pytest.mark.parametrize('make_bad, message', [(make_bad, message) for _, make_bad, message in BAD_DOCUMENTS],
+                         ids=[name for name, _, _ in BAD_DOCUMENTS])
+def test_validator_errors(make_bad, message):
+    document = good_document()
+    make_bad(document)
+    with pytest.raises(ValueError, match=message):
+        stages.compile_stages(document, SOURCE_HASH)
+
+
+def test_cache_is_stale_when_the_paths_change(monkeypatch):
+    cache = stages.StageCache(stages.compile_stages(good_document(), SOURCE_HASH))
+    assert not stages.is_fresh(cache, bytes([1]) * 20)
+    # the spawn records refer to the paths by index, so a new path makes them point at the wrong ones
+    monkeypatch.setitem(paths.PATHS, 'aaa_new_entry', paths.PATHS['top_entry'])
+    assert not stages.is_fresh(cache, SOURCE_HASH)